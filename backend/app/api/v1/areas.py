@@ -0,0 +1,76 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Query, HTTPException
+
+from cell_change_evolution.select_db_h3 import (
+    get_h3_cells,
+    get_h3_cell_sites,
+    get_h3_cqi,
+    h3_from_hex,
+    h3_to_hex,
+)
+from .sites import df_json_records
+
+router = APIRouter(prefix="/areas", tags=["areas"])
+
+
+def _with_hex_cells(df) -> list:
+    """Records with the H3 BIGINT replaced by its hex string (JSON numbers lose precision above 2**53)."""
+    if df is None or df.empty:
+        return []
+    df = df.copy()
+    df.insert(0, 'cell', [h3_to_hex(c) for c in df.pop('cell_id')])
+    return df_json_records(df)
+
+
+@router.get("/h3")
+def list_h3_cells(
+    resolution: int = Query(7, description="H3 resolution: 5, 7 or 9"),
+    region: Optional[str] = Query(None),
+    province: Optional[str] = Query(None),
+    municipality: Optional[str] = Query(None),
+):
+    """Site counts per H3 cell (with the cell center), optionally within one area."""
+    df = get_h3_cells(resolution, region=region, province=province, municipality=municipality)
+    if df is None:
+        raise HTTPException(status_code=503, detail=f"H3 cells at resolution {resolution} are not available")
+    return _with_hex_cells(df)
+
+
+@router.get("/h3/cqi")
+def h3_cqi(
+    resolution: int = Query(7, description="H3 resolution: 5, 7 or 9"),
+    technology: str = Query("4G", pattern="^(3G|4G|5G)$"),
+    min_date: Optional[date] = Query(None),
+    max_date: Optional[date] = Query(None),
+    region: Optional[str] = Query(None),
+    province: Optional[str] = Query(None),
+    municipality: Optional[str] = Query(None),
+):
+    """Average daily CQI per H3 cell over the date range."""
+    df = get_h3_cqi(
+        resolution,
+        technology=technology,
+        min_date=min_date,
+        max_date=max_date,
+        region=region,
+        province=province,
+        municipality=municipality,
+    )
+    if df is None:
+        raise HTTPException(status_code=503, detail=f"H3 cells at resolution {resolution} are not available")
+    return _with_hex_cells(df)
+
+
+@router.get("/h3/{cell}/sites")
+def list_h3_cell_sites(cell: str):
+    """Sites inside one H3 cell (hex index at resolution 5, 7 or 9)."""
+    parsed = h3_from_hex(cell)
+    if parsed is None:
+        raise HTTPException(status_code=422, detail="Not an H3 cell at a stored resolution (5, 7 or 9)")
+    cell_id, resolution = parsed
+    df = get_h3_cell_sites(cell_id, resolution)
+    if df is None:
+        raise HTTPException(status_code=503, detail=f"H3 cells at resolution {resolution} are not available")
+    return {"cell": h3_to_hex(cell_id), "resolution": resolution, "sites": df_json_records(df)}
@@ -9,7 +9,11 @@ from fastapi import APIRouter
 from pydantic import BaseModel, Field
 
 from .sites import df_json_records, get_neighbors_geo
+from app.core.settings import settings
+from app.core.result_cache import ResultCache, watermark_token
+from app.core.serialization import FastJSONResponse, df_columnar
 from cell_change_evolution.select_db_master_node import get_max_date
+from cell_change_evolution.data_watermark import get_data_watermark_cached, get_watermark_max_date
 from cell_change_evolution.select_db_cqi_daily import (
     get_cqi_daily_calculated,
     get_traffic_data_daily,
@@ -19,7 +23,12 @@ from cell_change_evolution.select_db_neighbor_cqi_daily import (
     get_neighbor_cqi_daily_calculated,
     get_neighbor_traffic_data,
     get_neighbor_traffic_voice,
+    get_neighbor_sites_cached,
 )
+from cell_change_evolution.query_budget import QueryBudget, current_budget, run_bound
+from cell_change_evolution.executor import get_executor
+from cell_change_evolution.tracing import current_trace, propagate, span, start_trace
+from app.core.tracing import keep_trace
 
 router = APIRouter(prefix="/evaluate", tags=["evaluate"])
 
@@ -33,6 +42,7 @@ class EvaluateRequest(BaseModel):
     radius_km: float = Field(5.0, ge=0, le=50, description="Neighbor aggregation radius in km")
     vecinos: str = Field(..., description="Neighbors ATT sites")
     debug: bool = Field(False, description="Include debug timings in response")
+    data_format: Literal["records", "columnar"] = Field("records", description="Window datasets as row records or columnar arrays")
 
 MetricClass = Literal[
     "UpUp", "UpFlat", "UpDown",
@@ -172,153 +182,214 @@ def _classify(delta_ab: Optional[float], delta_la: Optional[float], thr: float)
 
 
 def _call_with_timeout(fn: Callable[..., Any], timeout_s: float, *args, **kwargs) -> Any:
-    """Run blocking DB selector with a timeout to avoid hanging requests."""
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-        fut = ex.submit(fn, *args, **kwargs)
-        try:
-            return fut.result(timeout=timeout_s)
-        except concurrent.futures.TimeoutError:
-            print(f"[evaluate] Timeout: {getattr(fn, '__name__', str(fn))} exceeded {timeout_s}s")
-            return None
-        except Exception as e:
-            print(f"[evaluate] Error in {getattr(fn, '__name__', str(fn))}: {e}")
-            return None
+    """Run blocking DB selector with a timeout to avoid hanging requests.
+
+    The call runs under a child of the request budget (or its own budget), so every
+    statement gets a statement_timeout no longer than what is left, and statements
+    still running when the timeout fires are cancelled in Postgres instead of orphaned.
+    The call runs on the shared executor; time spent queued for a worker counts against
+    the timeout. Called from a worker of that executor it may run inline, where the wait
+    cannot be cut short: a result arriving after the deadline is then treated as a timeout.
+    """
+    name = getattr(fn, '__name__', str(fn))
+    parent = current_budget()
+    budget = parent.child(timeout_s, label=name) if parent is not None else QueryBudget(timeout_s, label=name)
+    fut = get_executor().submit(propagate(run_bound), budget, fn, *args, **kwargs)
+    try:
+        result = fut.result(timeout=budget.remaining_s())
+        if fut.ran_inline and budget.remaining_s() <= 0:
+            raise concurrent.futures.TimeoutError()
+        return result
+    except concurrent.futures.TimeoutError:
+        print(f"[evaluate] Timeout: {name} exceeded {timeout_s}s")
+        fut.cancel()
+        budget.record('timeout', timeout_s=timeout_s)
+        budget.cancel_all(reason='timeout')
+        return None
+    except Exception as e:
+        print(f"[evaluate] Error in {name}: {e}")
+        return None
+
 
+# Columns summed per row for the traffic totals
+DATA_COLS = [
+    # 3G packet data
+    "h3g_traffic_d_user_ps_gb", "e3g_traffic_d_user_ps_gb", "n3g_traffic_d_user_ps_gb",
+    # 4G packet data (multiple regions/prefixes)
+    "h4g_traffic_d_user_ps_gb", "s4g_traffic_d_user_ps_gb", "e4g_traffic_d_user_ps_gb", "n4g_traffic_d_user_ps_gb",
+    # 5G NSA PDCP data per legs
+    "e5g_nsa_traffic_pdcp_gb_5gendc_4glegn", "n5g_nsa_traffic_pdcp_gb_5gendc_4glegn",
+    "e5g_nsa_traffic_pdcp_gb_5gendc_5gleg", "n5g_nsa_traffic_pdcp_gb_5gendc_5gleg",
+]
+VOICE_COLS = [
+    # 3G CS voice
+    "h3g_traffic_v_user_cs", "e3g_traffic_v_user_cs", "n3g_traffic_v_user_cs",
+    # VoLTE components
+    "user_traffic_volte_e", "user_traffic_volte_h", "user_traffic_volte_n", "user_traffic_volte_s",
+]
+CQI_COLS = ['umts_cqi', 'lte_cqi', 'nr_cqi']
 
-def _compute_range(site_att: str, tech: Optional[str], start: Optional[date], end: Optional[date], metric: str, radius_km: float, timings: Optional[Dict[str, float]] = None, vecinos: str = '') -> Optional[float]:
-    # metric keys: 'site_cqi', 'site_data', 'site_voice', 'nb_cqi', 'nb_data', 'nb_voice'
+
+def _fetch_frame(site_att: str, tech: Optional[str], start: Optional[date], end: Optional[date], metric: str, radius_km: float, vecinos: str, neighbors: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """Fetch the raw frame for a metric over [start, end] with a single selector call.
+    metric in { 'site_cqi','site_data','site_voice','nb_cqi','nb_data','nb_voice' }.
+    `neighbors` is the neighbor set resolved once for the request (nb_* metrics only).
+    """
     frm = _date_str(start)
     to = _date_str(end)
-    t0 = time.perf_counter()
     if metric == 'site_cqi':
-        print(f"[evaluate] Computing {metric} for {site_att} ({tech}) from {frm} to {to}")
-        df = _call_with_timeout(get_cqi_daily_calculated, 10.0, att_name=site_att, min_date=frm, max_date=to, technology=tech)
-        # select_db_cqi_daily outputs: umts_cqi, lte_cqi, nr_cqi
-        val = _range_mean(df, preferred_cols=['umts_cqi', 'lte_cqi', 'nr_cqi'])
-        # Scale CQI to 0-100 for API output consistency
-        if val is not None and not np.isnan(val):
-            val = float(val) * 100.0
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
-        return val
+        return _call_with_timeout(get_cqi_daily_calculated, 10.0, att_name=site_att, min_date=frm, max_date=to, technology=tech)
     if metric == 'site_data':
         # Aggregate total data traffic across 3G + 4G + 5G
-        df = _call_with_timeout(get_traffic_data_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
-        DATA_COLS = [
-            # 3G packet data
-            "h3g_traffic_d_user_ps_gb", "e3g_traffic_d_user_ps_gb", "n3g_traffic_d_user_ps_gb",
-            # 4G packet data (multiple regions/prefixes)
-            "h4g_traffic_d_user_ps_gb", "s4g_traffic_d_user_ps_gb", "e4g_traffic_d_user_ps_gb", "n4g_traffic_d_user_ps_gb",
-            # 5G NSA PDCP data per legs
-            "e5g_nsa_traffic_pdcp_gb_5gendc_4glegn", "n5g_nsa_traffic_pdcp_gb_5gendc_4glegn",
-            "e5g_nsa_traffic_pdcp_gb_5gendc_5gleg", "n5g_nsa_traffic_pdcp_gb_5gendc_5gleg",
-        ]
-        val = _sum_mean(df, DATA_COLS)
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
-        return val
+        return _call_with_timeout(get_traffic_data_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
     if metric == 'site_voice':
         # Aggregate total voice traffic across 3G CS + VoLTE
-        df = _call_with_timeout(get_traffic_voice_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
-        VOICE_COLS = [
-            # 3G CS voice
-            "h3g_traffic_v_user_cs", "e3g_traffic_v_user_cs", "n3g_traffic_v_user_cs",
-            # VoLTE components
-            "user_traffic_volte_e", "user_traffic_volte_h", "user_traffic_volte_n", "user_traffic_volte_s",
-        ]
-        val = _sum_mean(df, VOICE_COLS)
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
-        return val
+        return _call_with_timeout(get_traffic_voice_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
     if metric == 'nb_cqi':
-        df = _call_with_timeout(get_neighbor_cqi_daily_calculated, 25.0, site=site_att, min_date=frm, max_date=to, technology=tech, radius_km=radius_km, vecinos=vecinos)
-        val = _range_mean(df, preferred_cols=['umts_cqi', 'lte_cqi', 'nr_cqi'])
+        return _call_with_timeout(get_neighbor_cqi_daily_calculated, 25.0, site=site_att, min_date=frm, max_date=to, technology=tech, radius_km=radius_km, vecinos=vecinos, neighbors=neighbors)
+    if metric == 'nb_data':
+        return _call_with_timeout(get_neighbor_traffic_data, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos, neighbors=neighbors)
+    if metric == 'nb_voice':
+        return _call_with_timeout(get_neighbor_traffic_voice, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos, neighbors=neighbors)
+    return None
+
+
+def _slice_window(df: Optional[pd.DataFrame], start: Optional[date], end: Optional[date]) -> Optional[pd.DataFrame]:
+    """Return the rows of a full-span frame whose `time` falls in [start, end] (inclusive)."""
+    if df is None or not isinstance(df, pd.DataFrame):
+        return None
+    if start is None or end is None:
+        return df.iloc[0:0]
+    if df.empty or 'time' not in df.columns:
+        return df
+    t = pd.to_datetime(df['time'], errors='coerce')
+    mask = (t >= pd.Timestamp(start)) & (t <= pd.Timestamp(end))
+    return df[mask.to_numpy()]
+
+
+def _window_value(df: Optional[pd.DataFrame], metric: str) -> Optional[float]:
+    """Window mean for a metric: CQI mean scaled to 0-100, traffic totals as mean of row sums."""
+    if metric in ('site_cqi', 'nb_cqi'):
+        val = _range_mean(df, preferred_cols=CQI_COLS)
         # Scale CQI to 0-100 for API output consistency
         if val is not None and not np.isnan(val):
             val = float(val) * 100.0
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
-        return val
-    if metric == 'nb_data':
-        df = _call_with_timeout(get_neighbor_traffic_data, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos)
-        DATA_COLS = [
-            "h3g_traffic_d_user_ps_gb", "e3g_traffic_d_user_ps_gb", "n3g_traffic_d_user_ps_gb",
-            "h4g_traffic_d_user_ps_gb", "s4g_traffic_d_user_ps_gb", "e4g_traffic_d_user_ps_gb", "n4g_traffic_d_user_ps_gb",
-            "e5g_nsa_traffic_pdcp_gb_5gendc_4glegn", "n5g_nsa_traffic_pdcp_gb_5gendc_4glegn",
-            "e5g_nsa_traffic_pdcp_gb_5gendc_5gleg", "n5g_nsa_traffic_pdcp_gb_5gendc_5gleg",
-        ]
-        val = _sum_mean(df, DATA_COLS)
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
-        return val
-    if metric == 'nb_voice':
-        df = _call_with_timeout(get_neighbor_traffic_voice, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos)
-        VOICE_COLS = [
-            "h3g_traffic_v_user_cs", "e3g_traffic_v_user_cs", "n3g_traffic_v_user_cs",
-            "user_traffic_volte_e", "user_traffic_volte_h", "user_traffic_volte_n", "user_traffic_volte_s",
-        ]
-        val = _sum_mean(df, VOICE_COLS)
-        if timings is not None:
-            timings[f"{metric}:{tech}:{frm}:{to}"] = time.perf_counter() - t0
         return val
+    if metric in ('site_data', 'nb_data'):
+        return _sum_mean(df, DATA_COLS)
+    if metric in ('site_voice', 'nb_voice'):
+        return _sum_mean(df, VOICE_COLS)
     return None
 
 
-def _fetch_timeseries(site_att: str, tech: Optional[str], start: Optional[date], end: Optional[date], metric: str, radius_km: float, vecinos: str) -> list:
-    """Fetch raw timeseries rows (JSON records) for a given metric/window.
-    metric in { 'site_cqi','site_data','site_voice','nb_cqi','nb_data','nb_voice' }.
+def _window_records(df: Optional[pd.DataFrame], metric: str, data_format: str = "records") -> Any:
+    """JSON records (or columnar arrays) for a window; CQI columns are scaled to 0-100 for API output."""
+    if df is None or not isinstance(df, pd.DataFrame):
+        return [] if data_format == "records" else df_columnar(None)
+    if metric in ('site_cqi', 'nb_cqi') and not df.empty:
+        df = df.copy()
+        for col in CQI_COLS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce') * 100.0
+    if data_format == "columnar":
+        return df_columnar(df)
+    return df_json_records(df)
+
+
+# Global time budget per request; partial results are returned when it runs out
+GLOBAL_BUDGET_S = 45.0
+
+
+# Results keyed by the request parameters + data watermark; shared with /report
+_eval_cache = ResultCache(
+    "evaluate",
+    ttl_s=settings.EVAL_CACHE_TTL_S,
+    maxsize=settings.EVAL_CACHE_MAXSIZE,
+    directory=settings.EVAL_CACHE_DIR,
+    disk_ttl_s=settings.EVAL_CACHE_DISK_TTL_S,
+)
+CACHE_KEY_FIELDS = ("site_att", "input_date", "threshold", "period", "guard", "radius_km", "vecinos", "data_format")
+
+
+def _cache_params(req: EvaluateRequest) -> Dict[str, Any]:
+    params = {f: getattr(req, f) for f in CACHE_KEY_FIELDS}
+    params["input_date"] = str(req.input_date)
+    # Neighbor list order does not change the result
+    params["vecinos"] = ",".join(sorted(v.strip() for v in (req.vecinos or "").split(",") if v.strip()))
+    return params
+
+
+def evaluate_cached(req: EvaluateRequest) -> EvaluateResponse:
+    """Evaluation served from the result cache when the parameters and data watermark match.
+
+    Misses are computed and stored unless the result is partial (budget/timeouts) or the
+    watermark is unknown. Debug requests always recompute so timings are real.
     """
-    frm = _date_str(start)
-    to = _date_str(end)
-    if metric == 'site_cqi':
-        df = _call_with_timeout(get_cqi_daily_calculated, 10.0, att_name=site_att, min_date=frm, max_date=to, technology=tech)
-        # Scale CQI columns to 0-100 for API output
-        try:
-            if isinstance(df, pd.DataFrame) and not df.empty:
-                for col in ('umts_cqi', 'lte_cqi', 'nr_cqi'):
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce') * 100.0
-        except Exception:
-            pass
-        return df_json_records(df)
-    if metric == 'site_data':
-        df = _call_with_timeout(get_traffic_data_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
-        return df_json_records(df)
-    if metric == 'site_voice':
-        df = _call_with_timeout(get_traffic_voice_daily, 10.5, att_name=site_att, min_date=frm, max_date=to, technology=None, vendor=None)
-        return df_json_records(df)
-    if metric == 'nb_cqi':
-        df = _call_with_timeout(get_neighbor_cqi_daily_calculated, 25.0, site=site_att, min_date=frm, max_date=to, technology=tech, radius_km=radius_km, vecinos=vecinos)
-        # Scale CQI columns to 0-100 for API output
-        try:
-            if isinstance(df, pd.DataFrame) and not df.empty:
-                for col in ('umts_cqi', 'lte_cqi', 'nr_cqi'):
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce') * 100.0
-        except Exception:
-            pass
-        return df_json_records(df)
-    if metric == 'nb_data':
-        df = _call_with_timeout(get_neighbor_traffic_data, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos)
-        return df_json_records(df)
-    if metric == 'nb_voice':
-        df = _call_with_timeout(get_neighbor_traffic_voice, 10.0, site=site_att, min_date=frm, max_date=to, technology=None, radius_km=radius_km, vendor=None, vecinos=vecinos)
-        return df_json_records(df)
-    return []
+    watermark = watermark_token(_call_with_timeout(get_data_watermark_cached, 5.0))
+    key = None
+    if watermark and not req.debug:
+        _eval_cache.observe_watermark(watermark)
+        key = ResultCache.make_key(_cache_params(req), watermark)
+        with span("cache_lookup", cat="cache", cache="evaluate") as s:
+            cached = _eval_cache.get(key)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            resp = EvaluateResponse.model_validate(cached)
+            resp.options = {**resp.options, "cache": {"hit": True, "watermark": watermark}}
+            return resp
+    resp = _evaluate_with_budget(req)
+    if key is not None and not resp.options.get("partial"):
+        _eval_cache.set(key, resp.model_dump(mode="json"))
+    resp.options = {**resp.options, "cache": {"hit": False, "watermark": watermark}}
+    return resp
 
 
 @router.post("")
 def evaluate(req: EvaluateRequest) -> EvaluateResponse:
+    # debug=true traces the evaluation even without the X-Trace header
+    trace = current_trace()
+    if req.debug and trace is None:
+        with start_trace("POST /api/evaluate", site_att=req.site_att) as trace:
+            resp = evaluate_cached(req)
+        keep_trace(trace)
+    else:
+        resp = evaluate_cached(req)
+    if trace is not None:
+        resp.options = {**resp.options, "trace_id": trace.trace_id}
+    if req.data_format == "columnar":
+        # Skip the response-model pass over the (large) data payload
+        return FastJSONResponse(resp.model_dump())
+    return resp
+
+
+def _evaluate_with_budget(req: EvaluateRequest) -> EvaluateResponse:
+    budget = QueryBudget(GLOBAL_BUDGET_S, label='evaluate')
+    with budget.bind():
+        try:
+            return _evaluate(req, budget)
+        finally:
+            # Nothing may keep running on the database once the response is built
+            budget.cancel_all(reason='request finished')
+
+
+def _evaluate(req: EvaluateRequest, budget: QueryBudget) -> EvaluateResponse:
     # Define windows per §6
     max_d = _call_with_timeout(get_max_date, 8.0)
     max_date_source = "db"
 
 
-    # Fallback: if DB global max is unavailable, try deriving from this site's available data within a bounded window
+    # Fallback 1: latest date loaded into the daily tables, from the data watermark (O(1))
+    if not max_d:
+        max_d = get_watermark_max_date(['umts_cqi_daily', 'lte_cqi_daily', 'nr_cqi_daily',
+                                        'umts_cell_traffic_daily', 'lte_cell_traffic_daily'], combine=max)
+        if max_d:
+            max_date_source = "watermark"
+
+    # Fallback 2 (databases without data_watermark): derive from this site's data within a bounded window
     if not max_d:
-        span = 120  # days around input date to probe
-        probe_min = req.input_date - timedelta(days=span)
-        probe_max = req.input_date + timedelta(days=span)
+        probe_days = 120  # days around input date to probe
+        probe_min = req.input_date - timedelta(days=probe_days)
+        probe_max = req.input_date + timedelta(days=probe_days)
         candidates: list = []
         # We purposefully keep tight timeouts to avoid stalls
         try:
@@ -373,60 +444,72 @@ def evaluate(req: EvaluateRequest) -> EvaluateResponse:
     metrics: List[MetricEvaluation] = []
     debug_timings: Dict[str, float] = {}
 
-    # Build tasks: first site_*, then neighbor_* to run in two phases
-    Task = Tuple[str, str, Optional[str], str]  # (name, mkey, tech, window)
-    site_tasks: List[Task] = []
-    nb_tasks: List[Task] = []
-    for name, mkey, tech in plan:
-        bucket = site_tasks if mkey.startswith('site_') else nb_tasks
-        bucket.append((name, mkey, tech, 'before'))
-        bucket.append((name, mkey, tech, 'after'))
-        if last_start and last_end:
-            bucket.append((name, mkey, tech, 'last'))
-
-    def run_task(task: Task) -> Tuple[Task, Optional[float], float]:
-        name, mkey, tech, window = task
-        if window == 'before':
-            s, e = before_start, before_end
-        elif window == 'after':
-            s, e = after_start, after_end
-        else:
-            s, e = last_start, last_end
+    def window_bounds(window: str) -> Tuple[Optional[date], Optional[date]]:
+        if window == "before":
+            return before_start, before_end
+        if window == "after":
+            return after_start, after_end
+        if window == "between":
+            # define the guard gap as the days strictly between before_end and after_start
+            s = (before_end + timedelta(days=1)) if before_end else None
+            e = (after_start - timedelta(days=1)) if after_start else None
+            if s and e and s > e:
+                return None, None
+            return s, e
+        if window == "mid":
+            # define the span between end of after and start of last, if last exists
+            if not (last_start and last_end):
+                return None, None
+            s = (after_end + timedelta(days=1)) if after_end else None
+            e = (last_start - timedelta(days=1)) if last_start else None
+            if s and e and s > e:
+                return None, None
+            return s, e
+        return last_start, last_end
+
+    # Single scan: every metric is fetched once over the full span covering all windows,
+    # then window means and windowed datasets are sliced from that frame in memory.
+    bounds = [d for d in (before_start, before_end, after_start, after_end, last_start, last_end) if d]
+    span_start, span_end = min(bounds), max(bounds)
+
+    # Fetches: first site_*, then neighbor_* to run in two phases
+    Fetch = Tuple[str, Optional[str]]  # (mkey, tech)
+    site_fetches: List[Fetch] = [(mkey, tech) for _, mkey, tech in plan if mkey.startswith('site_')]
+    nb_fetches: List[Fetch] = [(mkey, tech) for _, mkey, tech in plan if mkey.startswith('nb_')]
+
+    # Neighbor set is resolved once per (site, radius, vecinos) and shared by every nb_* fetch
+    neighbors: Optional[List[str]] = None
+
+    def run_fetch(fetch: Fetch) -> Tuple[Fetch, Optional[pd.DataFrame], float]:
+        mkey, tech = fetch
         t0 = time.perf_counter()
-        val = _compute_range(req.site_att, tech, s, e, mkey, req.radius_km, None, req.vecinos)
-        elapsed = time.perf_counter() - t0
-        return task, val, elapsed
+        with span(f"fetch {mkey}:{tech}", cat="fetch"):
+            df = _fetch_frame(req.site_att, tech, span_start, span_end, mkey, req.radius_km, req.vecinos, neighbors=neighbors)
+        return fetch, df, time.perf_counter() - t0
 
-    # Global time budget to return partial results
-    GLOBAL_BUDGET_S = 45.0
-    start_time = time.perf_counter()
-    results: Dict[Task, Optional[float]] = {}
+    frames: Dict[Fetch, Optional[pd.DataFrame]] = {}
 
-    def run_phase(phase_tasks: List[Task]) -> None:
-        nonlocal results
-        if not phase_tasks:
+    def run_phase(phase_fetches: List[Fetch]) -> None:
+        if not phase_fetches:
             return
-        remaining = GLOBAL_BUDGET_S - (time.perf_counter() - start_time)
-        if remaining <= 0:
+        remaining = budget.remaining_s()
+        if remaining <= 0 or budget.expired():
+            budget.record('skipped', fetches=[f"{mkey}:{tech}" for mkey, tech in phase_fetches])
             return
-        ex = concurrent.futures.ThreadPoolExecutor(max_workers=6)
+        ex = get_executor().group(max_workers=6)
         try:
-            future_map = {ex.submit(run_task, t): t for t in phase_tasks}
-            for fut in concurrent.futures.as_completed(future_map, timeout=remaining if remaining > 0 else None):
-                task, val, elapsed = fut.result()
-                results[task] = val
+            future_map = {ex.submit(propagate(run_bound), budget, run_fetch, f): f for f in phase_fetches}
+            for fut in concurrent.futures.as_completed(future_map, timeout=remaining):
+                fetch, df, elapsed = fut.result()
+                frames[fetch] = df
                 if req.debug:
-                    name, mkey, tech, window = task
-                    debug_timings[f"{mkey}:{tech}:{window}"] = elapsed
-                if time.perf_counter() - start_time > GLOBAL_BUDGET_S:
-                    print("[evaluate] Global time budget exceeded; returning partial results")
-                    for f in future_map.keys():
-                        if not f.done():
-                            f.cancel()
-                    ex.shutdown(wait=False, cancel_futures=True)
-                    return
+                    mkey, tech = fetch
+                    debug_timings[f"{mkey}:{tech}:span"] = elapsed
         except concurrent.futures.TimeoutError:
             print("[evaluate] Phase timed out; continuing with partial results")
+            pending = [f for f in phase_fetches if f not in frames]
+            budget.record('timeout', fetches=[f"{mkey}:{tech}" for mkey, tech in pending])
+            budget.cancel_all(reason='global budget')
         finally:
             try:
                 ex.shutdown(wait=False, cancel_futures=True)
@@ -434,9 +517,35 @@ def evaluate(req: EvaluateRequest) -> EvaluateResponse:
                 pass
 
     # Phase 1: site metrics
-    run_phase(site_tasks)
+    with span("phase site", cat="phase", fetches=len(site_fetches)):
+        run_phase(site_fetches)
     # Phase 2: neighbors if time remains
-    run_phase(nb_tasks)
+    nb_failed = False
+    if not budget.expired() and nb_fetches:
+        t0 = time.perf_counter()
+        with span("neighbors:resolve", cat="phase") as sp:
+            # None is a failed or timed-out lookup, [] a site without neighbors
+            neighbors = _call_with_timeout(get_neighbor_sites_cached, 10.0, req.site_att, radius_km=req.radius_km, vecinos=req.vecinos)
+            sp.set(neighbors=len(neighbors) if neighbors is not None else None)
+        if req.debug:
+            debug_timings["neighbors:resolve"] = time.perf_counter() - t0
+        if neighbors is None:
+            nb_failed = True
+            budget.record('skipped', reason='neighbors unavailable', fetches=[f"{mkey}:{tech}" for mkey, tech in nb_fetches])
+    if not nb_failed:
+        with span("phase neighbors", cat="phase", fetches=len(nb_fetches)):
+            run_phase(nb_fetches)
+
+    # Window means from the in-memory frames
+    Task = Tuple[str, str, Optional[str], str]  # (name, mkey, tech, window)
+    windows = ['before', 'after'] + (['last'] if (last_start and last_end) else [])
+    results: Dict[Task, Optional[float]] = {}
+    with span("window_means", cat="pandas"):
+        for name, mkey, tech in plan:
+            df = frames.get((mkey, tech))
+            for window in windows:
+                s, e = window_bounds(window)
+                results[(name, mkey, tech, window)] = _window_value(_slice_window(df, s, e), mkey)
 
     # Assemble metric entries
     for name, mkey, tech in plan:
@@ -468,115 +577,31 @@ def evaluate(req: EvaluateRequest) -> EvaluateResponse:
     else:
         overall = "Inconclusive"
 
-    # Build consolidated datasets under remaining global budget
+    # Build consolidated datasets from the same frames (no further DB round trips)
     data_payload: Dict[str, Any] = {
         "site": {"cqi": {}, "traffic": {}, "voice": {}},
         "neighbors": {"cqi": {}, "traffic": {}, "voice": {}, "geo": []},
     }
-
-    # Prepare dataset tasks (windowed)
-    DTask = Tuple[str, str, Optional[str], str]  # (scope:site|neighbors, mkey, tech, window)
-    d_tasks: List[DTask] = []
-    for tech in ("3G", "4G", "5G"):
-        d_tasks.append(("site", "site_cqi", tech, "before"))
-        d_tasks.append(("site", "site_cqi", tech, "after"))
-        # Always include the guard gap between 'before' and 'after'
-        d_tasks.append(("site", "site_cqi", tech, "between"))
-        if last_start and last_end:
-            # Include the span between 'after' and 'last' as 'mid'
-            d_tasks.append(("site", "site_cqi", tech, "mid"))
-            d_tasks.append(("site", "site_cqi", tech, "last"))
-        d_tasks.append(("neighbors", "nb_cqi", tech, "before"))
-        d_tasks.append(("neighbors", "nb_cqi", tech, "after"))
-        d_tasks.append(("neighbors", "nb_cqi", tech, "between"))
-        if last_start and last_end:
-            d_tasks.append(("neighbors", "nb_cqi", tech, "mid"))
-            d_tasks.append(("neighbors", "nb_cqi", tech, "last"))
-    # totals
-    for mkey_site, mkey_nb in (("site_data", "nb_data"), ("site_voice", "nb_voice")):
-        for w in ("before", "after"):
-            d_tasks.append(("site", mkey_site, None, w))
-            d_tasks.append(("neighbors", mkey_nb, None, w))
-        # Always include the guard gap between 'before' and 'after'
-        d_tasks.append(("site", mkey_site, None, "between"))
-        d_tasks.append(("neighbors", mkey_nb, None, "between"))
-        if last_start and last_end:
-            d_tasks.append(("site", mkey_site, None, "mid"))
-            d_tasks.append(("site", mkey_site, None, "last"))
-            d_tasks.append(("neighbors", mkey_nb, None, "mid"))
-            d_tasks.append(("neighbors", mkey_nb, None, "last"))
-
-    def dtask_window_bounds(window: str) -> Tuple[Optional[date], Optional[date]]:
-        if window == "before":
-            return before_start, before_end
-        if window == "after":
-            return after_start, after_end
-        if window == "between":
-            # define the guard gap as the days strictly between before_end and after_start
-            s = (before_end + timedelta(days=1)) if before_end else None
-            e = (after_start - timedelta(days=1)) if after_start else None
-            if s and e and s > e:
-                return None, None
-            return s, e
-        if window == "mid":
-            # define the span between end of after and start of last, if last exists
-            if not (last_start and last_end):
-                return None, None
-            s = (after_end + timedelta(days=1)) if after_end else None
-            e = (last_start - timedelta(days=1)) if last_start else None
-            if s and e and s > e:
-                return None, None
-            return s, e
-        return last_start, last_end
-
-    def run_dtask(task: DTask) -> Tuple[DTask, list]:
-        scope, mkey, tech, window = task
-        s, e = dtask_window_bounds(window)
-        recs = _fetch_timeseries(req.site_att, tech, s, e, mkey, req.radius_km, req.vecinos)
-        return task, recs
-
-    # Execute dataset tasks with remaining budget
-    remaining = 25.0 - (time.perf_counter() - start_time)
-    d_results: Dict[DTask, list] = {}
-    if remaining > 0:
-        ex = concurrent.futures.ThreadPoolExecutor(max_workers=6)
-        try:
-            future_map = {ex.submit(run_dtask, t): t for t in d_tasks}
-            for fut in concurrent.futures.as_completed(future_map, timeout=remaining):
-                task, recs = fut.result()
-                d_results[task] = recs
-        except concurrent.futures.TimeoutError:
-            print("[evaluate] dataset collection timed out; returning partial datasets")
-        finally:
-            try:
-                ex.shutdown(wait=False, cancel_futures=True)
-            except Exception:
-                pass
-
-    # Collate into payload
-    def put(scope: str, kind: str, tech: Optional[str], window: str, recs: list):
-        target = data_payload[scope]
-        bucket = None
-        if kind in ("site_cqi", "nb_cqi"):
-            bucket = target["cqi"]
-        elif kind in ("site_data", "nb_data"):
-            bucket = target["traffic"]
-        elif kind in ("site_voice", "nb_voice"):
-            bucket = target["voice"]
-        key = tech or "total"
-        if key not in bucket:
-            bucket[key] = {"before": [], "after": [], "between": [], "mid": [], "last": []}
-        if window not in bucket[key]:
-            bucket[key][window] = []
-        bucket[key][window] = recs
-
-    for task, recs in d_results.items():
-        scope, mkey, tech, window = task
-        put(scope, mkey, tech, window, recs)
+    # Always include the guard gap between 'before' and 'after'; 'mid' is the span between 'after' and 'last'
+    d_windows = ['before', 'after', 'between'] + (['mid', 'last'] if (last_start and last_end) else [])
+    KIND = {
+        'site_cqi': ('site', 'cqi'), 'site_data': ('site', 'traffic'), 'site_voice': ('site', 'voice'),
+        'nb_cqi': ('neighbors', 'cqi'), 'nb_data': ('neighbors', 'traffic'), 'nb_voice': ('neighbors', 'voice'),
+    }
+    with span("payload", cat="pandas", data_format=req.data_format):
+        for (mkey, tech), df in frames.items():
+            scope, kind = KIND[mkey]
+            key = tech or "total"
+            bucket = data_payload[scope][kind].setdefault(
+                key, {w: _window_records(None, mkey, req.data_format) for w in ("before", "after", "between", "mid", "last")})
+            for window in d_windows:
+                s, e = window_bounds(window)
+                bucket[window] = _window_records(_slice_window(df, s, e), mkey, req.data_format)
 
     # Neighbors geo (one-shot, outside windows)
     try:
-        geo = get_neighbors_geo(req.site_att, radius_km=req.radius_km, vecinos=req.vecinos) or []
+        with span("neighbors:geo", cat="phase"):
+            geo = get_neighbors_geo(req.site_att, radius_km=req.radius_km, vecinos=req.vecinos) or []
         data_payload["neighbors"]["geo"] = geo
     except Exception as e:
         print(f"[evaluate] neighbors geo error: {e}")
@@ -594,8 +619,10 @@ def evaluate(req: EvaluateRequest) -> EvaluateResponse:
                 "after": {"from": str(after_start), "to": str(after_end)},
                 "last": {"from": str(last_start) if last_start else None, "to": str(last_end) if last_end else None},
             },
-            "global_budget_s": 25.0,
-            "partial": len({k: v for k, v in results.items() if v is not None}) < (len(site_tasks) + len(nb_tasks)),
+            "global_budget_s": GLOBAL_BUDGET_S,
+            "partial": nb_failed or len(frames) < (len(site_fetches) + len(nb_fetches)) or any(df is None for df in frames.values()),
+            # Timeouts, statements killed by statement_timeout and cancelled in-flight queries
+            "budget": budget.summary(),
             **({"debug_timings": debug_timings, "max_date_source": max_date_source} if req.debug else {}),
         },
         overall=overall,  # type: ignore[arg-type]
@@ -0,0 +1,360 @@
+from datetime import date, timedelta
+from typing import List, Optional, Dict, Tuple
+import json
+import time
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.core.settings import settings
+from .evaluate import (
+    EvaluateResponse,
+    MetricEvaluation,
+    DATA_COLS,
+    VOICE_COLS,
+    GLOBAL_BUDGET_S,
+    _classify,
+    _call_with_timeout,
+)
+from cell_change_evolution.select_db_master_node import get_max_date
+from cell_change_evolution.data_watermark import get_watermark_max_date
+from cell_change_evolution.select_db_cqi_daily import (
+    get_umts_cqi_daily_calculated,
+    get_lte_cqi_daily_calculated,
+    get_nr_cqi_daily_calculated,
+    get_traffic_data_daily,
+    get_traffic_voice_daily,
+)
+from cell_change_evolution.select_db_neighbor_cqi_daily import get_neighbor_sites_cached
+from cell_change_evolution.query_budget import QueryBudget, run_bound
+from cell_change_evolution.executor import get_executor
+
+router = APIRouter(prefix="/evaluate", tags=["evaluate"])
+
+
+# ----- Models -----
+class BatchSite(BaseModel):
+    site_att: str = Field(..., description="Site ATT identifier")
+    input_date: date = Field(..., description="Reference input date")
+    vecinos: str = Field("", description="Neighbors ATT sites (empty: neighbors within radius_km)")
+
+
+class EvaluateBatchRequest(BaseModel):
+    sites: List[BatchSite] = Field(..., min_length=1, description="Sites to evaluate")
+    threshold: float = Field(0.05, ge=0.0, le=1.0, description="Delta threshold as fraction, default 0.05 (5%)")
+    period: int = Field(7, ge=1, le=90, description="Period window in days")
+    guard: int = Field(7, ge=0, le=90, description="Guard window in days")
+    radius_km: float = Field(5.0, ge=0, le=50, description="Neighbor aggregation radius in km")
+    chunk_size: Optional[int] = Field(None, ge=1, le=500, description="Sites per grouped DB read (default EVAL_BATCH_CHUNK_SIZE)")
+
+
+# Same metrics, in the same order, as the single-site evaluation
+PLAN: List[Tuple[str, str, Optional[str]]] = (
+    [(f"Site CQI {t}", 'site_cqi', t) for t in ("3G", "4G", "5G")]
+    + [("Site Data (3G+4G+5G)", 'site_data', None), ("Site Voice (3G+VoLTE)", 'site_voice', None)]
+    + [(f"Neighbors CQI {t}", 'nb_cqi', t) for t in ("3G", "4G", "5G")]
+    + [("Neighbors Data (3G+4G+5G)", 'nb_data', None), ("Neighbors Voice (3G+VoLTE)", 'nb_voice', None)]
+)
+WINDOWS = ('before', 'after', 'last')
+CQI_SELECTORS = {
+    '3G': (get_umts_cqi_daily_calculated, 'umts_cqi'),
+    '4G': (get_lte_cqi_daily_calculated, 'lte_cqi'),
+    '5G': (get_nr_cqi_daily_calculated, 'nr_cqi'),
+}
+NB_DATA_TECHS = ('3G', '4G', '5G')
+NB_VOICE_TECHS = ('3G', '4G')
+
+# Verdict per (after/before bucket, last/before bucket), taken from _classify so both paths agree
+_BUCKET_DELTA = {"Up": 1.0, "Flat": 0.0, "Down": -1.0}
+VERDICTS = {(a, b): _classify(da, db, 0.5)[1] for a, da in _BUCKET_DELTA.items() for b, db in _BUCKET_DELTA.items()}
+
+
+# ----- Vectorized helpers -----
+def _to_time(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df['time'] = pd.to_datetime(df['time'], errors='coerce')
+    return df
+
+
+def _row_totals(df: pd.DataFrame, cols: List[str]) -> pd.Series:
+    """Row sums over `cols` ignoring zeros/NaNs; NaN where a row has no value (as _sum_mean)."""
+    cols = [c for c in cols if c in df.columns]
+    num = df[cols].apply(lambda s: pd.to_numeric(s, errors='coerce')).replace([np.inf, -np.inf, 0], np.nan)
+    return num.sum(axis=1, min_count=1)
+
+
+def _expand_to_items(values: pd.DataFrame, keys: pd.DataFrame, on: str) -> pd.DataFrame:
+    """Attach item indexes to (on, time, value) rows: one copy of a row per item keyed by `on`."""
+    if values.empty or keys.empty:
+        return pd.DataFrame(columns=['idx', 'time', 'value'])
+    return values.merge(keys, on=on, how='inner')[['idx', 'time', 'value']]
+
+
+def _neighbor_mean(rows: pd.DataFrame, pairs: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Per item and day, the mean of `cols` over its neighbors' rows.
+
+    Same aggregation as the neighbor selectors (AVG per column per date over the
+    neighbor rows), computed from site-level rows fetched once for the whole chunk.
+    """
+    if rows.empty or pairs.empty:
+        return pd.DataFrame(columns=['idx', 'time'] + cols)
+    rows = rows[['site_att', 'time'] + cols].copy()
+    for c in cols:
+        rows[c] = pd.to_numeric(rows[c], errors='coerce').replace([np.inf, -np.inf], np.nan)
+    joined = pairs.merge(rows, left_on='neighbor', right_on='site_att', how='inner')
+    return joined.groupby(['idx', 'time'], as_index=False)[cols].mean()
+
+
+def _window_means(rows: pd.DataFrame, bounds: pd.DataFrame) -> pd.DataFrame:
+    """Mean of `value` per item inside each window (zeros ignored), as an idx x window frame."""
+    out = pd.DataFrame(np.nan, index=bounds.index, columns=list(WINDOWS))
+    if rows.empty:
+        return out
+    rows = rows.merge(bounds, left_on='idx', right_index=True, how='inner')
+    value = pd.to_numeric(rows['value'], errors='coerce').replace([np.inf, -np.inf, 0], np.nan)
+    for w in WINDOWS:
+        mask = (rows['time'] >= rows[f'{w}_start']) & (rows['time'] <= rows[f'{w}_end'])
+        out[w] = value.where(mask).groupby(rows['idx']).mean().reindex(bounds.index)
+    return out
+
+
+def _deltas(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (a - b) / np.maximum(np.abs(b), 1e-9)
+
+
+def _buckets(d: np.ndarray, thr: float) -> np.ndarray:
+    return np.select([d >= thr, d <= -thr], ["Up", "Down"], default="Flat")
+
+
+def _overall(verdicts: List[str]) -> str:
+    # Same roll-up as /evaluate
+    if all(v == "Pass" for v in verdicts):
+        return "Pass"
+    if any(v == "Restored" for v in verdicts) and all(v in ("Pass", "Restored") for v in verdicts):
+        return "Restored"
+    if any(v == "Fail" for v in verdicts):
+        return "Fail"
+    return "Inconclusive"
+
+
+def _opt(x: float) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+
+# ----- Chunk evaluation -----
+def _evaluate_chunk(items: List[Tuple[int, BatchSite]], req: EvaluateBatchRequest, max_d: Optional[date], budget: QueryBudget) -> List[dict]:
+    """Evaluate a group of sites with one grouped read per selector (`site_att = ANY(...)`)."""
+    ex = get_executor().group(max_workers=6)
+    try:
+        # Windows per item (same definitions as /evaluate); `last` ends at the global max date
+        bounds = pd.DataFrame(index=[i for i, _ in items])
+        bounds['before_end'] = [pd.Timestamp(s.input_date - timedelta(days=req.guard + 1)) for _, s in items]
+        bounds['before_start'] = bounds['before_end'] - pd.Timedelta(days=req.period - 1)
+        bounds['after_start'] = [pd.Timestamp(s.input_date + timedelta(days=req.guard + 1)) for _, s in items]
+        bounds['after_end'] = bounds['after_start'] + pd.Timedelta(days=req.period - 1)
+        bounds['last_end'] = pd.Timestamp(max_d) if max_d else pd.NaT
+        bounds['last_start'] = bounds['last_end'] - pd.Timedelta(days=req.period - 1)
+        span_start = bounds['before_start'].min().date()
+        span_end = max(bounds['after_end'].max().date(), max_d or date.min)
+
+        centers = sorted({s.site_att for _, s in items})
+        keys = pd.DataFrame({'idx': [i for i, _ in items], 'site_att': [s.site_att for _, s in items]})
+
+        # Neighbor sets (cached per site/radius/vecinos)
+        nb_futs = {
+            i: ex.submit(run_bound, budget, _call_with_timeout, get_neighbor_sites_cached, 10.0,
+                         s.site_att, radius_km=req.radius_km, vecinos=s.vecinos)
+            for i, s in items
+        }
+        neighbor_sets = {i: f.result() for i, f in nb_futs.items()}
+        pairs = pd.DataFrame(
+            [(i, n) for i, nbs in neighbor_sets.items() for n in (nbs or [])],
+            columns=['idx', 'neighbor'],
+        )
+        nb_sites = sorted(set(pairs['neighbor']))
+
+        # Grouped reads: CQI over centers + neighbors, traffic joined for centers, per tech for neighbors
+        frm, to = str(span_start), str(span_end)
+        fetches = {}
+        for tech, (fn, _) in CQI_SELECTORS.items():
+            fetches[('cqi', tech)] = (fn, 15.0, dict(att_name=sorted(set(centers) | set(nb_sites)), min_date=frm, max_date=to))
+        fetches[('site_data', None)] = (get_traffic_data_daily, 15.0, dict(att_name=centers, min_date=frm, max_date=to, technology=None, vendor=None))
+        fetches[('site_voice', None)] = (get_traffic_voice_daily, 15.0, dict(att_name=centers, min_date=frm, max_date=to, technology=None, vendor=None))
+        if nb_sites:
+            for tech in NB_DATA_TECHS:
+                fetches[('nb_data', tech)] = (get_traffic_data_daily, 15.0, dict(att_name=nb_sites, min_date=frm, max_date=to, technology=tech, vendor=None))
+            for tech in NB_VOICE_TECHS:
+                fetches[('nb_voice', tech)] = (get_traffic_voice_daily, 15.0, dict(att_name=nb_sites, min_date=frm, max_date=to, technology=tech, vendor=None))
+        futs = {k: ex.submit(run_bound, budget, _call_with_timeout, fn, t, **kw) for k, (fn, t, kw) in fetches.items()}
+        frames: Dict[Tuple[str, Optional[str]], Optional[pd.DataFrame]] = {}
+        for k, f in futs.items():
+            df = f.result()
+            frames[k] = _to_time(df) if isinstance(df, pd.DataFrame) else None
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    # Per-item (idx, time, value) series for every metric of the plan
+    series: Dict[Tuple[str, Optional[str]], Optional[pd.DataFrame]] = {}
+    for tech, (_, col) in CQI_SELECTORS.items():
+        df = frames[('cqi', tech)]
+        if df is None:
+            series[('site_cqi', tech)] = series[('nb_cqi', tech)] = None
+            continue
+        vals = df[['site_att', 'time']].assign(value=pd.to_numeric(df[col], errors='coerce'))
+        series[('site_cqi', tech)] = _expand_to_items(vals, keys, 'site_att')
+        nb = _neighbor_mean(df.rename(columns={col: 'value'}), pairs, ['value'])
+        series[('nb_cqi', tech)] = nb
+    for mkey, cols in (('site_data', DATA_COLS), ('site_voice', VOICE_COLS)):
+        df = frames[(mkey, None)]
+        series[(mkey, None)] = None if df is None else _expand_to_items(
+            df[['site_att', 'time']].assign(value=_row_totals(df, cols)), keys, 'site_att')
+    for mkey, techs, cols in (('nb_data', NB_DATA_TECHS, DATA_COLS), ('nb_voice', NB_VOICE_TECHS, VOICE_COLS)):
+        if not nb_sites:
+            series[(mkey, None)] = pd.DataFrame(columns=['idx', 'time', 'value'])
+            continue
+        parts = [frames.get((mkey, t)) for t in techs]
+        if any(p is None for p in parts):
+            series[(mkey, None)] = None
+            continue
+        rows = pd.concat([
+            p.reindex(columns=['site_att', 'time'] + cols).astype({c: float for c in cols}) for p in parts
+        ], ignore_index=True)
+        avg = _neighbor_mean(rows, pairs, cols)
+        series[(mkey, None)] = avg[['idx', 'time']].assign(value=_row_totals(avg, cols))
+
+    # Window means as (items x metrics) arrays, then deltas/buckets/verdicts for all at once
+    n_items, n_metrics = len(items), len(PLAN)
+    means = {w: np.full((n_items, n_metrics), np.nan) for w in WINDOWS}
+    missing = np.zeros(n_items, dtype=bool)
+    for j, (_, mkey, tech) in enumerate(PLAN):
+        rows = series.get((mkey, tech))
+        if rows is None:
+            missing[:] = True
+            continue
+        wm = _window_means(rows, bounds)
+        scale = 100.0 if mkey.endswith('cqi') else 1.0
+        for w in WINDOWS:
+            means[w][:, j] = wm[w].to_numpy(dtype=float) * scale
+    if not max_d:
+        means['last'][:] = np.nan
+    d_ab = _deltas(means['after'], means['before'])
+    d_lb = _deltas(means['last'], means['before'])
+    b_ab = _buckets(d_ab, req.threshold)
+    b_lb = _buckets(d_lb, req.threshold)
+    klass = np.char.add(b_ab, b_lb)
+    verdict = np.vectorize(lambda a, b: VERDICTS[(a, b)], otypes=[object])(b_ab, b_lb)
+
+    # One response per item, same shape as /evaluate without the data payload
+    nb_failed = {i for i, nbs in neighbor_sets.items() if nbs is None}
+    out = []
+    for r, (i, s) in enumerate(items):
+        metrics = [
+            MetricEvaluation(
+                name=name,
+                before_mean=_opt(means['before'][r, j]),
+                after_mean=_opt(means['after'][r, j]),
+                last_mean=_opt(means['last'][r, j]),
+                delta_after_before=_opt(d_ab[r, j]),
+                delta_last_before=_opt(d_lb[r, j]),
+                klass=str(klass[r, j]),  # type: ignore[arg-type]
+                verdict=verdict[r, j],
+            )
+            for j, (name, _, _) in enumerate(PLAN)
+        ]
+        b = bounds.loc[i]
+        resp = EvaluateResponse(
+            site_att=s.site_att,
+            input_date=s.input_date,
+            options={
+                "threshold": req.threshold,
+                "period": req.period,
+                "guard": req.guard,
+                "radius_km": req.radius_km,
+                "ranges": {
+                    "before": {"from": str(b['before_start'].date()), "to": str(b['before_end'].date())},
+                    "after": {"from": str(b['after_start'].date()), "to": str(b['after_end'].date())},
+                    "last": {"from": str(b['last_start'].date()) if max_d else None, "to": str(max_d) if max_d else None},
+                },
+                "partial": bool(missing[r]) or i in nb_failed,
+            },
+            overall=_overall(list(verdict[r])),  # type: ignore[arg-type]
+            metrics=metrics,
+        )
+        out.append({"index": i, **resp.model_dump(mode="json")})
+    return out
+
+
+def _batch_max_date() -> Optional[date]:
+    """End of the `last` window, shared by every site of the batch (as /evaluate, without the per-site probe)."""
+    max_d = _call_with_timeout(get_max_date, 8.0)
+    if not max_d:
+        max_d = get_watermark_max_date(['umts_cqi_daily', 'lte_cqi_daily', 'nr_cqi_daily',
+                                        'umts_cell_traffic_daily', 'lte_cell_traffic_daily'], combine=max)
+    return max_d
+
+
+def _run_chunk(n: int, chunk: List[Tuple[int, BatchSite]], req: EvaluateBatchRequest, max_d: Optional[date], budgets: List[QueryBudget]) -> List[dict]:
+    # The budget starts when the chunk does, not while it waits for a worker
+    budget = QueryBudget(GLOBAL_BUDGET_S, label=f'evaluate_batch:{n}')
+    budgets.append(budget)
+    with budget.bind():
+        try:
+            return _evaluate_chunk(chunk, req, max_d, budget)
+        finally:
+            budget.cancel_all(reason='chunk finished')
+
+
+def _ndjson(obj: dict) -> bytes:
+    return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+
+@router.post("/batch")
+def evaluate_batch(req: EvaluateBatchRequest) -> StreamingResponse:
+    """Evaluate many sites with shared options, streaming one NDJSON line per site.
+
+    Sites are grouped into chunks (sorted by input_date so each chunk reads a narrow date
+    span); every chunk issues one `site_att = ANY(...)` read per selector instead of one
+    per site, and windows/deltas/verdicts are computed for the whole chunk at once.
+    Lines carry `index` (position in `sites`); a final `{"summary": ...}` line closes the stream.
+    """
+    chunk_size = req.chunk_size or settings.EVAL_BATCH_CHUNK_SIZE
+    ordered = sorted(enumerate(req.sites), key=lambda x: (x[1].input_date, x[1].site_att))
+    chunks = [ordered[k:k + chunk_size] for k in range(0, len(ordered), chunk_size)]
+
+    def stream():
+        t0 = time.perf_counter()
+        max_d = _batch_max_date()
+        budgets: List[QueryBudget] = []
+        errors = 0
+        ex = get_executor().group(max_workers=settings.EVAL_BATCH_CONCURRENCY)
+        try:
+            futs = {ex.submit(_run_chunk, n, chunk, req, max_d, budgets): chunk for n, chunk in enumerate(chunks)}
+            for fut in concurrent.futures.as_completed(futs):
+                chunk = futs[fut]
+                try:
+                    lines = fut.result()
+                except Exception as e:
+                    print(f"[evaluate_batch] Chunk error: {e}")
+                    errors += len(chunk)
+                    lines = [{"index": i, "site_att": s.site_att, "input_date": str(s.input_date), "error": str(e)} for i, s in chunk]
+                for line in lines:
+                    yield _ndjson(line)
+            yield _ndjson({"summary": {
+                "sites": len(req.sites),
+                "chunks": len(chunks),
+                "errors": errors,
+                "max_date": str(max_d) if max_d else None,
+                "elapsed_s": round(time.perf_counter() - t0, 3),
+            }})
+        finally:
+            # Client gone or stream finished: nothing may keep running on the database
+            ex.shutdown(wait=False, cancel_futures=True)
+            for budget in list(budgets):
+                budget.cancel_all(reason='batch finished')
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
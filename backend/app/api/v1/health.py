@@ -1,4 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
+
+from cell_change_evolution.db_pool import pool_stats
+from cell_change_evolution.metrics import render_text
+from app.core.metrics import PROMETHEUS_MEDIA_TYPE
 
 router = APIRouter()
 
@@ -6,3 +11,19 @@ router = APIRouter()
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@router.get("/health/db")
+def health_db():
+    """Connection pool utilization per role (checked out vs capacity)."""
+    pools = pool_stats()
+    saturation = max((p["saturation"] for p in pools.values()), default=0.0)
+    return {"status": "ok", "saturation": saturation, "pools": pools}
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text format: request latency per route, selector query/pandas time,
+    serialization time, pool utilization, cache hit ratios, budget timeouts and job queues.
+    Values are per API worker process."""
+    return Response(render_text(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -4,22 +4,21 @@ from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Tuple
 import io
-import base64
-import pandas as pd
-
-from .evaluate import EvaluateRequest, evaluate
-from cell_change_evolution.select_db_cqi_daily import (
-    get_cqi_daily,
-    get_traffic_data_daily,
-    get_traffic_voice_daily,
-)
-from cell_change_evolution.select_db_neighbor_cqi_daily import (
-    get_neighbor_cqi_daily,
-    get_neighbor_traffic_data,
-    get_neighbor_traffic_voice,
-)
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+from .evaluate import EvaluateRequest, evaluate_cached, _cache_params, _call_with_timeout, DATA_COLS, VOICE_COLS
+from app.core.settings import settings
+from app.core.result_cache import ResultCache, watermark_token
+from app.core.charts import render_chart, render_pdf
+from app.core.job_queue import DONE, FAILED, Job, LocalJobQueue, QueueFull
+from cell_change_evolution.data_watermark import get_data_watermark_cached
+from cell_change_evolution.tracing import current_span, traced
 
 router = APIRouter(prefix="/report", tags=["report"]) 
+RETRY_AFTER_S = 5
 
 class ReportRequest(EvaluateRequest):
     include_debug: bool = Field(False, description="Include debug timings/metadata in the report")
@@ -47,64 +46,113 @@ HTML_STYLE = """
   </style>
 """
 
-def _parse_date(s: Optional[str]) -> Optional[pd.Timestamp]:
-    try:
-        return pd.to_datetime(s) if s else None
-    except Exception:
-        return None
+# (title, scope, kind, tech key, columns): charts are drawn from the /evaluate data payload
+CHARTS: List[Tuple[str, str, str, str, List[str]]] = [
+    ('Site CQI 4G', 'site', 'cqi', '4G', ['lte_cqi']),
+    ('Site Data Traffic 4G', 'site', 'traffic', 'total', [c for c in DATA_COLS if c[1:3] == '4g']),
+    ('Site Voice Traffic 4G', 'site', 'voice', 'total', [c for c in VOICE_COLS if 'volte' in c]),
+    ('Neighbors CQI 4G', 'neighbors', 'cqi', '4G', ['lte_cqi']),
+    ('Neighbors Data Traffic 4G', 'neighbors', 'traffic', 'total', [c for c in DATA_COLS if c[1:3] == '4g']),
+    ('Neighbors Voice Traffic 4G', 'neighbors', 'voice', 'total', [c for c in VOICE_COLS if 'volte' in c]),
+]
+# Payload windows in time order; together they cover before.from .. last.to
+CHART_WINDOWS = ('before', 'between', 'after', 'mid', 'last')
 
+# Rendered images keyed by the evaluation parameters, chart and data watermark
+_chart_cache = ResultCache(
+    "report_charts",
+    ttl_s=settings.EVAL_CACHE_TTL_S,
+    maxsize=settings.REPORT_CHART_CACHE_MAXSIZE,
+    directory=settings.EVAL_CACHE_DIR,
+    disk_ttl_s=settings.EVAL_CACHE_DISK_TTL_S,
+)
+_render_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
 
-def _mk_plot_image(df: Optional[pd.DataFrame], y_cols: List[str], title: str, ranges: dict) -> Optional[str]:
-    if df is None or not isinstance(df, pd.DataFrame) or df.empty:
-        return None
-    try:
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-    except Exception:
-        return None
-    # Prepare data
-    df = df.copy()
-    if 'time' in df.columns:
-        df['__t'] = pd.to_datetime(df['time'], errors='coerce')
-    elif 'date' in df.columns:
-        df['__t'] = pd.to_datetime(df['date'], errors='coerce')
-    else:
-        return None
-    df = df.dropna(subset=['__t']).sort_values('__t')
-    if df.empty:
+
+def _get_render_pool() -> Optional[concurrent.futures.ProcessPoolExecutor]:
+    """Process pool for charts and PDFs, shared by every report in this worker (None renders inline)."""
+    global _render_pool
+    if settings.REPORT_CHART_WORKERS <= 0:
         return None
-    # Plot
-    fig, ax = plt.subplots(figsize=(7.5, 2.6), dpi=150)
-    colors = ['#2563eb', '#16a34a', '#ca8a04', '#dc2626']
-    for i, col in enumerate(y_cols):
-        if col in df.columns:
-            ax.plot(df['__t'], pd.to_numeric(df[col], errors='coerce'), label=col, color=colors[i % len(colors)], linewidth=1.4)
-    # Shade ranges
-    b = ranges.get('before') or {}
-    a = ranges.get('after') or {}
-    l = ranges.get('last') or {}
-    def shade(rng, color, alpha):
-        s = _parse_date((rng or {}).get('from'))
-        e = _parse_date((rng or {}).get('to'))
-        if s is not None and e is not None:
-            ax.axvspan(s, e, color=color, alpha=alpha, linewidth=0)
-    shade(b, '#3b82f6', 0.10)
-    shade(a, '#22c55e', 0.10)
-    shade(l, '#0ea5e9', 0.04)
-    # Styling
-    ax.grid(True, linestyle='--', linewidth=0.4, alpha=0.4)
-    ax.set_title(title)
-    ax.legend(loc='upper right', fontsize=8)
-    fig.autofmt_xdate()
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format='png')
-    plt.close(fig)
-    data_uri = 'data:image/png;base64,' + base64.b64encode(buf.getvalue()).decode('ascii')
-    return data_uri
+    with _render_pool_lock:
+        if _render_pool is None:
+            # spawn: workers only import app.core.charts, never the pooled engines or server threads
+            _render_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=settings.REPORT_CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _render_pool
+
+
+def _reset_render_pool() -> None:
+    global _render_pool
+    with _render_pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _chart_records(data: dict, scope: str, kind: str, key: str) -> List[dict]:
+    bucket = ((data.get(scope) or {}).get(kind) or {}).get(key) or {}
+    records: List[dict] = []
+    for window in CHART_WINDOWS:
+        rows = bucket.get(window)
+        if isinstance(rows, list):
+            records.extend(rows)
+    return records
+
 
+@traced(cat="report")
+def render_charts(resp: dict, cache_params: Optional[dict] = None) -> List[Tuple[str, Optional[str]]]:
+    """(title, data URI) for every chart in CHARTS, built from the evaluation payload.
 
+    Images are served from `_chart_cache` when `cache_params` is given and the payload is
+    complete; the rest are rendered in the chart process pool (inline if it is unavailable).
+    """
+    opts = resp.get('options', {}) or {}
+    ranges = opts.get('ranges', {}) or {}
+    data = resp.get('data') or {}
+    watermark = (opts.get('cache') or {}).get('watermark')
+    cacheable = cache_params is not None and watermark and not opts.get('partial')
+
+    if cacheable:
+        _chart_cache.observe_watermark(watermark)
+    images: dict = {}
+    keys: dict = {}
+    todo: List[Tuple[str, list, List[str]]] = []
+    for title, scope, kind, key, y_cols in CHARTS:
+        if cacheable:
+            keys[title] = ResultCache.make_key({**cache_params, "chart": title}, watermark)
+            cached = _chart_cache.get(keys[title])
+            if cached is not None:
+                images[title] = cached or None
+                continue
+        todo.append((title, _chart_records(data, scope, kind, key), y_cols))
+    rendered = [t[0] for t in todo]
+    current_span().set(charts=len(CHARTS), cached=len(CHARTS) - len(rendered))
+
+    pool = _get_render_pool() if len(todo) > 1 else None
+    if pool is not None:
+        try:
+            futs = {title: pool.submit(render_chart, records, y_cols, title, ranges) for title, records, y_cols in todo}
+            for title, fut in futs.items():
+                images[title] = fut.result()
+            todo = []
+        except Exception as e:
+            # Broken pool (killed worker, no spawn support): fall back to rendering inline
+            print(f"[report] Chart pool unavailable: {e}")
+            _reset_render_pool()
+            todo = [t for t in todo if t[0] not in images]
+    for title, records, y_cols in todo:
+        images[title] = render_chart(records, y_cols, title, ranges)
+
+    if cacheable:
+        for title in rendered:
+            # Empty string marks "no chart" so charts without data are not re-rendered either
+            _chart_cache.set(keys[title], images.get(title) or "")
+    return [(title, images.get(title)) for title, *_ in CHARTS]
+
+
+@traced(cat="report")
 def render_html(resp: dict, include_debug: bool, chart_images: List[Tuple[str, Optional[str]]]) -> str:
     overall = (resp.get("overall") or "Inconclusive").lower()
     opts = resp.get("options", {})
@@ -191,71 +239,143 @@ def render_html(resp: dict, include_debug: bool, chart_images: List[Tuple[str, O
     html = f"<html><head>{HTML_STYLE}</head><body>{head}{''.join(tbl)}{charts_html}{debug_html}</body></html>"
     return html
 
-@router.post("")
-def create_report(req: ReportRequest):
-    # Reuse evaluation logic
+@traced("render_pdf", cat="report")
+def _render_pdf(html: str) -> bytes:
+    """WeasyPrint in the render pool: keeps the GIL-heavy layout work off the API process."""
+    pool = _get_render_pool()
+    if pool is not None:
+        try:
+            return pool.submit(render_pdf, html).result()
+        except BrokenProcessPool as e:
+            print(f"[report] Render pool unavailable: {e}")
+            _reset_render_pool()
+    return render_pdf(html)
+
+
+class ReportFailed(Exception):
+    def __init__(self, message: str, html: Optional[str] = None):
+        super().__init__(message)
+        self.html = html
+
+
+def build_report(req: ReportRequest, job: Optional[Job] = None) -> Tuple[bytes, str]:
+    """(PDF bytes, file name) for a report request; `job` receives progress updates."""
+    def progress(value: float, stage: str) -> None:
+        if job is not None:
+            job.update(value, stage)
+
+    # Reuse the evaluation (served from the result cache when /evaluate already ran it);
+    # charts read the payload as row records
+    req = req.model_copy(update={"data_format": "records"})
+    progress(0.05, "evaluate")
     try:
-        resp_model = evaluate(req)
+        resp_model = evaluate_cached(req)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Evaluation failed: {e}")
-
-    resp_dict = resp_model.model_dump() if hasattr(resp_model, 'model_dump') else resp_model  # pydantic v2/v1
-    # Build charts (exclude map). Focus on 4G metrics to keep report concise.
-    ranges = (resp_dict.get('options', {}) or {}).get('ranges', {}) or {}
-    # Determine plotting window: from 'before.from' to max of after.to/last.to
-    b_from = (ranges.get('before') or {}).get('from')
-    a_to = (ranges.get('after') or {}).get('to')
-    l_to = (ranges.get('last') or {}).get('to')
-    start = b_from
-    end = l_to or a_to
-
-    def _site(series_fn, title: str, y_cols: List[str]) -> Tuple[str, Optional[str]]:
-        try:
-            df = series_fn(att_name=req.site_att, min_date=start, max_date=end, technology='4G')
-        except Exception:
-            df = None
-        img = _mk_plot_image(df, y_cols, title, ranges)
-        return title, img
+        raise ReportFailed(f"Evaluation failed: {e}")
 
-    def _nb(series_fn, title: str, y_cols: List[str]) -> Tuple[str, Optional[str]]:
-        try:
-            df = series_fn(site_list=req.site_att, min_date=start, max_date=end, technology='4G', radius_km=req.radius_km)
-        except Exception:
-            df = None
-        img = _mk_plot_image(df, y_cols, title, ranges)
-        return title, img
-
-    chart_images: List[Tuple[str, Optional[str]]] = []
-    # Site charts (4G)
-    chart_images.append(_site(get_cqi_daily, 'Site CQI 4G', ['lte_cqi']))
-    chart_images.append(_site(
-        get_traffic_data_daily,
-        'Site Data Traffic 4G',
-        ['h4g_traffic_d_user_ps_gb', 's4g_traffic_d_user_ps_gb', 'e4g_traffic_d_user_ps_gb', 'n4g_traffic_d_user_ps_gb']
-    ))
-    chart_images.append(_site(
-        get_traffic_voice_daily,
-        'Site Voice Traffic 4G',
-        ['user_traffic_volte_e', 'user_traffic_volte_h', 'user_traffic_volte_n', 'user_traffic_volte_s']
-    ))
-    # Neighbor charts (4G)
-    chart_images.append(_nb(get_neighbor_cqi_daily, 'Neighbors CQI 4G', ['lte_cqi']))
-    chart_images.append(_nb(get_neighbor_traffic_data, 'Neighbors Data Traffic 4G', ['ps_gb_uldl', 'traffic_dlul_tb']))
-    chart_images.append(_nb(get_neighbor_traffic_voice, 'Neighbors Voice Traffic 4G', ['traffic_voice']))
+    resp_dict = resp_model.model_dump(mode="json")
+    # Charts come from the evaluation payload (no second pass over the database)
+    progress(0.4, "charts")
+    chart_images = render_charts(resp_dict, cache_params=_cache_params(req))
 
     html = render_html(resp_dict, include_debug=req.include_debug, chart_images=chart_images)
-
-    # Try WeasyPrint
+    progress(0.7, "pdf")
     try:
-        from weasyprint import HTML
-        pdf_bytes = HTML(string=html).write_pdf()
-        buf = io.BytesIO(pdf_bytes)
-        headers = {"Content-Disposition": f"attachment; filename=ran_evaluation_{resp_dict.get('site_att','site')}.pdf"}
-        return StreamingResponse(buf, media_type="application/pdf", headers=headers)
+        pdf_bytes = _render_pdf(html)
     except Exception as e:
-        # If WeasyPrint unavailable, return HTML with guidance
         msg = (
             "PDF generation failed. Ensure WeasyPrint is installed and system deps (Cairo, Pango, GDK-PixBuf) are available. "
             f"Error: {e}"
         )
-        return JSONResponse(status_code=500, content={"error": msg, "html_preview": html})
+        raise ReportFailed(msg, html)
+    return pdf_bytes, f"ran_evaluation_{resp_dict.get('site_att','site')}.pdf"
+
+
+def _report_job(job: Job, req: ReportRequest) -> Tuple[bytes, str]:
+    try:
+        return build_report(req, job)
+    except ReportFailed as e:
+        if e.html:
+            job.meta["html_preview"] = e.html
+        raise
+
+
+# In-process stand-in for an external queue: bounded workers, identical requests share a job
+_report_queue = LocalJobQueue(
+    "report",
+    workers=settings.REPORT_JOB_WORKERS,
+    max_pending=settings.REPORT_JOB_MAX_PENDING,
+    ttl_s=settings.REPORT_JOB_TTL_S,
+)
+
+
+def _job_key(req: ReportRequest) -> str:
+    # Same evaluation parameters and data watermark -> same PDF
+    watermark = watermark_token(_call_with_timeout(get_data_watermark_cached, 5.0))
+    params = {**_cache_params(req), "data_format": "records", "include_debug": req.include_debug, "debug": req.debug}
+    return ResultCache.make_key(params, watermark or "")
+
+
+def _submit(req: ReportRequest) -> Tuple[Job, bool]:
+    try:
+        return _report_queue.submit(_job_key(req), _report_job, req)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many reports in progress, retry later",
+                            headers={"Retry-After": str(RETRY_AFTER_S)})
+
+
+def _pdf_response(job: Job) -> StreamingResponse:
+    pdf_bytes, filename = job.result
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers=headers)
+
+
+def _failed_response(job: Job) -> JSONResponse:
+    content = {"error": job.error}
+    if "html_preview" in job.meta:
+        content["html_preview"] = job.meta["html_preview"]
+    return JSONResponse(status_code=500, content=content)
+
+
+@router.post("")
+def create_report(req: ReportRequest):
+    """Synchronous report: queued like a job (shared with identical requests) and awaited.
+
+    Waits at most REPORT_SYNC_WAIT_S; a report still building then answers 202 with the job
+    status and its href, to be polled like `POST /report/jobs`.
+    """
+    job, _ = _submit(req)
+    if not _report_queue.wait(job, settings.REPORT_SYNC_WAIT_S):
+        status = _job_status(job)
+        return JSONResponse(status_code=202, content=status,
+                            headers={"Location": status["href"], "Retry-After": "1"})
+    if job.status != DONE:
+        return _failed_response(job)
+    return _pdf_response(job)
+
+
+@router.post("/jobs", status_code=202)
+def submit_report_job(req: ReportRequest):
+    """Queue a report; poll `GET /report/{job_id}` for progress and the PDF."""
+    job, created = _submit(req)
+    return {**_job_status(job), "created": created}
+
+
+def _job_status(job: Job) -> dict:
+    status = job.to_dict()
+    status.pop("html_preview", None)
+    status["href"] = f"/api/report/{job.id}"
+    return status
+
+
+@router.get("/{job_id}")
+def get_report_job(job_id: str):
+    """Job status while queued/running (202), the PDF once done, the error if it failed."""
+    job = _report_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired report job")
+    if job.status == DONE:
+        return _pdf_response(job)
+    if job.status == FAILED:
+        return _failed_response(job)
+    return JSONResponse(status_code=202, content=_job_status(job), headers={"Retry-After": "1"})
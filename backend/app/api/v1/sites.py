@@ -1,7 +1,8 @@
 from datetime import date
 from typing import List, Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Header, HTTPException
+from fastapi.responses import Response
 import pandas as pd
 import numpy as np
 import math
@@ -26,7 +27,6 @@ from cell_change_evolution.select_db_cqi_daily import (
     get_cqi_daily_calculated,
 )
 from cell_change_evolution.select_db_neighbor_cqi_daily import (
-    get_neighbor_sites,
     get_neighbor_cqi_daily,
     get_neighbor_traffic_data,
     get_neighbor_traffic_voice,
@@ -34,11 +34,35 @@ from cell_change_evolution.select_db_neighbor_cqi_daily import (
 )
 from cell_change_evolution.select_db_neighbor_cqi_daily import (
     get_neighbor_cqi_daily_calculated,
+    get_neighbor_sites_cached,
+    get_nearest_sites,
+    neighbor_cache_key,
+    NEIGHBOR_CACHE_TTL_S,
+    NEIGHBOR_RESOLVER,
+)
+from cell_change_evolution.spatial_index import site_spatial_index
+from cell_change_evolution.ttl_cache import TTLCache
+from cell_change_evolution.schema_cache import get_master_node_columns
+from app.core.site_index import site_index
+from app.core.metrics import timed_serialization
+from app.core.serialization import (
+    FastJSONResponse,
+    df_columnar,
+    negotiate_format,
+    df_arrow_stream,
+    df_parquet,
+    pa,
+    ARROW_STREAM_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE,
 )
 
 router = APIRouter(prefix="/sites", tags=["sites"])
 
+# Short-TTL cache for the /neighbors/list and /neighbors/geo spatial joins
+_neighbor_rows_cache = TTLCache(ttl_s=NEIGHBOR_CACHE_TTL_S, maxsize=512, name='neighbor_rows')
+
 # Utility: ensure DataFrame is JSON-safe (no NaN/Inf) and time serialized
+@timed_serialization("records")
 def df_json_records(df: pd.DataFrame) -> list:
     if df is None:
         return []
@@ -65,43 +89,93 @@ def df_json_records(df: pd.DataFrame) -> list:
     return records
 
 
+def df_response(df: Optional[pd.DataFrame], fmt: str = "records", accept: Optional[str] = None):
+    """Timeseries response in the negotiated format.
+
+    records (default) | columnar (`?format=columnar`, fast encoder) |
+    arrow (`?format=arrow` or `Accept: application/vnd.apache.arrow.stream`) |
+    parquet (`?format=parquet` or `Accept: application/vnd.apache.parquet`).
+    """
+    fmt = negotiate_format(fmt, accept)
+    if fmt in ("arrow", "parquet"):
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow/Parquet output requires pyarrow on the server")
+        if fmt == "arrow":
+            return Response(df_arrow_stream(df), media_type=ARROW_STREAM_MEDIA_TYPE)
+        return Response(df_parquet(df), media_type=PARQUET_MEDIA_TYPE)
+    if fmt == "columnar":
+        return FastJSONResponse(df_columnar(df))
+    return df_json_records(df)
+
+
 @router.get("/search")
-def search_sites(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+def search_sites(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    mode: str = Query("prefix", pattern="^(prefix|contains)$"),
+    region: Optional[str] = Query(None),
+    province: Optional[str] = Query(None),
+    municipality: Optional[str] = Query(None),
+):
     """Autocomplete site IDs from master_node_total by prefix (case-insensitive).
-    Detects identifier column (att_name or node).
+    `mode=contains` adds substring matches after the prefix ones; region/province/municipality
+    narrow the result. Served from the in-process site index (no query); until it has loaded,
+    the search falls back to the database with the same mode and filters.
+    """
+    site_index.maybe_refresh()
+    if site_index.ready:
+        return site_index.search(q, limit=limit, mode=mode, region=region, province=province, municipality=municipality)
+    return _search_sites_db(q, limit, mode=mode, region=region, province=province, municipality=municipality)
+
+
+@router.get("/search/areas")
+def search_areas(
+    q: str = Query(..., min_length=1),
+    field: str = Query("region", pattern="^(region|province|municipality)$"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Autocomplete region/province/municipality names with their site counts (site index only)."""
+    site_index.maybe_refresh()
+    return site_index.search_areas(field, q, limit=limit)
+
+
+def _search_sites_db(q: str, limit: int, mode: str = "prefix", region: Optional[str] = None,
+                     province: Optional[str] = None, municipality: Optional[str] = None) -> list:
+    """search_sites on master_node_total: prefix matches first, then (mode="contains") substring ones.
+
+    Identifier and area columns come from the schema cache; area filters are case-insensitive.
     """
     engine = create_connection()
     if engine is None:
         return []
-    try:
-        cols_query = text(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'master_node_total'
-            """
-        )
-        with engine.connect() as conn:
-            cols = {row[0] for row in conn.execute(cols_query)}
+    cols = get_master_node_columns(engine)
+    id_col = cols['id']
+    if not id_col:
+        return []
 
-        id_col = 'att_name' if 'att_name' in cols else ('node' if 'node' in cols else None)
-        if not id_col:
+    where = [f"{id_col} IS NOT NULL", f"{id_col} ILIKE :pattern"]
+    params = {"prefix": f"{q}%", "pattern": f"%{q}%" if mode == "contains" else f"{q}%", "limit": limit}
+    for field, value in (('region', region), ('province', province), ('municipality', municipality)):
+        if not value:
+            continue
+        if not cols[field]:
             return []
+        where.append(f"LOWER({cols[field]}) = LOWER(:{field})")
+        params[field] = value
 
-        sql = text(
-            f"""
+    sql = text(
+        f"""
+        SELECT site_id FROM (
             SELECT DISTINCT {id_col} AS site_id
             FROM public.master_node_total
-            WHERE {id_col} IS NOT NULL AND {id_col} ILIKE :pattern
-            ORDER BY {id_col}
-            LIMIT :limit
-            """
-        )
-        pattern = f"{q}%"
-        df = pd.read_sql_query(sql, engine, params={"pattern": pattern, "limit": limit})
-        return df["site_id"].dropna().astype(str).tolist()
-    finally:
-        engine.dispose()
+            WHERE {' AND '.join(where)}
+        ) s
+        ORDER BY site_id ILIKE :prefix DESC, site_id
+        LIMIT :limit
+        """
+    )
+    df = pd.read_sql_query(sql, engine, params=params)
+    return df["site_id"].dropna().astype(str).tolist()
 
 
 @router.get("/{site_att}/neighbors/list")
@@ -112,104 +186,106 @@ def get_neighbors_list(
 ):
     """Return neighbor sites with basic attributes: name, region, province, municipality, vendor.
 
-    The function detects column names in master_node_total to be resilient to schema variations.
+    Column names in master_node_total come from the schema cache to be resilient to schema variations.
     """
+    cache_key = ('list', neighbor_cache_key(site_att, radius_km, vecinos))
+    cached = _neighbor_rows_cache.get(cache_key)
+    if cached is not None:
+        return cached
     engine = create_connection()
     if engine is None:
         return []
-    try:
-        # Build a safely quoted CSV for vecinos when radius filter is disabled (radius_km <= 0.1)
-        if radius_km > 0.1:
-            mis_vecinos = ""
-            vec_list = []
-        else:
-            vec_list = [v.strip() for v in (vecinos or '').split(',') if v.strip()]
-            # Join as 'a','b','c' without nested f-string braces
-            mis_vecinos = ",".join([f"'{v}'" for v in vec_list])
-        # Detect actual column names in master_node_total
-        cols_query = text(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'master_node_total'
-            """
-        )
-        with engine.connect() as conn:
-            cols = {row[0] for row in conn.execute(cols_query)}
-
-        id_col = 'att_name' if 'att_name' in cols else ('node' if 'node' in cols else None)
-        lat_col = 'latitude' if 'latitude' in cols else ('lat_wgs84' if 'lat_wgs84' in cols else None)
-        lon_col = 'longitude' if 'longitude' in cols else ('long_wgs84' if 'long_wgs84' in cols else None)
-
-        # optional attribute columns
-        region_col = 'region' if 'region' in cols else None
-        province_col = 'province' if 'province' in cols else None
-        municipality_col = 'municipality' if 'municipality' in cols else ('municipio' if 'municipio' in cols else None)
-        vendor_col = 'vendor' if 'vendor' in cols else ('vendor_name' if 'vendor_name' in cols else None)
-
-        if not id_col or not lat_col or not lon_col:
-            return []
+    # Fixed neighbor list when radius filter is disabled (radius_km <= 0.1), bound as an array
+    if radius_km > 0.1:
+        vec_list = []
+    else:
+        vec_list = [v.strip() for v in (vecinos or '').split(',') if v.strip()]
+    # Actual column names in master_node_total (introspected once per process)
+    cols = get_master_node_columns(engine)
+    id_col, lat_col, lon_col = cols['id'], cols['lat'], cols['lon']
+
+    # optional attribute columns
+    region_col = cols['region']
+    province_col = cols['province']
+    municipality_col = cols['municipality']
+    vendor_col = cols['vendor']
+
+    if not id_col or not lat_col or not lon_col:
+        return []
 
-        radius_meters = radius_km * 1000
+    radius_meters = radius_km * 1000
 
-        select_attrs = []
-        if region_col:
-            select_attrs.append(f"m.{region_col} AS region")
-        else:
-            select_attrs.append("NULL::text AS region")
-        if province_col:
-            select_attrs.append(f"m.{province_col} AS province")
-        else:
-            select_attrs.append("NULL::text AS province")
-        if municipality_col:
-            select_attrs.append(f"m.{municipality_col} AS municipality")
-        else:
-            select_attrs.append("NULL::text AS municipality")
-        if vendor_col:
-            select_attrs.append(f"m.{vendor_col} AS vendor")
-        else:
-            select_attrs.append("NULL::text AS vendor")
-
-        sql = f"""
-            WITH center AS (
-                SELECT {id_col} AS id, {lat_col} AS lat, {lon_col} AS lon
-                FROM public.master_node_total
-                WHERE {id_col} = :site
-                AND {lat_col} IS NOT NULL AND {lon_col} IS NOT NULL
-            )
-            SELECT m.{id_col} AS site_name,
-                   {', '.join(select_attrs)}
-            FROM public.master_node_total m
-            CROSS JOIN center c
-            WHERE m.{id_col} IS NOT NULL
-              AND m.{lat_col} IS NOT NULL AND m.{lon_col} IS NOT NULL
-              AND m.{id_col} <> c.id
-              AND ST_DWithin(
-                    ST_GeogFromText('POINT(' || c.lon || ' ' || c.lat || ')'),
-                    ST_GeogFromText('POINT(' || m.{lon_col} || ' ' || m.{lat_col} || ')'),
-                    :radius
-              )
-            ORDER BY site_name ASC
-        """ if radius_km>0.1 else (
-            # If vecinos list is empty under the fixed-neighbors mode, return no rows
-            f"""
-         SELECT m.{id_col} AS site_name,
-                   {', '.join(select_attrs)}
-            FROM public.master_node_total m
-            WHERE 1 = 0
-        """ if not vec_list else f"""
-         SELECT m.{id_col} AS site_name,
-                   {', '.join(select_attrs)}
-            FROM public.master_node_total m
-            WHERE m.{id_col} IN ({mis_vecinos})
-            AND {lat_col} IS NOT NULL 
-            AND {lon_col} IS NOT NULL
-        """)
+    select_attrs = []
+    if region_col:
+        select_attrs.append(f"m.{region_col} AS region")
+    else:
+        select_attrs.append("NULL::text AS region")
+    if province_col:
+        select_attrs.append(f"m.{province_col} AS province")
+    else:
+        select_attrs.append("NULL::text AS province")
+    if municipality_col:
+        select_attrs.append(f"m.{municipality_col} AS municipality")
+    else:
+        select_attrs.append("NULL::text AS municipality")
+    if vendor_col:
+        select_attrs.append(f"m.{vendor_col} AS vendor")
+    else:
+        select_attrs.append("NULL::text AS vendor")
+
+    # Neighbor names from the in-process spatial index turn the spatial join into a key lookup
+    memory_neighbors = None
+    if radius_km > 0.1 and id_col == 'att_name' and NEIGHBOR_RESOLVER == 'memory':
+        site_spatial_index.maybe_refresh()
+        memory_neighbors = site_spatial_index.query_radius(site_att, radius_km)
+    if memory_neighbors is not None:
+        vec_list = memory_neighbors
+        radius_km_sql = 0.0
+    else:
+        radius_km_sql = radius_km
 
-        df = pd.read_sql_query(text(sql), engine, params={"site": site_att, "radius": radius_meters})
-        return df_json_records(df)
-    finally:
-        engine.dispose()
+    sql = f"""
+        WITH center AS (
+            SELECT {id_col} AS id, {lat_col} AS lat, {lon_col} AS lon
+            FROM public.master_node_total
+            WHERE {id_col} = :site
+            AND {lat_col} IS NOT NULL AND {lon_col} IS NOT NULL
+        )
+        SELECT m.{id_col} AS site_name,
+               {', '.join(select_attrs)}
+        FROM public.master_node_total m
+        CROSS JOIN center c
+        WHERE m.{id_col} IS NOT NULL
+          AND m.{lat_col} IS NOT NULL AND m.{lon_col} IS NOT NULL
+          AND m.{id_col} <> c.id
+          AND ST_DWithin(
+                ST_GeogFromText('POINT(' || c.lon || ' ' || c.lat || ')'),
+                ST_GeogFromText('POINT(' || m.{lon_col} || ' ' || m.{lat_col} || ')'),
+                :radius
+          )
+        ORDER BY site_name ASC
+    """ if radius_km_sql > 0.1 else (
+        # If vecinos list is empty under the fixed-neighbors mode, return no rows
+        f"""
+     SELECT m.{id_col} AS site_name,
+               {', '.join(select_attrs)}
+        FROM public.master_node_total m
+        WHERE 1 = 0
+    """ if not vec_list else f"""
+     SELECT m.{id_col} AS site_name,
+               {', '.join(select_attrs)}
+        FROM public.master_node_total m
+        WHERE m.{id_col} = ANY(:vecinos)
+        AND {lat_col} IS NOT NULL 
+        AND {lon_col} IS NOT NULL
+        ORDER BY site_name ASC
+    """)
+
+    df = pd.read_sql_query(text(sql), engine, params={"site": site_att, "radius": radius_meters, "vecinos": vec_list})
+    records = df_json_records(df)
+    if records:
+        _neighbor_rows_cache.set(cache_key, records)
+    return records
 
 
 @router.get("/{site_att}/ranges")
@@ -238,6 +314,8 @@ def get_site_cell_changes(
     expand_missing_dates: bool = Query(True),
     limit: Optional[int] = Query(2000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     df = get_cell_change_data_grouped(
         group_by=group_by,
@@ -271,7 +349,7 @@ def get_site_cell_changes(
     # Ensure date serialization and JSON-safe
     if 'date' in df.columns:
         df['date'] = df['date'].astype(str)
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/cqi")
@@ -282,6 +360,8 @@ def get_site_cqi(
     technology: Optional[str] = Query(None, pattern="^(3G|4G|5G)$"),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     # Use calculated CQI for UMTS (3G), LTE (4G) and NR (5G)
     if technology == '3G':
@@ -311,7 +391,7 @@ def get_site_cqi(
             technology=None,
         )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     # Scale CQIs to 0-100 for API output consistency
     try:
         if isinstance(df, pd.DataFrame) and not df.empty:
@@ -322,7 +402,7 @@ def get_site_cqi(
         pass
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/event-dates")
@@ -339,30 +419,27 @@ def get_site_event_dates(
     engine = create_connection()
     if engine is None:
         return []
-    try:
-        sql = text(
-            """
-            SELECT tech, date, add_cell, delete_cell, total_cell, remark FROM (
-                SELECT '4G'::text AS tech, date, add_cell, delete_cell, total_cell, remark
-                FROM public.lte_cell_change_event
-                WHERE att_name = :site
-                UNION ALL
-                SELECT '3G'::text AS tech, date, add_cell, delete_cell, total_cell, remark
-                FROM public.umts_cell_change_event
-                WHERE att_name = :site
-            ) t
-            ORDER BY date DESC, tech ASC
-            LIMIT :limit OFFSET :offset
-            """
-        )
-        df = pd.read_sql_query(sql, engine, params={"site": site_att, "limit": limit, "offset": offset})
-        if df is None or df.empty:
-            return []
-        if 'date' in df.columns:
-            df['date'] = df['date'].astype(str)
-        return df_json_records(df)
-    finally:
-        engine.dispose()
+    sql = text(
+        """
+        SELECT tech, date, add_cell, delete_cell, total_cell, remark FROM (
+            SELECT '4G'::text AS tech, date, add_cell, delete_cell, total_cell, remark
+            FROM public.lte_cell_change_event
+            WHERE att_name = :site
+            UNION ALL
+            SELECT '3G'::text AS tech, date, add_cell, delete_cell, total_cell, remark
+            FROM public.umts_cell_change_event
+            WHERE att_name = :site
+        ) t
+        ORDER BY date DESC, tech ASC
+        LIMIT :limit OFFSET :offset
+        """
+    )
+    df = pd.read_sql_query(sql, engine, params={"site": site_att, "limit": limit, "offset": offset})
+    if df is None or df.empty:
+        return []
+    if 'date' in df.columns:
+        df['date'] = df['date'].astype(str)
+    return df_json_records(df)
 
 
 # --- Neighbors Endpoints (M2) ---
@@ -373,10 +450,35 @@ def get_neighbors(
     radius_km: float = Query(5, ge=0.1, le=50, description="Search radius in km"),
     vecinos: str = Query('')
 ):
-    neighbors = get_neighbor_sites(site_att, radius_km=radius_km, vecinos=vecinos)
+    neighbors = get_neighbor_sites_cached(site_att, radius_km=radius_km, vecinos=vecinos)
+    if neighbors is None:
+        raise HTTPException(status_code=503, detail="Neighbor lookup unavailable")
     return {"site_att": site_att, "radius_km": radius_km, "neighbors": neighbors}
 
 
+def _neighbors_geo_memory(site_att: str, radius_km: float) -> Optional[list]:
+    """get_neighbors_geo rows from the in-process spatial index; None when it cannot answer."""
+    if NEIGHBOR_RESOLVER != 'memory':
+        return None
+    site_spatial_index.maybe_refresh()
+    neighbors = site_spatial_index.query_radius_points(site_att, radius_km)
+    if neighbors is None:
+        return None
+    center = site_spatial_index.coordinates([site_att]) or []
+    # Same order as the SQL version: neighbors by name, then the center
+    return (
+        [{"role": "neighbor", "att_name": n, "latitude": lat, "longitude": lon} for n, lat, lon in neighbors]
+        + [{"role": "center", "att_name": n, "latitude": lat, "longitude": lon} for n, lat, lon in sorted(center)]
+    )
+
+
+@router.get("/{site_att}/neighbors/nearest")
+def get_nearest_neighbors(site_att: str, k: int = Query(10, ge=1, le=200)):
+    """The k nearest sites with their distance in km (spatial index, PostGIS fallback)."""
+    nearest = get_nearest_sites(site_att, k=k)
+    return {"site_att": site_att, "k": k, "nearest": nearest or []}
+
+
 @router.get("/{site_att}/neighbors/geo")
 def get_neighbors_geo(
     site_att: str,
@@ -384,77 +486,76 @@ def get_neighbors_geo(
     vecinos: str = Query(''),
 ):
     """Return center site and neighbors with latitude/longitude."""
+    cache_key = ('geo', neighbor_cache_key(site_att, radius_km, vecinos))
+    cached = _neighbor_rows_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    if radius_km > 0.1:
+        records = _neighbors_geo_memory(site_att, radius_km)
+        if records is not None:
+            if records:
+                _neighbor_rows_cache.set(cache_key, records)
+            return records
     engine = create_connection()
     if engine is None:
         return []
-    try:
-        radius_meters = radius_km * 1000
-        # Build neighbor sites list safely when radius is disabled (<= 0.1)
-        if radius_km > 0.1:
-            sites = ""
-            vec_list = []
-        else:
-            vec_list = [v.strip() for v in (vecinos or '').split(',') if v.strip()]
-            sites = ",".join([f"'{v}'" for v in vec_list])
-        # Detect actual column names in master_node_total
-        cols_query = text(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'master_node_total'
-            """
-        )
-        with engine.connect() as conn:
-            cols = {row[0] for row in conn.execute(cols_query)}
-
-        id_col = 'att_name' if 'att_name' in cols else ('node' if 'node' in cols else None)
-        lat_col = 'latitude' if 'latitude' in cols else ('lat_wgs84' if 'lat_wgs84' in cols else None)
-        lon_col = 'longitude' if 'longitude' in cols else ('long_wgs84' if 'long_wgs84' in cols else None)
+    radius_meters = radius_km * 1000
+    # Build neighbor sites list safely when radius is disabled (<= 0.1)
+    if radius_km > 0.1:
+        sites = ""
+        vec_list = []
+    else:
+        vec_list = [v.strip() for v in (vecinos or '').split(',') if v.strip()]
+        sites = ",".join([f"'{v}'" for v in vec_list])
+    # Actual column names in master_node_total (introspected once per process)
+    cols = get_master_node_columns(engine)
+    id_col, lat_col, lon_col = cols['id'], cols['lat'], cols['lon']
 
-        if not id_col or not lat_col or not lon_col:
-            return []
+    if not id_col or not lat_col or not lon_col:
+        return []
 
-        sql = f"""
-            WITH center AS (
-                SELECT {id_col} AS id, {lat_col} AS lat, {lon_col} AS lon
-                FROM public.master_node_total
-                WHERE {id_col} = :site
-                AND {lat_col} IS NOT NULL AND {lon_col} IS NOT NULL
-            ), neighbors AS (
-                SELECT DISTINCT m.{id_col} AS id, m.{lat_col} AS lat, m.{lon_col} AS lon
-                FROM public.master_node_total m
-                CROSS JOIN center c
-                WHERE m.{id_col} IS NOT NULL
-                AND m.{lat_col} IS NOT NULL AND m.{lon_col} IS NOT NULL
-                AND m.{id_col} <> c.id
-                AND ST_DWithin(
-                    ST_GeogFromText('POINT(' || c.lon || ' ' || c.lat || ')'),
-                    ST_GeogFromText('POINT(' || m.{lon_col} || ' ' || m.{lat_col} || ')'),
-                    {radius_meters}
-                )
-            )
-            SELECT 'center' AS role, id AS att_name, lat AS latitude, lon AS longitude FROM center
-            UNION ALL
-            SELECT 'neighbor' AS role, id AS att_name, lat AS latitude, lon AS longitude FROM neighbors
-            ORDER BY role DESC, att_name ASC
-        """ if radius_km>0.1 else (
-            # If vecinos list is empty, return only the center row
-            f"""
-            SELECT 'center' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total m
-            WHERE {id_col} = :site
-        """ if not vec_list else f"""
-            SELECT 'center' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total m
+    sql = f"""
+        WITH center AS (
+            SELECT {id_col} AS id, {lat_col} AS lat, {lon_col} AS lon
+            FROM public.master_node_total
             WHERE {id_col} = :site
-            UNION ALL
-            SELECT 'neighbor' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total
-            WHERE {id_col} in ({sites})
-            ORDER BY role DESC, att_name ASC
-        """)
-
-        df = pd.read_sql_query(text(sql), engine, params={"site": site_att})
-        return df.to_dict(orient="records")
-    finally:
-        engine.dispose()
+            AND {lat_col} IS NOT NULL AND {lon_col} IS NOT NULL
+        ), neighbors AS (
+            SELECT DISTINCT m.{id_col} AS id, m.{lat_col} AS lat, m.{lon_col} AS lon
+            FROM public.master_node_total m
+            CROSS JOIN center c
+            WHERE m.{id_col} IS NOT NULL
+            AND m.{lat_col} IS NOT NULL AND m.{lon_col} IS NOT NULL
+            AND m.{id_col} <> c.id
+            AND ST_DWithin(
+                ST_GeogFromText('POINT(' || c.lon || ' ' || c.lat || ')'),
+                ST_GeogFromText('POINT(' || m.{lon_col} || ' ' || m.{lat_col} || ')'),
+                {radius_meters}
+            )
+        )
+        SELECT 'center' AS role, id AS att_name, lat AS latitude, lon AS longitude FROM center
+        UNION ALL
+        SELECT 'neighbor' AS role, id AS att_name, lat AS latitude, lon AS longitude FROM neighbors
+        ORDER BY role DESC, att_name ASC
+    """ if radius_km>0.1 else (
+        # If vecinos list is empty, return only the center row
+        f"""
+        SELECT 'center' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total m
+        WHERE {id_col} = :site
+    """ if not vec_list else f"""
+        SELECT 'center' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total m
+        WHERE {id_col} = :site
+        UNION ALL
+        SELECT 'neighbor' AS role, {id_col} AS att_name, {lat_col} AS latitude, {lon_col} AS longitude FROM public.master_node_total
+        WHERE {id_col} in ({sites})
+        ORDER BY role DESC, att_name ASC
+    """)
+
+    df = pd.read_sql_query(text(sql), engine, params={"site": site_att})
+    records = df.to_dict(orient="records")
+    if records:
+        _neighbor_rows_cache.set(cache_key, records)
+    return records
 
 
 @router.get("/{site_att}/neighbors/cqi")
@@ -466,7 +567,10 @@ def get_neighbors_cqi(
     radius_km: float = Query(5, ge=0.1, le=50),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
+    neighbors = get_neighbor_sites_cached(site_att, radius_km=radius_km)
     # Use calculated neighbor CQI dispatcher (consistent with site-level behavior)
     if technology in ('3G', '4G', '5G'):
         df = get_neighbor_cqi_daily_calculated(
@@ -475,6 +579,7 @@ def get_neighbors_cqi(
             max_date=str(to_date) if to_date else None,
             technology=technology,
             radius_km=radius_km,
+            neighbors=neighbors,
         )
     else:
         # No technology specified: return merged calculated CQIs (3G+4G+5G)
@@ -484,9 +589,10 @@ def get_neighbors_cqi(
             max_date=str(to_date) if to_date else None,
             technology=None,
             radius_km=radius_km,
+            neighbors=neighbors,
         )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     # Scale CQIs to 0-100 for API output consistency
     try:
         if isinstance(df, pd.DataFrame) and not df.empty:
@@ -497,7 +603,7 @@ def get_neighbors_cqi(
         pass
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/neighbors/traffic")
@@ -510,6 +616,8 @@ def get_neighbors_traffic(
     radius_km: float = Query(5, ge=0.1, le=50),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     df = get_neighbor_traffic_data(
         site=site_att,
@@ -518,12 +626,13 @@ def get_neighbors_traffic(
         technology=technology,
         radius_km=radius_km,
         vendor=vendor,
+        neighbors=get_neighbor_sites_cached(site_att, radius_km=radius_km),
     )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/neighbors/traffic/voice")
@@ -536,6 +645,8 @@ def get_neighbors_voice(
     radius_km: float = Query(5, ge=0.1, le=50),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     df = get_neighbor_traffic_voice(
         site=site_att,
@@ -544,12 +655,13 @@ def get_neighbors_voice(
         technology=technology,
         radius_km=radius_km,
         vendor=vendor,
+        neighbors=get_neighbor_sites_cached(site_att, radius_km=radius_km),
     )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/traffic")
@@ -561,6 +673,8 @@ def get_site_traffic_data(
     vendor: Optional[str] = Query(None, description="huawei|ericsson|nokia|samsung for 4G; huawei|ericsson|nokia for 3G"),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     df = get_traffic_data_daily(
         att_name=site_att,
@@ -570,10 +684,10 @@ def get_site_traffic_data(
         vendor=vendor,
     )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
 
 
 @router.get("/{site_att}/traffic/voice")
@@ -585,6 +699,8 @@ def get_site_traffic_voice(
     vendor: Optional[str] = Query(None),
     limit: Optional[int] = Query(5000, ge=1, le=100000),
     offset: int = Query(0, ge=0),
+    fmt: str = Query("records", alias="format", pattern="^(records|columnar|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
 ):
     df = get_traffic_voice_daily(
         att_name=site_att,
@@ -594,7 +710,7 @@ def get_site_traffic_voice(
         vendor=vendor,
     )
     if df is None:
-        return []
+        return df_response(None, fmt, accept)
     if limit is not None:
         df = df.iloc[offset : offset + limit]
-    return df_json_records(df)
+    return df_response(df, fmt, accept)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.settings import settings
+from app.core.tracing import get_trace
+from cell_change_evolution.tracing import to_chrome, to_otlp
+
+router = APIRouter(prefix="/traces", tags=["traces"])
+
+
+@router.get("/{trace_id}")
+def get_request_trace(trace_id: str, format: str = Query("chrome", pattern="^(chrome|otlp)$")):
+    """Spans of a traced request (id from the `X-Trace-Id` response header).
+
+    `chrome` loads in chrome://tracing / Perfetto; `otlp` is the OTLP/HTTP JSON body a
+    collector accepts on /v1/traces. Traces are kept per worker for TRACE_TTL_S seconds.
+    """
+    trace = get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found (expired or served by another worker)")
+    if format == "otlp":
+        return to_otlp(trace, settings.TRACE_SERVICE_NAME)
+    return to_chrome(trace)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import route_template
+from cell_change_evolution.db_pool import pool_stats
+from cell_change_evolution.metrics import Counter, Gauge, Histogram
+
+# (method, route template, endpoint class); routes without a rule are never queued or shed
+Rule = Tuple[str, str, str]
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds",
+    "Time admitted requests waited for a slot of their endpoint class.",
+    ("endpoint_class",),
+)
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Requests holding a slot, per endpoint class.", ("endpoint_class",))
+ADMISSION_QUEUED = Gauge("admission_queued", "Requests waiting for a slot, per endpoint class.", ("endpoint_class",))
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests shed per endpoint class: queue_full (429), queue_timeout and db_saturated (503).",
+    ("endpoint_class", "reason"),
+)
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    """"evaluate=4,report=2" -> {"evaluate": 4, "report": 2}; malformed entries are skipped."""
+    limits = {}
+    for item in (value or "").split(","):
+        name, _, limit = item.partition("=")
+        try:
+            limits[name.strip()] = int(limit)
+        except ValueError:
+            continue
+    return limits
+
+
+def db_saturation() -> float:
+    """Highest checked_out / capacity over the DB pools of this process (as /api/health/db)."""
+    return max((p["saturation"] for p in pool_stats().values()), default=0.0)
+
+
+class Bulkhead:
+    """Concurrency limit of one endpoint class, with at most `max_queue` requests waiting `max_wait_s`."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_s: float):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait_s = float(max_wait_s)
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(self.limit)
+
+    async def acquire(self) -> Optional[str]:
+        """None once a slot is held, else why the request is rejected ("queue_full", "queue_timeout")."""
+        t0 = time.perf_counter()
+        if not self._slots.locked():
+            # A free slot is taken without yielding to the loop
+            await self._slots.acquire()
+        elif self.waiting >= self.max_queue:
+            return "queue_full"
+        else:
+            self.waiting += 1
+            ADMISSION_QUEUED.set(self.waiting, endpoint_class=self.name)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait_s)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUED.set(self.waiting, endpoint_class=self.name)
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - t0, endpoint_class=self.name)
+        self.active += 1
+        ADMISSION_IN_FLIGHT.set(self.active, endpoint_class=self.name)
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.set(self.active, endpoint_class=self.name)
+        self._slots.release()
+
+
+class AdmissionMiddleware:
+    """Bulkheads for the heavy endpoints: per-class concurrency limits, bounded queues, load shedding.
+
+    Requests matching `rules` take a slot of their class (`limits`, per worker) for the whole
+    response, streaming included. When every slot is taken they wait up to `max_wait_s`
+    (503 after that) in a queue of at most `max_queue` requests (429 beyond). While the DB
+    pool saturation is at or above `shed_saturation` new requests of those classes get a 503
+    at once instead of piling up on pool checkouts. Unlisted routes (health, search, metrics)
+    are never delayed, so they stay responsive while the heavy classes are saturated.
+    """
+
+    def __init__(self, app: ASGIApp, rules: List[Rule], limits: Dict[str, int], routes: Optional[List] = None,
+                 max_queue: int = 32, max_wait_s: float = 10.0, shed_saturation: float = 0.95,
+                 retry_after_s: int = 5, saturation: Callable[[], float] = db_saturation):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self.classes = {(method, template): name for method, template, name in rules}
+        self.methods = {method for method, _, _ in rules}
+        self.bulkheads = {
+            name: Bulkhead(name, limits[name], max_queue, max_wait_s)
+            for name in set(self.classes.values()) if limits.get(name, 0) > 0
+        }
+        self.shed_saturation = float(shed_saturation)
+        self.retry_after_s = int(retry_after_s)
+        self.saturation = saturation
+
+    def _bulkhead(self, scope: Scope) -> Optional[Bulkhead]:
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            return None
+        name = self.classes.get((scope["method"], route_template(scope, self.routes)))
+        return self.bulkheads.get(name) if name else None
+
+    def _reject(self, bulkhead: Bulkhead, reason: str) -> JSONResponse:
+        ADMISSION_REJECTED.inc(endpoint_class=bulkhead.name, reason=reason)
+        status = 429 if reason == "queue_full" else 503
+        detail = {
+            "queue_full": f"Too many {bulkhead.name} requests queued",
+            "queue_timeout": f"No {bulkhead.name} slot freed within {bulkhead.max_wait_s:g}s",
+            "db_saturated": "Database connection pool saturated",
+        }[reason]
+        return JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(self.retry_after_s)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        bulkhead = self._bulkhead(scope)
+        if bulkhead is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.shed_saturation > 0 and self.saturation() >= self.shed_saturation:
+            await self._reject(bulkhead, "db_saturated")(scope, receive, send)
+            return
+        reason = await bulkhead.acquire()
+        if reason is not None:
+            await self._reject(bulkhead, reason)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
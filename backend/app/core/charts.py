@@ -0,0 +1,72 @@
+import io
+import base64
+from typing import List, Optional
+
+import pandas as pd
+
+# Kept free of app/DB imports: this module is what report render worker processes import.
+
+COLORS = ['#2563eb', '#16a34a', '#ca8a04', '#dc2626']
+
+
+def _parse_date(s: Optional[str]) -> Optional[pd.Timestamp]:
+    try:
+        return pd.to_datetime(s) if s else None
+    except Exception:
+        return None
+
+
+def render_chart(records: List[dict], y_cols: List[str], title: str, ranges: dict) -> Optional[str]:
+    """PNG data URI for one report chart (line per column, evaluation windows shaded).
+
+    `records` are the window rows of an /evaluate payload concatenated in time order.
+    Runs in a worker process, so arguments and result are plain picklable values.
+    """
+    if not records:
+        return None
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except Exception:
+        return None
+    df = pd.DataFrame.from_records(records)
+    if 'time' in df.columns:
+        df['__t'] = pd.to_datetime(df['time'], errors='coerce')
+    elif 'date' in df.columns:
+        df['__t'] = pd.to_datetime(df['date'], errors='coerce')
+    else:
+        return None
+    df = df.dropna(subset=['__t']).drop_duplicates(subset=['__t']).sort_values('__t')
+    cols = [c for c in y_cols if c in df.columns]
+    if df.empty or not cols:
+        return None
+    # Plot
+    fig, ax = plt.subplots(figsize=(7.5, 2.6), dpi=150)
+    for i, col in enumerate(cols):
+        ax.plot(df['__t'], pd.to_numeric(df[col], errors='coerce'), label=col, color=COLORS[i % len(COLORS)], linewidth=1.4)
+    # Shade ranges
+    def shade(rng, color, alpha):
+        s = _parse_date((rng or {}).get('from'))
+        e = _parse_date((rng or {}).get('to'))
+        if s is not None and e is not None:
+            ax.axvspan(s, e, color=color, alpha=alpha, linewidth=0)
+    shade(ranges.get('before'), '#3b82f6', 0.10)
+    shade(ranges.get('after'), '#22c55e', 0.10)
+    shade(ranges.get('last'), '#0ea5e9', 0.04)
+    # Styling
+    ax.grid(True, linestyle='--', linewidth=0.4, alpha=0.4)
+    ax.set_title(title)
+    ax.legend(loc='upper right', fontsize=8)
+    fig.autofmt_xdate()
+    buf = io.BytesIO()
+    plt.tight_layout()
+    fig.savefig(buf, format='png')
+    plt.close(fig)
+    return 'data:image/png;base64,' + base64.b64encode(buf.getvalue()).decode('ascii')
+
+
+def render_pdf(html: str) -> bytes:
+    """PDF bytes for a report page with WeasyPrint (raises when it or its system deps are missing)."""
+    from weasyprint import HTML
+    return HTML(string=html).write_pdf()
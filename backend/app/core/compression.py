@@ -0,0 +1,123 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+# Already compressed (or not worth compressing) media types
+SKIP_MEDIA_TYPES = ("application/vnd.apache.parquet", "application/pdf", "image/", "application/zip")
+
+
+class _Encoder:
+    """Incremental gzip/brotli encoder; `flush=True` emits everything written so far (streaming)."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._c = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def write(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._c.process(data)
+            return out + self._c.flush() if flush else out
+        out = self._c.compress(data)
+        return out + self._c.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br when the client accepts it and brotli is installed, else gzip, else None."""
+    accepted = {e.split(";")[0].strip().lower() for e in accept_encoding.split(",") if e.strip()}
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression with a size threshold.
+
+    Bodies smaller than `minimum_size` are sent as-is. Streaming responses (NDJSON) are
+    compressed chunk by chunk and flushed after each chunk, so lines still arrive as they
+    are produced. Responses that already set Content-Encoding or carry a compressed
+    media type are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                # First body message: decide how to encode
+                headers = MutableHeaders(raw=start["headers"])
+                media_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or start["status"] in (204, 304)
+                    or any(media_type.startswith(t) for t in SKIP_MEDIA_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if passthrough:
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    body = encoder.write(body, flush=True)
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if passthrough or encoder is None:
+                await send(message)
+                return
+            body = encoder.write(body, flush=True) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,122 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.result_cache import watermark_token
+from cell_change_evolution.data_watermark import get_data_watermark_cached, get_data_watermark_rows_cached
+
+# (method, path prefix, excluded prefixes): GET responses that only change when ingestion does
+Rule = Tuple[str, str, Tuple[str, ...]]
+
+
+def data_validators() -> Tuple[Optional[str], Optional[datetime]]:
+    """(watermark token, last ingestion time); both cached in-process, so usually no DB access."""
+    token = watermark_token(get_data_watermark_cached())
+    rows = get_data_watermark_rows_cached() or {}
+    updated = [r["updated_at"] for r in rows.values() if r.get("updated_at")]
+    last_modified = max(updated) if updated else None
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return token, last_modified
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+
+class ConditionalRequestMiddleware:
+    """ETag / Last-Modified validators derived from the request and the data watermark.
+
+    For requests matching `rules`, the ETag is a hash of method, path, sorted query string
+    and Accept header, combined with the data watermark token. A request whose If-None-Match
+    or If-Modified-Since still matches is answered 304 before the endpoint runs, so no query
+    reaches Postgres. Rules are for GET only: a failed precondition on POST would be a 412
+    (RFC 9110), not a 304. ETags are weak because the same representation may be sent with
+    different Content-Encodings.
+    """
+
+    def __init__(self, app: ASGIApp, rules: List[Rule], validators: Callable = data_validators):
+        if any(method != "GET" for method, _, _ in rules):
+            raise ValueError("Conditional request rules are for GET only")
+        self.app = app
+        self.rules = rules
+        self.validators = validators
+
+    def _applies(self, scope: Scope) -> bool:
+        path, method = scope["path"], scope["method"]
+        for rule_method, prefix, excluded in self.rules:
+            if method == rule_method and (path == prefix or path.startswith(prefix.rstrip("/") + "/")):
+                if not any(path.startswith(x) for x in excluded):
+                    return True
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            token, last_modified = await run_in_threadpool(self.validators)
+        except Exception as e:
+            print(f"[conditional] Validators unavailable: {e}")
+            token, last_modified = None, None
+        if not token:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+        digest = hashlib.sha256()
+        for part in (scope["method"], scope["path"], query, headers.get("accept", "")):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        etag = f'W/"{token}-{digest.hexdigest()[:20]}"'
+        last_modified_http = format_datetime(last_modified, usegmt=True) if last_modified else None
+
+        not_modified = False
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            not_modified = _etag_matches(if_none_match, etag)
+        elif last_modified and headers.get("if-modified-since"):
+            try:
+                since = parsedate_to_datetime(headers["if-modified-since"])
+                not_modified = last_modified.replace(microsecond=0) <= since
+            except (TypeError, ValueError):
+                not_modified = False
+
+        def add_validators(raw: MutableHeaders) -> None:
+            raw["ETag"] = etag
+            if last_modified_http:
+                raw["Last-Modified"] = last_modified_http
+            if "cache-control" not in raw:
+                # Cache but revalidate: unchanged data then costs one 304
+                raw["Cache-Control"] = "private, no-cache"
+            raw.add_vary_header("Accept")
+
+        if not_modified:
+            out = MutableHeaders()
+            add_validators(out)
+            await send({"type": "http.response.start", "status": 304, "headers": out.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                add_validators(MutableHeaders(raw=message["headers"]))
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
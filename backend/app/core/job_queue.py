@@ -0,0 +1,164 @@
+import time
+import uuid
+import threading
+import concurrent.futures
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cell_change_evolution.metrics import register_collector
+from cell_change_evolution.tracing import propagate
+
+# Job states
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Every LocalJobQueue of the process, reported on /api/metrics
+_queues: List["LocalJobQueue"] = []
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue already holds `max_pending` unfinished jobs."""
+
+
+class Job:
+    """One background job; `update()` is called by the job function to report progress."""
+
+    def __init__(self, key: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stage = "queued"
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.meta: Dict[str, Any] = {}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done_event = threading.Event()
+
+    def update(self, progress: float, stage: str) -> None:
+        self.progress = max(self.progress, min(float(progress), 1.0))
+        self.stage = stage
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> dict:
+        now = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "stage": self.stage,
+            "error": self.error,
+            "queued_s": round((self.started_at or now) - self.created_at, 3),
+            "elapsed_s": round(now - self.created_at, 3),
+            **self.meta,
+        }
+
+
+class JobQueue(ABC):
+    """Interface of the report job queue.
+
+    `LocalJobQueue` is the in-process implementation; an external queue (RQ, Celery, ...)
+    has to provide the same submit/get/wait calls and keep results until `ttl_s` expires.
+    """
+
+    @abstractmethod
+    def submit(self, key: str, fn: Callable[..., Any], *args: Any) -> Tuple[Job, bool]:
+        """Queue `fn(job, *args)` unless an identical job exists; returns (job, created)."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, or None if unknown or expired."""
+
+    def wait(self, job: Job, timeout_s: Optional[float] = None) -> bool:
+        return job.done_event.wait(timeout_s)
+
+
+class LocalJobQueue(JobQueue):
+    """Bounded in-process job queue with de-duplication.
+
+    - `workers` jobs run at once on a dedicated thread pool, outside the server's request threads.
+    - Jobs with the same `key` share one job while it is queued, running or finished within
+      `ttl_s`; failed jobs are not reused.
+    - At most `max_pending` unfinished jobs are accepted (QueueFull beyond that).
+    - Finished jobs and their results are dropped `ttl_s` seconds after completion.
+    Job ids are only known to the process that created them.
+    """
+
+    def __init__(self, name: str, workers: int = 2, max_pending: int = 32, ttl_s: float = 600.0):
+        self.name = name
+        self.max_pending = max(1, int(max_pending))
+        self.ttl_s = float(ttl_s)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix=name)
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        _queues.append(self)
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - (job.finished_at or now) > self.ttl_s:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def submit(self, key: str, fn: Callable[..., Any], *args: Any) -> Tuple[Job, bool]:
+        """Queue `fn(job, *args)` unless an identical job exists; returns (job, created)."""
+        with self._lock:
+            self._prune()
+            existing = self._jobs.get(self._by_key.get(key, ""))
+            if existing is not None and existing.status != FAILED:
+                return existing, False
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{self.name}: {pending} jobs pending")
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._executor.submit(propagate(self._run), job, fn, args)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = DONE
+            job.update(1.0, "done")
+        except Exception as e:
+            print(f"[{self.name}] Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+            job.stage = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.done_event.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {s: 0 for s in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"max_pending": self.max_pending, **counts}
+
+
+@register_collector
+def _queue_metrics():
+    jobs, capacity = [], []
+    for queue in list(_queues):
+        stats = queue.stats()
+        jobs += [({"queue": queue.name, "status": s}, stats[s]) for s in (QUEUED, RUNNING, DONE, FAILED)]
+        capacity.append(({"queue": queue.name}, stats["max_pending"]))
+    return [
+        ("job_queue_jobs", "gauge", "Jobs held per queue and status (finished ones until their TTL expires).", jobs),
+        ("job_queue_max_pending", "gauge", "Unfinished jobs accepted before submissions are refused.", capacity),
+    ]
@@ -0,0 +1,90 @@
+import time
+import functools
+from typing import Callable, List, Optional
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cell_change_evolution.metrics import Counter, Gauge, Histogram
+from cell_change_evolution.tracing import span
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency per route template, until the last body chunk is sent.",
+    ("method", "route"),
+)
+REQUESTS = Counter("http_requests_total", "Requests per route template and status code.", ("method", "route", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being processed.")
+SERIALIZATION_SECONDS = Histogram(
+    "serialization_duration_seconds",
+    "Time spent turning frames/payloads into response bodies, per output format.",
+    ("format",),
+)
+
+
+def timed_serialization(fmt: str) -> Callable:
+    """Decorator recording the wrapped serializer's run time under `format=fmt` (and a trace span)."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                with span(fn.__name__, cat="serialization", format=fmt):
+                    return fn(*args, **kwargs)
+            finally:
+                SERIALIZATION_SECONDS.observe(time.perf_counter() - t0, format=fmt)
+        return wrapper
+    return decorate
+
+
+def route_template(scope: Scope, routes: List) -> str:
+    """Path template of the route serving `scope` ("unmatched" when none does)."""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    for route in routes:
+        try:
+            match, _ = route.matches(scope)
+        except Exception:
+            continue
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Request latency/count per route template (`/api/sites/{site_att}/cqi`, not the raw path).
+
+    The template comes from the route FastAPI matched; requests answered before routing
+    (304s from the conditional middleware, CORS preflights) are matched against `routes`
+    here, and anything else is labelled "unmatched" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Optional[List] = None, exclude: tuple = ("/api/metrics",)):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self.exclude = exclude
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            IN_FLIGHT.dec()
+            route = route_template(scope, self.routes)
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route)
+            REQUESTS.inc(method=scope["method"], route=route, status=status["code"])
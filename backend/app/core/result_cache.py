@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Optional
+
+from cell_change_evolution.ttl_cache import TTLCache
+from cell_change_evolution.metrics import track_cache
+
+
+def watermark_token(watermark: Optional[dict]) -> Optional[str]:
+    """Stable short token for a data watermark ({table: max date}); None if unknown."""
+    if not watermark:
+        return None
+    raw = json.dumps(watermark, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """Two-tier cache for JSON-serializable results, keyed by request parameters + data watermark.
+
+    - Memory tier: per-process LRU with TTL.
+    - Disk tier (optional, `directory`): one JSON file per key, shared by every uvicorn
+      worker on the host. Files are written atomically and expire after `disk_ttl_s`.
+      Keys start with the watermark token, so file names tell which watermark they belong to.
+
+    The watermark is part of the key, so entries computed before ingestion advanced it
+    are never served. When a newer watermark is seen the memory tier is dropped and
+    stale disk files are removed on the next `prune()`.
+    """
+
+    def __init__(self, name: str, ttl_s: float = 900.0, maxsize: int = 256,
+                 directory: str = "", disk_ttl_s: float = 86400.0):
+        self.name = name
+        self.memory = TTLCache(ttl_s=ttl_s, maxsize=maxsize)
+        self.directory = os.path.join(directory, name) if directory else ""
+        self.disk_ttl_s = float(disk_ttl_s)
+        self.disk_hits = 0
+        self._watermark: Optional[str] = None
+        self._lock = threading.Lock()
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except Exception as e:
+                print(f"[{name}] Disk cache disabled: {e}")
+                self.directory = ""
+        track_cache(name, self)
+
+    # ----- Keys -----
+    @staticmethod
+    def make_key(params: dict, watermark: str) -> str:
+        """"<watermark>.<sha256 of params + watermark>" (just the digest without a watermark)."""
+        raw = json.dumps({"p": params, "w": watermark}, sort_keys=True, default=str)
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"{watermark}.{digest}" if watermark else digest
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    # ----- Watermark -----
+    def observe_watermark(self, watermark: str) -> None:
+        """Drop the memory tier (and stale disk entries) when the data watermark advances."""
+        with self._lock:
+            if self._watermark == watermark:
+                return
+            self._watermark = watermark
+        self.memory.clear()
+        self.prune()
+
+    # ----- Access -----
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_ttl_s:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[{self.name}] Error reading disk cache entry: {e}")
+            return None
+        value = entry.get("value")
+        if value is not None:
+            self.disk_hits += 1
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"watermark": self._watermark, "created_at": time.time(), "value": value}, f, default=str)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[{self.name}] Error writing disk cache entry: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """Remove disk entries that are expired or belong to another watermark; returns the count.
+
+        Only lists and stats the directory: the watermark of an entry is the prefix of its file name.
+        """
+        if not self.directory:
+            return 0
+        removed = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except Exception:
+            return 0
+        for fname in names:
+            if not fname.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, fname)
+            token, dot, _ = fname[:-len(".json")].partition(".")
+            try:
+                stale = self._watermark is not None and (not dot or token != self._watermark)
+                if not stale:
+                    stale = now - os.path.getmtime(path) > self.disk_ttl_s
+                if stale:
+                    os.remove(path)
+                    removed += 1
+            except Exception:
+                continue
+        return removed
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.directory:
+            for fname in os.listdir(self.directory):
+                if fname.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, fname))
+                    except OSError:
+                        pass
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.memory),
+            "hits": self.memory.hits,
+            "misses": self.memory.misses,
+            "disk_hits": self.disk_hits,
+            "disk": bool(self.directory),
+            "watermark": self._watermark,
+        }
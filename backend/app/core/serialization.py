@@ -0,0 +1,142 @@
+import json
+from decimal import Decimal
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from app.core.metrics import timed_serialization
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder is used instead
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: Arrow IPC / Parquet output is unavailable without it
+    pa = None
+    pq = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Columns serialized as plain date strings (same as df_json_records)
+DATE_COLUMNS = ("time", "date")
+_NUMERIC_KINDS = ("floating", "integer", "mixed-integer-float", "decimal")
+
+
+def _mask_to_none(values: np.ndarray, mask: np.ndarray) -> list:
+    out = values.astype(object)
+    out[mask] = None
+    return out.tolist()
+
+
+def series_values(s: pd.Series, as_date_str: bool = False) -> list:
+    """JSON-safe list for one column: NaN/NaT/inf -> None, computed on the whole array at once."""
+    if as_date_str:
+        mask = s.isna().to_numpy()
+        return _mask_to_none(s.astype(str).to_numpy(), mask)
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return _mask_to_none(s.to_numpy(dtype=object), s.isna().to_numpy())
+    if pd.api.types.is_integer_dtype(s.dtype) and not s.hasnans:
+        return s.to_numpy().tolist()
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return _mask_to_none(s.dt.strftime("%Y-%m-%dT%H:%M:%S").to_numpy(dtype=object), s.isna().to_numpy())
+    # Numeric content, including object columns holding floats/Decimals/None (sanitize_df output)
+    if pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.infer_dtype(s, skipna=True) in _NUMERIC_KINDS:
+        arr = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return _mask_to_none(arr, ~np.isfinite(arr))
+    return _mask_to_none(s.to_numpy(dtype=object), s.isna().to_numpy())
+
+
+@timed_serialization("columnar")
+def df_columnar(df: pd.DataFrame) -> dict:
+    """Columnar payload `{"columns": [...], "<col>": [values...]}` for a frame.
+
+    Column names appear once instead of once per row, and NaN/inf handling is done per
+    column on NumPy arrays instead of walking every record in Python.
+    """
+    if df is None:
+        return {"columns": []}
+    out: dict = {"columns": [str(c) for c in df.columns]}
+    for col in df.columns:
+        out[str(col)] = series_values(df[col], as_date_str=col in DATE_COLUMNS)
+    return out
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+@timed_serialization("json")
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes with orjson when installed (falls back to json)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder; content is sent as-is (no jsonable_encoder pass)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ----- Arrow IPC / Parquet -----
+def negotiate_format(fmt: str, accept: Optional[str]) -> str:
+    """Explicit `?format=` wins; otherwise an Arrow/Parquet Accept header selects the binary format."""
+    if fmt != "records" or not accept:
+        return fmt
+    if ARROW_STREAM_MEDIA_TYPE in accept:
+        return "arrow"
+    if PARQUET_MEDIA_TYPE in accept:
+        return "parquet"
+    return fmt
+
+
+def arrow_table(df: Optional[pd.DataFrame]):
+    """Arrow table for a selector frame; numeric columns are handed over without copying.
+
+    Selector frames come out of sanitize_df as object columns, so numeric ones are
+    converted back to float64/int64 first (Decimal and None included).
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    if df is None:
+        return pa.table({})
+    cols = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in _NUMERIC_KINDS:
+            s = pd.to_numeric(s, errors="coerce")
+        cols[str(col)] = s
+    return pa.Table.from_pandas(pd.DataFrame(cols, index=df.index), preserve_index=False)
+
+
+@timed_serialization("arrow")
+def df_arrow_stream(df: Optional[pd.DataFrame]) -> bytes:
+    table = arrow_table(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@timed_serialization("parquet")
+def df_parquet(df: Optional[pd.DataFrame]) -> bytes:
+    table = arrow_table(df)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
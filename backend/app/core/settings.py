@@ -28,5 +28,56 @@ class Settings:
     ENABLE_NEIGHBORS: bool = os.getenv("ENABLE_NEIGHBORS", "true").lower() == "true"
     NEIGHBOR_SEARCH_RADIUS_KM: float = float(os.getenv("NEIGHBOR_SEARCH_RADIUS_KM", "3"))
 
+    # Evaluation result cache (memory tier per worker, optional disk tier shared by workers)
+    EVAL_CACHE_TTL_S: float = float(os.getenv("EVAL_CACHE_TTL_S", "900"))
+    EVAL_CACHE_MAXSIZE: int = int(os.getenv("EVAL_CACHE_MAXSIZE", "256"))
+    EVAL_CACHE_DIR: str = os.getenv("EVAL_CACHE_DIR", "")
+    EVAL_CACHE_DISK_TTL_S: float = float(os.getenv("EVAL_CACHE_DISK_TTL_S", "86400"))
+
+    # Batch evaluation: sites per grouped read and chunks evaluated concurrently
+    EVAL_BATCH_CHUNK_SIZE: int = int(os.getenv("EVAL_BATCH_CHUNK_SIZE", "50"))
+    EVAL_BATCH_CONCURRENCY: int = int(os.getenv("EVAL_BATCH_CONCURRENCY", "2"))
+    # Worker processes of the nationwide evaluation job (app/jobs/evaluate_changes.py)
+    EVAL_JOB_WORKERS: int = int(os.getenv("EVAL_JOB_WORKERS", "4"))
+
+    # PDF report charts: render processes per API worker (0 renders inline) and cached images
+    REPORT_CHART_WORKERS: int = int(os.getenv("REPORT_CHART_WORKERS", "2"))
+    REPORT_CHART_CACHE_MAXSIZE: int = int(os.getenv("REPORT_CHART_CACHE_MAXSIZE", "512"))
+    # Report jobs: concurrent builds per API worker, unfinished jobs accepted, seconds results are kept
+    REPORT_JOB_WORKERS: int = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+    REPORT_JOB_MAX_PENDING: int = int(os.getenv("REPORT_JOB_MAX_PENDING", "32"))
+    REPORT_JOB_TTL_S: float = float(os.getenv("REPORT_JOB_TTL_S", "600"))
+    # Seconds POST /report waits for the PDF before answering 202 with the job href
+    REPORT_SYNC_WAIT_S: float = float(os.getenv("REPORT_SYNC_WAIT_S", "60"))
+
+    # Site search index: seconds between checks of the master_node_total watermark
+    SITE_INDEX_CHECK_S: float = float(os.getenv("SITE_INDEX_CHECK_S", "60"))
+
+    # Response compression (br when brotli is installed, else gzip) and conditional requests
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    HTTP_CONDITIONAL: bool = os.getenv("HTTP_CONDITIONAL", "true").lower() == "true"
+
+    # Request latency per route on /api/metrics (selector/pool/cache metrics are always collected)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Request tracing: fraction of requests traced without `X-Trace: 1`, optional OTLP/HTTP
+    # collector (e.g. http://localhost:4318/v1/traces), finished traces kept per worker
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "")
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "ran-quality-api")
+    TRACE_KEEP: int = int(os.getenv("TRACE_KEEP", "64"))
+    TRACE_TTL_S: float = float(os.getenv("TRACE_TTL_S", "600"))
+
+    # Admission control: concurrent requests per endpoint class and worker, requests queued per
+    # class, seconds a request may wait for a slot, DB pool saturation (0..1) above which the
+    # classes are shed with 503 (0 disables shedding)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_LIMITS: str = os.getenv("ADMISSION_LIMITS", "evaluate=4,batch=1,report=2,timeseries=16")
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_MAX_WAIT_S: float = float(os.getenv("ADMISSION_MAX_WAIT_S", "10"))
+    ADMISSION_SHED_SATURATION: float = float(os.getenv("ADMISSION_SHED_SATURATION", "0.95"))
+
 
 settings = Settings()
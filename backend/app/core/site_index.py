@@ -0,0 +1,216 @@
+import time
+import bisect
+import itertools
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.core.settings import settings
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.data_watermark import get_data_watermark_rows_cached
+from cell_change_evolution.schema_cache import get_master_node_columns, get_table_columns, refresh_schema_cache
+
+# data_watermark rows whose update means master_node_total was reloaded
+SOURCE_TABLES = ('master_node_total', 'master_node_neighbor')
+AREA_FIELDS = ('region', 'province', 'municipality')
+_SEP = '\x00'
+
+
+class _Names:
+    """Sorted lowercase names for prefix search (bisect) plus one joined blob for substring search."""
+
+    def __init__(self, names: List[str]):
+        pairs = sorted({(n.lower(), n) for n in names if n})
+        self.keys = [k for k, _ in pairs]
+        self.values = [v for _, v in pairs]
+        self.blob = _SEP + _SEP.join(self.keys) + _SEP
+        # Start offset of every key in the blob, to map a substring hit back to its entry
+        self.offsets: List[int] = []
+        pos = 1
+        for k in self.keys:
+            self.offsets.append(pos)
+            pos += len(k) + 1
+
+    def iter_prefix(self, q: str) -> Iterator[int]:
+        """Indexes of the keys starting with `q`, in order, found lazily."""
+        i = bisect.bisect_left(self.keys, q)
+        while i < len(self.keys) and self.keys[i].startswith(q):
+            yield i
+            i += 1
+
+    def iter_contains(self, q: str, skip: set) -> Iterator[int]:
+        """Indexes of the keys containing `q` and not in `skip` (updated as they are yielded)."""
+        pos = self.blob.find(q)
+        while pos != -1:
+            i = bisect.bisect_right(self.offsets, pos) - 1
+            if i not in skip:
+                skip.add(i)
+                yield i
+            # Continue after the entry just matched
+            pos = self.blob.find(q, self.offsets[i] + len(self.keys[i]) + 1)
+
+    def prefix(self, q: str, limit: int) -> List[int]:
+        return list(itertools.islice(self.iter_prefix(q), limit))
+
+    def contains(self, q: str, limit: int, skip: set) -> List[int]:
+        return list(itertools.islice(self.iter_contains(q, skip), limit))
+
+
+class SiteIndex:
+    """In-process index of master_node_total identifiers for autocomplete.
+
+    Site ids (att_name, falling back to node) and node names are searched by prefix with
+    bisect and by substring with str.find over one joined string, so a lookup costs a few
+    microseconds and no query. Region/province/municipality values are indexed the same way
+    and can narrow a site search. The index is loaded once at startup (in the background) and
+    reloaded when the data watermark of master_node_total changes, checked at most every
+    `check_s` seconds.
+    """
+
+    def __init__(self, check_s: float = 60.0):
+        self.check_s = float(check_s)
+        self.loaded_at: Optional[float] = None
+        # (names, site of name, area names per field, sites per (field, area)); replaced as a whole
+        self._state: Optional[Tuple[_Names, Dict[str, str], Dict[str, _Names], Dict[Tuple[str, str], set]]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loading = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    # ----- Loading -----
+    @staticmethod
+    def _source_version():
+        rows = get_data_watermark_rows_cached() or {}
+        return tuple(str((rows.get(t) or {}).get('updated_at')) for t in SOURCE_TABLES)
+
+    def load(self, engine=None) -> bool:
+        """Read every identifier and area of master_node_total; True once the index is swapped in."""
+        try:
+            engine = engine or get_engine()
+            version = self._source_version()
+            if version != self._version:
+                # master_node_total was reloaded: its columns may have changed too
+                refresh_schema_cache('master_node_total')
+            cols = get_table_columns('master_node_total', engine=engine) or frozenset()
+            id_col = get_master_node_columns(engine)['id']
+            if not id_col:
+                return False
+            select = [f"{id_col} AS site_id", "node" if 'node' in cols else "NULL::text AS node"]
+            select += [f"{f} AS {f}" if f in cols else f"NULL::text AS {f}" for f in AREA_FIELDS]
+            df = pd.read_sql_query(text(f"""
+                SELECT DISTINCT {', '.join(select)}
+                FROM public.master_node_total
+                WHERE {id_col} IS NOT NULL
+            """), engine)
+        except Exception as e:
+            print(f"[site_index] Error loading site index: {e}")
+            return False
+
+        df = df.astype(object).where(df.notna(), None)
+        site_of: Dict[str, str] = {}
+        for site, node in zip(df['site_id'], df['node']):
+            site = str(site)
+            site_of.setdefault(site, site)
+            if node is not None:
+                site_of.setdefault(str(node), site)
+        areas: Dict[str, _Names] = {}
+        area_sites: Dict[Tuple[str, str], set] = {}
+        for field in AREA_FIELDS:
+            for site, value in zip(df['site_id'], df[field]):
+                if value is not None:
+                    area_sites.setdefault((field, str(value).lower()), set()).add(str(site))
+            areas[field] = _Names([str(v) for v in df[field].dropna().unique()])
+
+        # Swap in complete structures; readers never see a half-built index
+        self._state = (_Names(list(site_of)), site_of, areas, area_sites)
+        self._version = version
+        self.loaded_at = time.time()
+        print(f"[site_index] Loaded {len(site_of)} identifiers")
+        return True
+
+    def _refresh(self) -> None:
+        if not self._loading.acquire(blocking=False):
+            return
+        try:
+            if not self.ready or self._source_version() != self._version:
+                self.load()
+        finally:
+            self._loading.release()
+
+    def start(self) -> None:
+        """Load in a background thread (startup must not wait for the database)."""
+        self._checked_at = time.time()
+        threading.Thread(target=self._refresh, name="site-index", daemon=True).start()
+
+    def maybe_refresh(self) -> None:
+        """Reload in the background when master_node_total changed (checked every `check_s`)."""
+        now = time.time()
+        if now - self._checked_at >= self.check_s or (not self.ready and now - self._checked_at >= 5.0):
+            self.start()
+
+    # ----- Search -----
+    def search(self, q: str, limit: int = 10, mode: str = "prefix", region: Optional[str] = None,
+               province: Optional[str] = None, municipality: Optional[str] = None) -> List[str]:
+        """Site ids matching `q` by prefix, then (mode="contains") by substring; None filters are ignored."""
+        state = self._state
+        if state is None:
+            return []
+        names, site_of, _, area_sites = state
+        q = q.lower()
+        allowed = None
+        for field, value in (('region', region), ('province', province), ('municipality', municipality)):
+            if value:
+                sites = area_sites.get((field, value.lower()), set())
+                allowed = sites if allowed is None else allowed & sites
+        if allowed is not None and not allowed:
+            return []
+        out: List[str] = []
+        seen = set()
+
+        def take(indexes: Iterator[int]) -> bool:
+            # Several names (site id, its nodes) map to one site and filters drop others, so walk
+            # the matches until `limit` distinct sites are found instead of a fixed number of hits
+            for i in indexes:
+                site = site_of[names.values[i]]
+                if site not in seen and (allowed is None or site in allowed):
+                    seen.add(site)
+                    out.append(site)
+                    if len(out) >= limit:
+                        return True
+            return False
+
+        prefix_hits: set = set()
+
+        def tracked_prefix() -> Iterator[int]:
+            for i in names.iter_prefix(q):
+                prefix_hits.add(i)
+                yield i
+
+        if not take(tracked_prefix()) and mode == "contains":
+            take(names.iter_contains(q, prefix_hits))
+        return out
+
+    def search_areas(self, field: str, q: str, limit: int = 10) -> List[dict]:
+        """Area values of `field` matching `q` (prefix first, then substring) with their site counts."""
+        if self._state is None:
+            return []
+        _, _, areas, area_sites = self._state
+        names = areas.get(field)
+        if names is None:
+            return []
+        q = q.lower()
+        hits = names.prefix(q, limit)
+        if len(hits) < limit:
+            hits += names.contains(q, limit - len(hits), set(hits))
+        return [
+            {"field": field, "value": names.values[i], "sites": len(area_sites.get((field, names.keys[i]), ()))}
+            for i in hits
+        ]
+
+
+site_index = SiteIndex(check_s=settings.SITE_INDEX_CHECK_S)
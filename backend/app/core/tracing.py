@@ -0,0 +1,81 @@
+import random
+import threading
+from typing import List, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import route_template
+from app.core.settings import settings
+from cell_change_evolution.tracing import Trace, export_otlp, start_trace
+from cell_change_evolution.ttl_cache import TTLCache
+
+TRACE_HEADER = "x-trace"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+# Finished traces of this worker, fetched with GET /api/traces/{trace_id}
+_traces = TTLCache(ttl_s=settings.TRACE_TTL_S, maxsize=settings.TRACE_KEEP)
+
+
+def keep_trace(trace: Trace) -> None:
+    """Store a finished trace and, when TRACE_OTLP_ENDPOINT is set, export it in the background."""
+    _traces.set(trace.trace_id, trace)
+    if settings.TRACE_OTLP_ENDPOINT:
+        threading.Thread(
+            target=export_otlp,
+            args=(trace, settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME),
+            name="trace-export",
+            daemon=True,
+        ).start()
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    return _traces.get(trace_id)
+
+
+class TracingMiddleware:
+    """Trace requests sent with `X-Trace: 1`, plus a `sample_rate` fraction of all requests.
+
+    The root span covers the whole request (routing, endpoint, serialization, compression);
+    selectors, SQL statements, CQI kernels and serializers add child spans. The trace id is
+    returned in `X-Trace-Id`.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Optional[List] = None, sample_rate: float = 0.0,
+                 exclude: tuple = ("/api/metrics", "/api/traces")):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self.sample_rate = float(sample_rate)
+        self.exclude = exclude
+
+    def _wanted(self, scope: Scope) -> bool:
+        for name, value in scope.get("headers") or ():
+            if name.decode("latin-1") == TRACE_HEADER:
+                return value.decode("latin-1").strip().lower() in ("1", "true", "yes")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude) or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = None
+        try:
+            with start_trace(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as trace:
+                root = trace.root
+
+                async def send_wrapper(message: Message) -> None:
+                    if message["type"] == "http.response.start":
+                        MutableHeaders(scope=message).append(TRACE_ID_HEADER, trace.trace_id)
+                        root.set(status=message["status"])
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = route_template(scope, self.routes)
+                    root.name = f"{scope['method']} {route}"
+                    root.set(route=route)
+        finally:
+            if trace is not None:
+                keep_trace(trace)
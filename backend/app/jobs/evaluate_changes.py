@@ -0,0 +1,284 @@
+"""Nationwide evaluation of every cell change event in a date range.
+
+Enumerates (site, date) pairs from lte_cell_change_event / umts_cell_change_event,
+evaluates them with the batch evaluation logic in a process pool and upserts the
+verdicts and metric means into public.evaluation_result.
+
+CLI (from backend/):
+    python -m app.jobs.evaluate_changes --start 2024-01-01 --end 2024-03-31
+    python -m app.jobs.evaluate_changes --days 30        # last 30 days up to the data max date
+
+Schedulers call run_evaluation_job() (or the CLI with --days); sites already evaluated
+with the same options against the same max date are skipped unless --force is given.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+import multiprocessing
+from datetime import date, timedelta
+from typing import List, Tuple
+
+# Ensure project root is on sys.path so we can import sibling modules like `cell_change_evolution`
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Jobs use the 'batch' pool role unless overridden (see cell_change_evolution/db_pool.py)
+os.environ.setdefault("DB_ROLE", "batch")
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.core.settings import settings
+from app.api.v1.evaluate_batch import BatchSite, EvaluateBatchRequest, _batch_max_date, _run_chunk
+from cell_change_evolution.db_pool import get_engine
+
+CHANGE_EVENT_TABLES = {'umts_cell_change_event': '3G', 'lte_cell_change_event': '4G'}
+
+
+def create_table_evaluation_result(engine=None):
+    """Create public.evaluation_result (one row per site, input date and evaluation options) if missing."""
+    create_table_query = """
+        CREATE TABLE IF NOT EXISTS public.evaluation_result (
+            site_att VARCHAR(255) NOT NULL,
+            input_date DATE NOT NULL,
+            threshold DOUBLE PRECISION NOT NULL,
+            period INTEGER NOT NULL,
+            guard INTEGER NOT NULL,
+            radius_km DOUBLE PRECISION NOT NULL,
+            technologies VARCHAR(16),
+            overall VARCHAR(16),
+            partial BOOLEAN NOT NULL DEFAULT FALSE,
+            max_date DATE NULL,
+            ranges JSONB,
+            metrics JSONB,
+            evaluated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (site_att, input_date, threshold, period, guard, radius_km)
+        );
+        CREATE INDEX IF NOT EXISTS idx_evaluation_result_input_date ON public.evaluation_result (input_date);
+        CREATE INDEX IF NOT EXISTS idx_evaluation_result_overall ON public.evaluation_result (overall);
+        """
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as connection:
+            connection.execute(text(create_table_query))
+            connection.commit()
+        return True
+
+    except Exception as e:
+        print(f"Error creating table evaluation_result: {e}")
+        return False
+
+
+def get_change_events(start, end, engine=None):
+    """
+    Distinct (site, date) pairs with a cell change event in [start, end]
+
+    Returns:
+        pandas.DataFrame: [site_att, input_date, technologies] ordered by date, or None on error
+    """
+    selects = "\n            UNION ALL\n".join(
+        f"SELECT att_name, date, '{tech}' AS tech FROM public.{table} WHERE date BETWEEN :start AND :end"
+        for table, tech in CHANGE_EVENT_TABLES.items()
+    )
+    query = text(f"""
+        SELECT att_name AS site_att,
+               date AS input_date,
+               string_agg(DISTINCT tech, ',' ORDER BY tech) AS technologies
+        FROM (
+            {selects}
+        ) e
+        GROUP BY att_name, date
+        ORDER BY date, att_name
+    """)
+    try:
+        engine = engine or get_engine()
+        df = pd.read_sql(query, engine, params={'start': start, 'end': end})
+        print(f"Retrieved {len(df)} change events between {start} and {end}")
+        return df
+
+    except Exception as e:
+        print(f"Error fetching change events: {e}")
+        return None
+
+
+def get_evaluated_keys(start, end, options, max_date, engine=None):
+    """(site_att, input_date) already evaluated with `options` against `max_date` and not partial."""
+    query = text("""
+        SELECT site_att, input_date
+        FROM public.evaluation_result
+        WHERE input_date BETWEEN :start AND :end
+          AND threshold = :threshold AND period = :period AND guard = :guard AND radius_km = :radius_km
+          AND max_date IS NOT DISTINCT FROM :max_date
+          AND NOT partial
+    """)
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as connection:
+            rows = connection.execute(query, {'start': start, 'end': end, 'max_date': max_date, **options}).fetchall()
+        return {(r.site_att, r.input_date) for r in rows}
+
+    except Exception as e:
+        print(f"Error fetching evaluated sites: {e}")
+        return set()
+
+
+def save_evaluation_results(rows, options, max_date, technologies, engine=None):
+    """
+    Upsert evaluation lines (as produced by the batch evaluation) into evaluation_result
+
+    Returns:
+        int: Rows written
+    """
+    records = [
+        {
+            'site_att': r['site_att'],
+            'input_date': r['input_date'],
+            **options,
+            'technologies': technologies.get((r['site_att'], r['input_date'])),
+            'overall': r['overall'],
+            'partial': bool(r['options'].get('partial')),
+            'max_date': max_date,
+            'ranges': json.dumps(r['options'].get('ranges')),
+            'metrics': json.dumps(r['metrics']),
+        }
+        for r in rows if 'error' not in r
+    ]
+    if not records:
+        return 0
+    query = text("""
+        INSERT INTO public.evaluation_result
+            (site_att, input_date, threshold, period, guard, radius_km, technologies,
+             overall, partial, max_date, ranges, metrics, evaluated_at)
+        VALUES
+            (:site_att, :input_date, :threshold, :period, :guard, :radius_km, :technologies,
+             :overall, :partial, :max_date, CAST(:ranges AS JSONB), CAST(:metrics AS JSONB), CURRENT_TIMESTAMP)
+        ON CONFLICT (site_att, input_date, threshold, period, guard, radius_km) DO UPDATE
+        SET technologies = EXCLUDED.technologies,
+            overall = EXCLUDED.overall,
+            partial = EXCLUDED.partial,
+            max_date = EXCLUDED.max_date,
+            ranges = EXCLUDED.ranges,
+            metrics = EXCLUDED.metrics,
+            evaluated_at = EXCLUDED.evaluated_at
+    """)
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as connection:
+            connection.execute(query, records)
+            connection.commit()
+        return len(records)
+
+    except Exception as e:
+        print(f"Error saving evaluation results: {e}")
+        return 0
+
+
+def _evaluate_chunk_worker(n, sites, options, max_date):
+    """Process-pool target: evaluate one chunk of (site_att, input_date) pairs."""
+    req = EvaluateBatchRequest(sites=[BatchSite(site_att=s, input_date=d) for s, d in sites], **options)
+    return _run_chunk(n, list(enumerate(req.sites)), req, max_date, [])
+
+
+def run_evaluation_job(start=None, end=None, days=None, threshold=0.05, period=7, guard=7, radius_km=5.0,
+                       workers=None, chunk_size=None, force=False):
+    """
+    Evaluate every change event in [start, end] and store the results
+
+    Args:
+        start, end (date, optional): Event date range; `end` defaults to the data max date
+        days (int, optional): With no `start`, evaluate the `days` days ending at `end`
+        threshold, period, guard, radius_km: Evaluation options (as /api/evaluate)
+        workers (int, optional): Worker processes (default EVAL_JOB_WORKERS)
+        chunk_size (int, optional): Sites per grouped read (default EVAL_BATCH_CHUNK_SIZE)
+        force (bool): Re-evaluate sites already stored for the same options and max date
+
+    Returns:
+        dict: Summary (events, evaluated, skipped, saved, failed, elapsed_s), or None on error
+    """
+    t0 = time.perf_counter()
+    engine = get_engine()
+    if not create_table_evaluation_result(engine):
+        return None
+
+    max_date = _batch_max_date()
+    end = end or max_date or date.today()
+    if start is None:
+        start = end - timedelta(days=(days or 30) - 1)
+    options = {'threshold': float(threshold), 'period': int(period), 'guard': int(guard), 'radius_km': float(radius_km)}
+
+    events = get_change_events(start, end, engine)
+    if events is None:
+        return None
+    pairs: List[Tuple[str, date]] = list(zip(events['site_att'], events['input_date']))
+    technologies = {(s, str(d)): t for s, d, t in zip(events['site_att'], events['input_date'], events['technologies'])}
+    skipped = 0
+    if not force and pairs:
+        done = get_evaluated_keys(start, end, options, max_date, engine)
+        todo = [p for p in pairs if p not in done]
+        skipped = len(pairs) - len(todo)
+        pairs = todo
+
+    chunk_size = chunk_size or settings.EVAL_BATCH_CHUNK_SIZE
+    chunks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+    workers = max(1, min(workers or settings.EVAL_JOB_WORKERS, len(chunks) or 1))
+    print(f"Evaluating {len(pairs)} sites ({skipped} up to date) in {len(chunks)} chunks with {workers} processes")
+
+    saved = failed = 0
+    # spawn: workers start with a clean interpreter instead of inheriting pooled connections and threads
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+        futs = {ex.submit(_evaluate_chunk_worker, n, chunk, options, max_date): chunk for n, chunk in enumerate(chunks)}
+        for done_n, fut in enumerate(concurrent.futures.as_completed(futs), start=1):
+            chunk = futs[fut]
+            try:
+                rows = fut.result()
+            except Exception as e:
+                print(f"Error evaluating chunk: {e}")
+                failed += len(chunk)
+                continue
+            saved += save_evaluation_results(rows, options, max_date, technologies, engine)
+            print(f"  chunk {done_n}/{len(chunks)}: {saved} results saved")
+
+    summary = {
+        'start': str(start),
+        'end': str(end),
+        'max_date': str(max_date) if max_date else None,
+        'events': len(events),
+        'evaluated': len(pairs),
+        'skipped': skipped,
+        'saved': saved,
+        'failed': failed,
+        'elapsed_s': round(time.perf_counter() - t0, 3),
+    }
+    print(f"Evaluation job finished: {summary}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate every cell change event in a date range")
+    parser.add_argument("--start", type=date.fromisoformat, help="First event date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last event date (default: data max date)")
+    parser.add_argument("--days", type=int, default=30, help="Days ending at --end when --start is not given")
+    parser.add_argument("--threshold", type=float, default=0.05)
+    parser.add_argument("--period", type=int, default=7)
+    parser.add_argument("--guard", type=int, default=7)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, help="Worker processes (default EVAL_JOB_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, help="Sites per grouped read (default EVAL_BATCH_CHUNK_SIZE)")
+    parser.add_argument("--force", action="store_true", help="Re-evaluate sites already up to date")
+    args = parser.parse_args(argv)
+
+    summary = run_evaluation_job(
+        start=args.start, end=args.end, days=args.days,
+        threshold=args.threshold, period=args.period, guard=args.guard, radius_km=args.radius_km,
+        workers=args.workers, chunk_size=args.chunk_size, force=args.force,
+    )
+    return 0 if summary is not None and summary['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
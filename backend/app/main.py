@@ -8,14 +8,66 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+# API workers use the 'api' pool role unless overridden (see cell_change_evolution/db_pool.py)
+os.environ.setdefault("DB_ROLE", "api")
+
 from app.core.settings import settings
+from app.core.compression import CompressionMiddleware
+from app.core.conditional import ConditionalRequestMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.admission import AdmissionMiddleware, parse_limits
+from app.core.tracing import TracingMiddleware
 from app.api.v1.health import router as health_router
 from app.api.v1.sites import router as sites_router
 from app.api.v1.evaluate import router as evaluate_router
+from app.api.v1.evaluate_batch import router as evaluate_batch_router
 from app.api.v1.report import router as report_router
+from app.api.v1.areas import router as areas_router
+from app.api.v1.traces import router as traces_router
+from app.core.site_index import site_index
+from cell_change_evolution.spatial_index import site_spatial_index
+from cell_change_evolution.db_pool import dispose_all
+from cell_change_evolution.executor import shutdown_executor
 
 app = FastAPI(title="RAN Quality Evaluator API", debug=settings.API_DEBUG)
 
+# Middleware added last runs first: CORS -> compression -> conditional requests -> admission -> routes
+# Bulkheads for the heavy endpoint classes (304s are answered before taking a slot); health,
+# search and metrics have no class and are never queued or shed
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        routes=app.router.routes,
+        rules=[
+            ("POST", "/api/evaluate", "evaluate"),
+            ("POST", "/api/evaluate/batch", "batch"),
+            ("POST", "/api/report", "report"),
+            ("GET", "/api/areas/h3/cqi", "timeseries"),
+        ] + [
+            ("GET", f"/api/sites/{{site_att}}/{path}", "timeseries")
+            for path in ("cqi", "traffic", "traffic/voice", "cell-changes", "neighbors/list", "neighbors/geo",
+                         "neighbors/cqi", "neighbors/traffic", "neighbors/traffic/voice")
+        ],
+        limits=parse_limits(settings.ADMISSION_LIMITS),
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        max_wait_s=settings.ADMISSION_MAX_WAIT_S,
+        shed_saturation=settings.ADMISSION_SHED_SATURATION,
+    )
+# ETag/Last-Modified + 304 for responses that only change when ingestion advances the watermark
+if settings.HTTP_CONDITIONAL:
+    app.add_middleware(
+        ConditionalRequestMiddleware,
+        rules=[
+            ("GET", "/api/sites", ("/api/sites/search",)),
+        ],
+    )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -25,11 +77,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route template for /api/metrics (outermost: times the whole stack)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+# Span tracing for requests sent with `X-Trace: 1` (and a TRACE_SAMPLE_RATE fraction of the rest)
+app.add_middleware(TracingMiddleware, routes=app.router.routes, sample_rate=settings.TRACE_SAMPLE_RATE)
+
 # Routers
 app.include_router(health_router, prefix="/api")
 app.include_router(sites_router, prefix="/api")
 app.include_router(evaluate_router, prefix="/api")
+app.include_router(evaluate_batch_router, prefix="/api")
 app.include_router(report_router, prefix="/api")
+app.include_router(areas_router, prefix="/api")
+app.include_router(traces_router, prefix="/api")
+
+
+@app.on_event("startup")
+def _load_site_index():
+    # Background loads: search and neighbor lookups use the database until the indexes are ready
+    site_index.start()
+    site_spatial_index.start()
+
+
+@app.on_event("shutdown")
+def _dispose_db_pools():
+    shutdown_executor()
+    dispose_all()
 
 
 @app.get("/")
@@ -0,0 +1,371 @@
+"""API load test: latency percentiles, throughput, DB statements per request and server RSS.
+
+Drives the evaluate, report, site and neighbor endpoints at a fixed concurrency against a
+running API (one worker: /api/metrics is per process) backed by a synthetic database
+(quality_assurance_code/generate_synthetic_data.py). Each scenario runs on its own so the
+/api/metrics deltas around it belong to that scenario only.
+
+    python benchmarks/api_load.py --base-url http://localhost:8000 --concurrency 8 --requests 200
+    python benchmarks/api_load.py --compare benchmarks/results/api-20250701-101500.json
+
+Results are written as JSON (benchmarks/results/api-<timestamp>.json by default); with
+--compare, p95 latency, throughput and statements per request are checked against a previous
+run and the exit code is 1 when any scenario regressed by more than --max-regression.
+"""
+import os
+import sys
+import gzip
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+import concurrent.futures
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SCENARIOS = (
+    'sites.search', 'site.cqi', 'site.traffic', 'neighbors.list', 'neighbors.geo',
+    'neighbors.cqi', 'neighbors.traffic', 'evaluate', 'report',
+)
+# Requests per scenario are scaled by this factor (reports render a PDF each)
+SCENARIO_WEIGHT = {'report': 0.1}
+
+
+class Client:
+    """Keep-alive HTTP connection per thread."""
+
+    def __init__(self, base_url, timeout_s=120.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout_s)
+        return conn
+
+    def request(self, method, path, body=None):
+        """(status, decoded body, bytes on the wire); status 0 when the connection failed."""
+        headers = {'Accept-Encoding': 'gzip'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(method, self.prefix + path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                wire = len(data)
+                if response.getheader('Content-Encoding') == 'gzip':
+                    data = gzip.decompress(data)
+                return response.status, data, wire
+            except (OSError, http.client.HTTPException):
+                # Stale keep-alive connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    return 0, b'', 0
+
+    def get_json(self, path):
+        status, data, _ = self.request('GET', path)
+        if status != 200:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+
+# ----- /api/metrics -----
+def parse_metrics(text):
+    """Prometheus text -> {(name, frozenset(labels)): value}."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        head, _, value = line.rpartition(' ')
+        name, _, labels = head.partition('{')
+        pairs = []
+        for item in labels.rstrip('}').split('",') if labels else ():
+            key, _, val = item.partition('=')
+            pairs.append((key.strip(','), val.strip('"')))
+        try:
+            samples[(name, frozenset(pairs))] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def metric_sum(samples, name, exclude_route=None):
+    return sum(v for (n, labels), v in samples.items()
+               if n == name and (exclude_route is None or ('route', exclude_route) not in labels))
+
+
+def scrape(client):
+    status, data, _ = client.request('GET', '/api/metrics')
+    return parse_metrics(data.decode('utf-8', 'replace')) if status == 200 else None
+
+
+# ----- Workload -----
+def site_pool(client, prefix, size):
+    """Up to `size` site ids starting with `prefix`, breadth-first over /api/sites/search."""
+    pool, queue, seen = [], [prefix], set()
+    while queue and len(pool) < size:
+        q = queue.pop(0)
+        found = client.get_json('/api/sites/search?' + urlencode({'q': q, 'limit': 50})) or []
+        for site in found:
+            site = site if isinstance(site, str) else site.get('site_att') or site.get('site_id')
+            if site and site not in seen:
+                seen.add(site)
+                pool.append(site)
+        if len(found) == 50:
+            queue.extend(q + c for c in '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    return pool[:size]
+
+
+def event_dates(client, sites, fallback):
+    """Cell change dates per site (the dates /evaluate is normally asked about)."""
+    out = {}
+    for site in sites:
+        rows = client.get_json(f'/api/sites/{site}/event-dates?limit=5') or []
+        dates = [r['date'] for r in rows if r.get('date')]
+        out[site] = dates or [fallback.isoformat()]
+    return out
+
+
+def build_requests(name, sites, dates, n, args, rng):
+    """(method, path, body) list for one scenario; sites rotate so requests are mostly cache-cold."""
+    to_date = args.input_date + timedelta(days=args.period * 3)
+    from_date = args.input_date - timedelta(days=args.period * 3)
+    window = urlencode({'from_date': from_date.isoformat(), 'to_date': to_date.isoformat()})
+    out = []
+    for i in range(n):
+        site = sites[i % len(sites)]
+        if name == 'sites.search':
+            q = site[:max(1, len(site) - rng.randint(1, 3))]
+            out.append(('GET', '/api/sites/search?' + urlencode({'q': q, 'limit': 10}), None))
+        elif name == 'site.cqi':
+            out.append(('GET', f'/api/sites/{site}/cqi?{window}', None))
+        elif name == 'site.traffic':
+            out.append(('GET', f'/api/sites/{site}/traffic?{window}', None))
+        elif name == 'neighbors.list':
+            out.append(('GET', f'/api/sites/{site}/neighbors/list?radius_km={args.radius_km}', None))
+        elif name == 'neighbors.geo':
+            out.append(('GET', f'/api/sites/{site}/neighbors/geo?radius_km={args.radius_km}', None))
+        elif name == 'neighbors.cqi':
+            out.append(('GET', f'/api/sites/{site}/neighbors/cqi?{window}&radius_km={args.radius_km}', None))
+        elif name == 'neighbors.traffic':
+            out.append(('GET', f'/api/sites/{site}/neighbors/traffic?{window}&radius_km={args.radius_km}', None))
+        elif name in ('evaluate', 'report'):
+            site_dates = dates.get(site) or [args.input_date.isoformat()]
+            body = {
+                'site_att': site,
+                'input_date': site_dates[(i // len(sites)) % len(site_dates)],
+                'period': args.period,
+                'guard': args.guard,
+                'radius_km': args.radius_km,
+                'vecinos': '',
+            }
+            out.append(('POST', '/api/evaluate' if name == 'evaluate' else '/api/report', body))
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+    return out
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def run_scenario(client, name, requests, concurrency, warmup):
+    """Run the requests with `concurrency` workers; returns the scenario's result dict."""
+    for method, path, body in requests[:warmup]:
+        client.request(method, path, body)
+    requests = requests[warmup:]
+
+    before = scrape(client)
+    latencies, statuses, sizes = [], {}, []
+    lock = threading.Lock()
+
+    def one(req):
+        t0 = time.perf_counter()
+        status, _, wire = client.request(*req)
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            sizes.append(wire)
+
+    t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, requests))
+    wall = time.perf_counter() - t0
+    after = scrape(client)
+
+    latencies.sort()
+    ok = sum(c for s, c in statuses.items() if 200 <= s < 300)
+    result = {
+        'requests': len(requests),
+        'ok': ok,
+        'statuses': {str(s): c for s, c in sorted(statuses.items())},
+        'concurrency': concurrency,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(requests) / wall, 2) if wall > 0 else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            **{f'p{p}': round(percentile(latencies, p) * 1000, 2) if latencies else None for p in (50, 95, 99)},
+            'max': round(latencies[-1] * 1000, 2) if latencies else None,
+        },
+        'wire_bytes_mean': int(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+    if before is not None and after is not None:
+        served = (metric_sum(after, 'http_requests_total', '/api/metrics')
+                  - metric_sum(before, 'http_requests_total', '/api/metrics'))
+        statements = (metric_sum(after, 'db_statement_duration_seconds_count')
+                      - metric_sum(before, 'db_statement_duration_seconds_count'))
+        db_seconds = (metric_sum(after, 'db_statement_duration_seconds_sum')
+                      - metric_sum(before, 'db_statement_duration_seconds_sum'))
+        result['server'] = {
+            'requests': int(served),
+            'db_statements': int(statements),
+            'db_statements_per_request': round(statements / served, 2) if served else None,
+            'db_seconds_per_request': round(db_seconds / served, 4) if served else None,
+            'db_statement_errors': int(metric_sum(after, 'db_statement_errors_total')
+                                       - metric_sum(before, 'db_statement_errors_total')),
+            'rss_mb': round(metric_sum(after, 'process_resident_memory_bytes') / 2 ** 20, 1),
+            'peak_rss_mb': round(metric_sum(after, 'process_max_resident_memory_bytes') / 2 ** 20, 1),
+        }
+    return result
+
+
+# ----- Comparison -----
+def compare(current, previous, max_regression):
+    """Print per-scenario changes; returns the scenarios whose p95 or statements/request regressed."""
+    regressed = []
+    print(f"\nCompared with {previous.get('meta', {}).get('started_at')} ({previous.get('meta', {}).get('git_commit')})")
+    print(f"{'scenario':<20}{'p95 ms':>12}{'change':>9}{'rps':>10}{'change':>9}{'stmts/req':>11}{'change':>9}")
+    for name, cur in current['scenarios'].items():
+        prev = previous.get('scenarios', {}).get(name)
+        if not prev:
+            continue
+        row = [name]
+        bad = False
+        for value, old, higher_is_worse in (
+            (cur['latency_ms']['p95'], prev['latency_ms']['p95'], True),
+            (cur['throughput_rps'], prev['throughput_rps'], False),
+            ((cur.get('server') or {}).get('db_statements_per_request'),
+             (prev.get('server') or {}).get('db_statements_per_request'), True),
+        ):
+            if value is None or not old:
+                row += ['-', '-']
+                continue
+            change = (value - old) / old
+            row += [f"{value:.2f}", f"{change:+.0%}"]
+            if higher_is_worse and change > max_regression:
+                bad = True
+        if bad:
+            regressed.append(name)
+        print(f"{row[0]:<20}{row[1]:>12}{row[2]:>9}{row[3]:>10}{row[4]:>9}{row[5]:>11}{row[6]:>9}"
+              + ('  REGRESSION' if bad else ''))
+    return regressed
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the RAN quality API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", default=','.join(DEFAULT_SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario (report: 10%%)")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests per scenario sent before measuring")
+    parser.add_argument("--site-prefix", default="SYN", help="Site id prefix the site pool is drawn from")
+    parser.add_argument("--pool", type=int, default=500, help="Distinct sites to rotate through")
+    parser.add_argument("--input-date", type=date.fromisoformat, default=date.today() - timedelta(days=30),
+                        help="Reference date for data windows (and evaluate when a site has no change events)")
+    parser.add_argument("--period", type=int, default=7)
+    parser.add_argument("--guard", type=int, default=7)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result file (default benchmarks/results/api-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95 / statements increase")
+    args = parser.parse_args(argv)
+
+    client = Client(args.base_url)
+    if client.get_json('/api/health') is None:
+        print(f"Error: API not reachable at {args.base_url}")
+        return 2
+    rng = random.Random(args.seed)
+    sites = site_pool(client, args.site_prefix, args.pool)
+    if not sites:
+        print(f"Error: no sites matching '{args.site_prefix}' (load a synthetic database first)")
+        return 2
+    rng.shuffle(sites)
+    names = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    dates = event_dates(client, sites, args.input_date) if {'evaluate', 'report'} & set(names) else {}
+    print(f"{len(sites)} sites, concurrency {args.concurrency}, {args.requests} requests per scenario")
+
+    started = datetime.now()
+    results = {
+        'meta': {
+            'started_at': started.isoformat(timespec='seconds'),
+            'base_url': args.base_url,
+            'git_commit': _git_commit(),
+            'sites': len(sites),
+            'args': {k: (v.isoformat() if isinstance(v, date) else v) for k, v in vars(args).items()},
+        },
+        'scenarios': {},
+    }
+    for name in names:
+        n = max(1, int(args.requests * SCENARIO_WEIGHT.get(name, 1.0)))
+        warmup = min(args.warmup, n)
+        requests = build_requests(name, sites, dates, n + warmup, args, rng)
+        result = run_scenario(client, name, requests, args.concurrency, warmup)
+        results['scenarios'][name] = result
+        server = result.get('server') or {}
+        print(f"{name:<20} p50 {result['latency_ms']['p50']} ms  p95 {result['latency_ms']['p95']} ms  "
+              f"p99 {result['latency_ms']['p99']} ms  {result['throughput_rps']} rps  "
+              f"ok {result['ok']}/{result['requests']}  stmts/req {server.get('db_statements_per_request')}  "
+              f"peak RSS {server.get('peak_rss_mb')} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressed = compare(results, previous, args.max_regression)
+        if regressed:
+            print(f"\nRegressed: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Vectorized unified CQI kernels for NR (5G), LTE (4G) and UMTS (3G).
+
+Two layers:
+  - *_cqi_score(): the CQI formula itself over KPI arrays (rates as fractions 0..1,
+    throughputs in kbps). Shared by the selectors and the quality_metrics level processors.
+  - unified_cqi_*(df): counters -> KPIs -> score for a whole DataFrame. These reproduce
+    calculate_unified_cqi_*_row() in select_db_cqi_daily exactly (same zero-for-null,
+    safe division, combined/vendor fallback and rounding) without a per-row Python loop.
+
+Equivalence with the row functions is checked by compare.py.
+"""
+import numpy as np
+import pandas as pd
+
+from cell_change_evolution.tracing import traced
+
+LTE_VENDORS = ['h4g', 's4g', 'e4g', 'n4g']
+UMTS_VENDORS = ['h3g', 'e3g', 'n3g']
+NR_VENDORS = ['e5g', 'n5g']
+NR_COMBINED_FIELDS = ['acc_mn', 'acc_sn', 'ret_mn', 'endc_ret_tot', 'thp_mn', 'thp_sn']
+
+
+# ----- Helpers -----
+def _col(df, name):
+    """Column as float64 with None/NaN -> 0 (zero-for-null); missing columns are all zeros."""
+    if name not in df.columns:
+        return np.zeros(len(df), dtype=float)
+    return pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def _sum_cols(df, names):
+    total = np.zeros(len(df), dtype=float)
+    for name in names:
+        total = total + _col(df, name)
+    return total
+
+
+def _sdiv(num, den):
+    """num / den where den != 0, else 0.0."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.zeros(np.broadcast(num, den).shape, dtype=float)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def round_half_even_like_python(values, decimals):
+    """np.round() with Python round() semantics.
+
+    np.round scales by 10**decimals before rounding, which can land exactly on .5 for
+    values whose binary representation is slightly off the tie. Those few elements are
+    re-rounded with the builtin so results match the row functions bit for bit.
+    """
+    arr = np.asarray(values, dtype=float)
+    with np.errstate(over='ignore', invalid='ignore'):
+        # Beyond 2**52 / 10**decimals there are no fractional digits left to round
+        exact = ~(np.abs(arr) < 2.0 ** 52 / 10.0 ** decimals)
+        out = np.where(exact, arr, np.round(arr, decimals))
+        scaled = arr * (10.0 ** decimals)
+        frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    near_tie = ~exact & (frac < 1e-6)
+    if near_tie.any():
+        idx = np.flatnonzero(near_tie)
+        out = out.copy()
+        out.flat[idx] = [round(float(v), decimals) for v in arr.flat[idx]]
+    return out
+
+
+# ----- CQI formulas -----
+def nr_cqi_score(acc_mn, acc_sn, ret_mn, endc_ret_tot, thp_mn_kbps, thp_sn_kbps):
+    """NR CQI (0..1). Rates are fractions (0..1), throughputs in kbps."""
+    return (0.17 * np.exp((1 - acc_mn) * -14.92648157) +
+            0.13 * np.exp((1 - acc_sn) * -26.68090256) +
+            0.17 * np.exp((1 - ret_mn) * -14.92648157) +
+            0.13 * np.exp((1 - endc_ret_tot) * -26.68090256) +
+            0.20 * (1 - np.exp(thp_mn_kbps * -0.0002006621)) +
+            0.20 * (1 - np.exp(thp_sn_kbps * -0.0002006621)))
+
+
+def lte_cqi_score(acc, ret, irat, thp_dl_kbps, p3g, latency_ms, ookla_thp_kbps):
+    """LTE CQI (0..1). acc/ret/irat/p3g are fractions (0..1), throughputs in kbps."""
+    return (0.25 * np.exp((1 - acc) * -63.91668575) +
+            0.25 * np.exp((1 - ret) * -63.91668575) +
+            0.05 * np.exp(irat * -22.31435513) +
+            0.30 * (1 - np.exp(thp_dl_kbps * -0.000282742)) +
+            0.05 * np.minimum(1, np.exp((p3g - 0.10) * -11.15717757)) +
+            0.05 * np.exp((latency_ms - 20.0) * -0.00526802578289131) +
+            0.05 * (1 - np.exp(ookla_thp_kbps * -0.00005364793041447)))
+
+
+def umts_cqi_score(acc_cs, ret_cs, acc_ps, ret_ps, thp_dl_kbps):
+    """UMTS CQI (0..1). Rates are fractions (0..1), throughput in kbps."""
+    return (0.25 * np.exp((1 - acc_cs) * -58.11779571) +
+            0.25 * np.exp((1 - ret_cs) * -58.11779571) +
+            0.15 * np.exp((1 - acc_ps) * -28.62016873) +
+            0.15 * np.exp((1 - ret_ps) * -28.62016873) +
+            0.20 * (1 - np.exp(thp_dl_kbps * -0.00094856)))
+
+
+# ----- Frame kernels (row-function equivalents) -----
+def _nr_combined_mask(df):
+    """Rows where every combined field is present (not None), as the row function checks.
+
+    NaN counts as present there (row.get() returns NaN, not None), so only None in
+    object columns or a missing column disables the combined path.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for name in NR_COMBINED_FIELDS:
+        if name not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        s = df[name]
+        if s.dtype == object:
+            mask &= np.fromiter((v is not None for v in s.to_numpy()), dtype=bool, count=len(s))
+    return mask
+
+
+@traced(cat='kernel')
+def unified_cqi_nr(df):
+    """Vectorized calculate_unified_cqi_nr_row over a DataFrame; returns a float array (0..1)."""
+    n = len(df)
+    if n == 0:
+        return np.zeros(0, dtype=float)
+    r8 = lambda a: round_half_even_like_python(a, 8)
+    r2 = lambda a: round_half_even_like_python(a, 2)
+
+    def vsum(field):
+        return _sum_cols(df, [f"{v}_{field}" for v in NR_VENDORS])
+
+    # Vendor totals path
+    acc_mn_v = (_sdiv(vsum('acc_rrc_num_n'), vsum('acc_rrc_den_n')) *
+                _sdiv(vsum('s1_sr_num_n'), vsum('s1_sr_den_n')) *
+                _sdiv(vsum('nsa_acc_erab_sr_4gendc_num_n'), vsum('nsa_acc_erab_sr_4gendc_den_n'))) * 100.0
+    acc_sn_v = _sdiv(vsum('nsa_acc_erab_succ_5gendc_5gleg_n'), vsum('nsa_acc_erab_att_5gendc_5gleg_n')) * 100.0
+    ret_mn_v = (1 - _sdiv(vsum('nsa_ret_erab_drop_4gendc_n'), vsum('nsa_ret_erab_att_4gendc_n'))) * 100.0
+    endc_v = (1 - _sdiv(vsum('nsa_ret_erab_drop_5gendc_4g5gleg_num_n'), vsum('nsa_ret_erab_drop_5gendc_4g5gleg_den_n'))) * 100.0
+    thp_sn_v = r2(_sdiv(vsum('nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_num_n'), vsum('nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_denom_n')))
+    thp_mn_v = r2(_sdiv(vsum('nsa_thp_mn_num'), vsum('nsa_thp_mn_den')))
+
+    combined = _nr_combined_mask(df)
+    if combined.any():
+        acc_mn = np.where(combined, r8(_col(df, 'acc_mn')), acc_mn_v)
+        acc_sn = np.where(combined, r8(_col(df, 'acc_sn')), acc_sn_v)
+        ret_mn = np.where(combined, r8(_col(df, 'ret_mn')), ret_mn_v)
+        endc = np.where(combined, r8(_col(df, 'endc_ret_tot')), endc_v)
+        thp_mn = np.where(combined, r2(_col(df, 'thp_mn')), thp_mn_v)
+        thp_sn = np.where(combined, r2(_col(df, 'thp_sn')), thp_sn_v)
+        # Combined throughputs are scaled by 1000 inside the exponential; vendor ones are not
+        factor = np.where(combined, 1000.0, 1.0)
+    else:
+        acc_mn, acc_sn, ret_mn, endc = acc_mn_v, acc_sn_v, ret_mn_v, endc_v
+        thp_mn, thp_sn = thp_mn_v, thp_sn_v
+        factor = 1.0
+
+    cqi = nr_cqi_score(r8(acc_mn) / 100.0, r8(acc_sn) / 100.0, r8(ret_mn) / 100.0, r8(endc) / 100.0,
+                       thp_mn * factor, thp_sn * factor)
+    return r8(cqi)
+
+
+@traced(cat='kernel')
+def unified_cqi_lte(df):
+    """Vectorized calculate_unified_cqi_lte_row over a DataFrame; returns a float array (0..1)."""
+    if len(df) == 0:
+        return np.zeros(0, dtype=float)
+
+    def vsum(field):
+        return _sum_cols(df, [f"{v}_{field}" for v in LTE_VENDORS])
+
+    erab_success = vsum('erab_success')
+    acc = (_sdiv(erab_success, vsum('erabs_attemps')) *
+           _sdiv(vsum('rrc_success_all'), vsum('rrc_attemps_all')) *
+           _sdiv(vsum('s1_success'), vsum('s1_attemps')) * 100.0)
+    ret = (1 - _sdiv(vsum('retainability_num'), vsum('retainability_denom'))) * 100.0
+    irat = _sdiv(vsum('irat_4g_to_3g_events'), erab_success)
+    thp_dl = _sdiv(vsum('thpt_user_dl_kbps_num'), vsum('thpt_user_dl_kbps_denom'))
+    t3g = vsum('time3g')
+    t4g = vsum('time4g')
+    p3g = _sdiv(t3g, t3g + t4g)
+    m_count = vsum('summuestras')
+    latency = _sdiv(vsum('sumavg_latency'), m_count)
+    ookla_thp = _sdiv(vsum('sumavg_dl_kbps'), m_count)
+
+    cqi = lte_cqi_score(acc / 100.0, ret / 100.0, irat, thp_dl, p3g, latency, ookla_thp)
+    return round_half_even_like_python(cqi, 8)
+
+
+@traced(cat='kernel')
+def unified_cqi_umts(df):
+    """Vectorized calculate_unified_cqi_umts_row over a DataFrame; returns a float array (0..1)."""
+    if len(df) == 0:
+        return np.zeros(0, dtype=float)
+
+    def vsum(field):
+        return _sum_cols(df, [f"{v}_{field}" for v in UMTS_VENDORS])
+
+    cs_acc = (_sdiv(vsum('rrc_success_cs'), vsum('rrc_attempts_cs')) *
+              _sdiv(vsum('nas_success_cs'), vsum('nas_attempts_cs')) *
+              _sdiv(vsum('rab_success_cs'), vsum('rab_attempts_cs'))) * 100
+    ps_acc = (_sdiv(vsum('rrc_success_ps'), vsum('rrc_attempts_ps')) *
+              _sdiv(vsum('nas_success_ps'), vsum('nas_attempts_ps')) *
+              _sdiv(vsum('rab_success_ps'), vsum('rab_attempts_ps'))) * 100
+    # Retainability is 0 (not 100) when there is no denominator, as in the row function
+    cs_den = vsum('drop_denom_cs')
+    cs_ret = np.where(cs_den != 0, (1 - _sdiv(vsum('drop_num_cs'), cs_den)) * 100, 0.0)
+    ps_den = vsum('ps_retainability_denom')
+    ps_ret = np.where(ps_den != 0, (1 - _sdiv(vsum('ps_retainability_num'), ps_den)) * 100, 0.0)
+    thp = _sdiv(vsum('thpt_user_dl_kbps_num'), vsum('thpt_user_dl_kbps_denom'))
+
+    cqi = umts_cqi_score(cs_acc / 100, cs_ret / 100, ps_acc / 100, ps_ret / 100, thp)
+    return round_half_even_like_python(cqi, 8)
@@ -2,6 +2,8 @@ import os
 import dotenv
 from sqlalchemy import create_engine, text
 
+from cell_change_evolution.data_watermark import refresh_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -232,6 +234,7 @@ def delete_newer_than(table, date):
         with engine.connect() as connection:
             connection.execute(text(delete_query), (date,))
             connection.commit()
+        refresh_data_watermark(table, engine=engine)
 
         print(f"Records newer than {date} have been deleted from {table}.")
         return True
@@ -252,6 +255,7 @@ def delete_all(table):
         with engine.connect() as connection:
             connection.execute(text(delete_query))
             connection.commit()
+        refresh_data_watermark(table, engine=engine)
 
         print(f"Records have been deleted from {table}.")
         return True
@@ -272,6 +276,7 @@ def truncate_table(table):
         with engine.connect() as connection:
             connection.execute(text(truncate_query))
             connection.commit()
+        refresh_data_watermark(table, engine=engine)
 
         print(f"Table '{table}' has been successfully truncated.")
         return True
@@ -0,0 +1,224 @@
+import os
+from datetime import date, datetime
+
+import dotenv
+from sqlalchemy import text
+
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.ttl_cache import TTLCache
+from cell_change_evolution.schema_cache import get_table_columns, table_exists
+
+# Load environment variables
+dotenv.load_dotenv()
+DATA_WATERMARK_TTL_S = float(os.getenv('DATA_WATERMARK_TTL_S', '60'))
+
+# Date column and technology of every table tracked in data_watermark
+WATERMARK_SOURCES = {
+    'umts_cqi_daily': ('date', '3G'),
+    'lte_cqi_daily': ('date', '4G'),
+    'nr_cqi_daily': ('date', '5G'),
+    'volte_cqi_vendor_daily': ('date', '4G'),
+    'umts_cell_traffic_daily': ('date', '3G'),
+    'lte_cell_traffic_daily': ('date', '4G'),
+    'umts_cell_traffic_period': ('end_date', '3G'),
+    'lte_cell_traffic_period': ('end_date', '4G'),
+    'umts_cell_change_event': ('date', '3G'),
+    'lte_cell_change_event': ('date', '4G'),
+    'master_node_neighbor': (None, ''),
+    'master_node_total': (None, ''),
+}
+
+# Tables (and their date column) scanned for the watermark while data_watermark is not populated
+FALLBACK_WATERMARK_TABLES = [
+    ('lte_cqi_daily', 'date'),
+    ('umts_cqi_daily', 'date'),
+    ('nr_cqi_daily', 'date'),
+    ('volte_cqi_vendor_daily', 'date'),
+    ('lte_cell_traffic_period', 'end_date'),
+    ('umts_cell_traffic_period', 'end_date'),
+    ('master_node_neighbor_state', 'refreshed_at'),
+]
+
+# Holds the data_watermark rows and, on databases without them, the fallback scan
+_watermark_cache = TTLCache(ttl_s=DATA_WATERMARK_TTL_S, maxsize=2, name='data_watermark')
+
+
+def update_data_watermark(table, max_date=None, engine=None):
+    """
+    Record that ingestion into `table` finished (public.data_watermark is created by
+    create_table_data_watermark() in quality_assurance_code/create_db_quality.py)
+
+    Args:
+        table (str): Table name, a key of WATERMARK_SOURCES
+        max_date (date, optional): Max date just loaded; the stored value only moves forward.
+            When omitted the max is recomputed from the table (after truncate/delete/rebuild).
+        engine: SQLAlchemy engine of the ingestion job (defaults to the pooled engine)
+
+    Returns:
+        bool: True if the watermark row was written
+    """
+    if table not in WATERMARK_SOURCES:
+        print(f"Error updating data watermark: unknown table {table}")
+        return False
+    column, technology = WATERMARK_SOURCES[table]
+
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as connection:
+            if max_date is None and column is not None:
+                max_date = connection.execute(text(f"SELECT MAX({column}) FROM public.{table}")).scalar()
+                merge = "EXCLUDED.max_date"
+            elif max_date is None:
+                max_date = date.today()
+                merge = "EXCLUDED.max_date"
+            else:
+                merge = "GREATEST(public.data_watermark.max_date, EXCLUDED.max_date)"
+            if isinstance(max_date, datetime):
+                max_date = max_date.date()
+            elif hasattr(max_date, 'to_pydatetime'):
+                max_date = max_date.to_pydatetime().date()
+            connection.execute(text(f"""
+                INSERT INTO public.data_watermark (table_name, technology, max_date, updated_at)
+                VALUES (:table_name, :technology, :max_date, CURRENT_TIMESTAMP)
+                ON CONFLICT (table_name, technology) DO UPDATE
+                SET max_date = {merge}, updated_at = EXCLUDED.updated_at
+            """), {'table_name': table, 'technology': technology, 'max_date': max_date})
+            connection.commit()
+        print(f"Data watermark for {table}: {max_date}")
+        return True
+
+    except Exception as e:
+        print(f"Error updating data watermark for {table}: {e}")
+        return False
+
+
+def refresh_data_watermark(table, engine=None):
+    """Recompute the watermark of `table` after rows were deleted/truncated; no-op for untracked tables."""
+    table = table.split('.')[-1].strip().strip('"')
+    if table not in WATERMARK_SOURCES:
+        return False
+    return update_data_watermark(table, engine=engine)
+
+
+def get_data_watermark_rows(engine=None):
+    """
+    Read every data_watermark row
+
+    Returns:
+        dict: {table_name: {'technology', 'max_date', 'updated_at'}}; empty if the table
+              does not exist yet, None if the database is unavailable
+    """
+    try:
+        engine = engine or get_engine()
+        columns = get_table_columns('data_watermark', engine=engine)
+        if columns is None:
+            return None
+        if not columns:
+            return {}
+        with engine.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT table_name, technology, max_date, updated_at FROM public.data_watermark"
+            )).fetchall()
+        return {
+            r.table_name: {'technology': r.technology, 'max_date': r.max_date, 'updated_at': r.updated_at}
+            for r in rows
+        }
+
+    except Exception as e:
+        print(f"Error fetching data watermark: {e}")
+        return None
+
+
+def get_data_watermark_rows_cached():
+    """get_data_watermark_rows() reused for DATA_WATERMARK_TTL_S seconds within the process."""
+    rows = _watermark_cache.get('rows')
+    if rows is None:
+        rows = get_data_watermark_rows()
+        if rows is not None:
+            _watermark_cache.set('rows', rows)
+    return rows
+
+
+def _watermark_from_rows(rows):
+    # Last update time is included so re-ingesting the same dates also invalidates caches
+    return {table: f"{row['max_date']}|{row['updated_at']}" for table, row in rows.items()}
+
+
+def _scan_data_watermark(engine=None):
+    """MAX() of FALLBACK_WATERMARK_TABLES, for databases where data_watermark is not populated yet."""
+    try:
+        engine = engine or get_engine()
+        watermark = {}
+        with engine.connect() as connection:
+            for table, column in FALLBACK_WATERMARK_TABLES:
+                if not table_exists(table, engine=engine):
+                    watermark[table] = None
+                    continue
+                value = connection.execute(text(f"SELECT MAX({column}) FROM public.{table}")).scalar()
+                watermark[table] = value.isoformat() if value is not None else None
+        return watermark
+
+    except Exception as e:
+        print(f"Error fetching data watermark: {e}")
+        return None
+
+
+def get_data_watermark(engine=None):
+    """
+    Get the max loaded date per table used by the evaluation
+
+    Returns:
+        dict: {table: ISO date/timestamp string or None}, or None if the database is unavailable
+    """
+    rows = get_data_watermark_rows(engine=engine)
+    if rows is None:
+        return None
+    return _watermark_from_rows(rows) if rows else _scan_data_watermark(engine)
+
+
+def get_data_watermark_cached():
+    """get_data_watermark() reused for DATA_WATERMARK_TTL_S seconds within the process."""
+    rows = get_data_watermark_rows_cached()
+    if rows is None:
+        return None
+    if rows:
+        return _watermark_from_rows(rows)
+    watermark = _watermark_cache.get('scan')
+    if watermark is None:
+        watermark = _scan_data_watermark()
+        if watermark is not None:
+            _watermark_cache.set('scan', watermark)
+    return watermark
+
+
+def clear_data_watermark_cache():
+    _watermark_cache.clear()
+
+
+def get_watermark_max_date(tables, combine=min):
+    """
+    Combine the watermarked max dates of `tables` (min by default: the date all of them reached)
+
+    Returns:
+        date: Combined max date, or None if none of the tables is watermarked
+    """
+    rows = get_data_watermark_rows_cached() or {}
+    dates = [rows[t]['max_date'] for t in tables if t in rows and rows[t]['max_date'] is not None]
+    return combine(dates) if dates else None
+
+
+def get_max_date_by_technology():
+    """
+    Max loaded date per technology over the daily tables
+
+    Returns:
+        dict: {'3G': date, '4G': date, '5G': date} for the technologies present
+    """
+    rows = get_data_watermark_rows_cached() or {}
+    result = {}
+    for table, row in rows.items():
+        tech = row['technology']
+        if not tech or row['max_date'] is None or not table.endswith('_daily'):
+            continue
+        result[tech] = max(result[tech], row['max_date']) if tech in result else row['max_date']
+    return result
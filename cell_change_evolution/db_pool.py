@@ -0,0 +1,163 @@
+import os
+import threading
+import dotenv
+from sqlalchemy import create_engine
+
+from cell_change_evolution.query_budget import install_budget_hooks
+from cell_change_evolution.metrics import install_metrics_hooks, register_collector
+from cell_change_evolution.tracing import install_tracing_hooks
+
+# Load environment variables
+dotenv.load_dotenv()
+POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_DB = os.getenv('POSTGRES_DB')
+
+# Role used when callers do not ask for one explicitly (e.g. 'api' in the backend, 'batch' in jobs)
+DEFAULT_ROLE = os.getenv('DB_ROLE', 'default')
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def _env(name, role, default=None):
+    """Read `<NAME>_<ROLE>` first, then `<NAME>`, then the default."""
+    value = os.getenv(f"{name}_{role.upper()}")
+    if value is None or value == '':
+        value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value
+
+
+def _env_bool(name, role, default):
+    return str(_env(name, role, str(default))).lower() in ('1', 'true', 'yes', 'on')
+
+
+def default_dsn():
+    """Connection string built from the POSTGRES_* environment variables."""
+    return f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+
+def resolve_dsn(role=None, dsn=None):
+    """Resolve the DSN for a role.
+
+    Priority: explicit dsn argument, POSTGRES_DSN_<ROLE> env var, POSTGRES_* defaults.
+    """
+    if dsn:
+        return dsn
+    role = role or DEFAULT_ROLE
+    return os.getenv(f"POSTGRES_DSN_{role.upper()}") or default_dsn()
+
+
+def pool_options(role=None):
+    """Pool configuration for a role, overridable per role with a `_<ROLE>` suffix.
+
+    DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT_S (30),
+    DB_POOL_RECYCLE_S (1800), DB_POOL_PRE_PING (true).
+    """
+    role = role or DEFAULT_ROLE
+    return {
+        'pool_size': int(_env('DB_POOL_SIZE', role, 5)),
+        'max_overflow': int(_env('DB_MAX_OVERFLOW', role, 10)),
+        'pool_timeout': float(_env('DB_POOL_TIMEOUT_S', role, 30)),
+        'pool_recycle': int(_env('DB_POOL_RECYCLE_S', role, 1800)),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', role, True),
+    }
+
+
+def get_engine(role=None, dsn=None):
+    """Return the process-wide pooled engine for a role, creating it on first use.
+
+    Engines are shared by every selector and job in the process, so callers must
+    NOT dispose them; connections go back to the pool when released. Statements run
+    while a QueryBudget is bound get a statement_timeout and can be cancelled.
+    """
+    role = role or DEFAULT_ROLE
+    url = resolve_dsn(role, dsn)
+    key = (role, url)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(url, **pool_options(role))
+            install_budget_hooks(engine)
+            install_metrics_hooks(engine)
+            install_tracing_hooks(engine)
+            _engines[key] = engine
+    return engine
+
+
+def pool_stats():
+    """Return pool utilization per role: size, checked in/out, overflow and saturation (0..1)."""
+    stats = {}
+    for (role, _url), engine in list(_engines.items()):
+        pool = engine.pool
+        try:
+            size = pool.size()
+            checked_out = pool.checkedout()
+            checked_in = pool.checkedin()
+            overflow = max(pool.overflow(), 0)
+            max_overflow = getattr(pool, '_max_overflow', 0)
+        except Exception:
+            continue
+        capacity = size + max(max_overflow, 0)
+        entry = stats.setdefault(role, {
+            'engines': 0, 'size': 0, 'max_overflow': 0, 'checked_out': 0,
+            'checked_in': 0, 'overflow': 0, 'capacity': 0,
+        })
+        entry['engines'] += 1
+        entry['size'] += size
+        entry['max_overflow'] += max(max_overflow, 0)
+        entry['checked_out'] += checked_out
+        entry['checked_in'] += checked_in
+        entry['overflow'] += overflow
+        entry['capacity'] += capacity
+    for entry in stats.values():
+        entry['saturation'] = (entry['checked_out'] / entry['capacity']) if entry['capacity'] else 0.0
+    return stats
+
+
+@register_collector
+def _pool_metrics():
+    stats = pool_stats()
+    gauges = (
+        ('db_pool_checked_out', 'checked_out', 'Connections in use.'),
+        ('db_pool_checked_in', 'checked_in', 'Idle connections in the pool.'),
+        ('db_pool_overflow', 'overflow', 'Connections open beyond pool_size.'),
+        ('db_pool_capacity', 'capacity', 'pool_size + max_overflow.'),
+        ('db_pool_saturation', 'saturation', 'checked_out / capacity (0..1).'),
+    )
+    return [
+        (name, 'gauge', doc, [({'role': role}, entry[field]) for role, entry in stats.items()])
+        for name, field, doc in gauges
+    ]
+
+
+def dispose_all():
+    """Dispose every registered engine (application shutdown / end of a batch run)."""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        try:
+            engine.dispose()
+        except Exception as e:
+            print(f"Error disposing engine: {e}")
+
+
+def _reset_after_fork():
+    # Child processes must not reuse sockets inherited from the parent pool
+    for engine in list(_engines.values()):
+        try:
+            engine.dispose(close=False)
+        except Exception:
+            pass
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
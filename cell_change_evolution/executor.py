@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+import collections
+import concurrent.futures
+
+from cell_change_evolution.metrics import Counter, Histogram, register_collector
+
+# Worker threads of the process-wide pool; every selector fan-out and evaluation phase shares them
+SHARED_EXECUTOR_WORKERS = int(os.getenv('SHARED_EXECUTOR_WORKERS', '16'))
+
+QUEUE_WAIT_SECONDS = Histogram(
+    'executor_queue_wait_seconds',
+    'Time tasks waited between submit and start on the shared executor.',
+)
+INLINE_RUNS = Counter(
+    'executor_inline_runs_total',
+    'Tasks run by a pool worker waiting on them, instead of by a free worker (nested fan-outs).',
+)
+
+_executor = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Task(concurrent.futures.Future):
+    """Future of a shared-pool task.
+
+    A pool worker blocking on result()/exception() of a task nobody has started runs it
+    itself: nested fan-outs (an evaluation phase whose selectors fan out per technology)
+    can then never wait on tasks queued behind their own parents. A timeout passed to
+    result() does not interrupt such an inline run; `ran_inline` tells callers with a
+    deadline to check it afterwards.
+    """
+
+    def __init__(self, executor, fn, args, kwargs):
+        super().__init__()
+        self._executor = executor
+        self._call = (fn, args, kwargs)
+        self._claim = threading.Lock()
+        self._submitted_at = time.perf_counter()
+        self._dispatched = False
+        self.ran_inline = False
+
+    def _run(self, inline=False):
+        if not self._claim.acquire(blocking=False):
+            return
+        if not self.set_running_or_notify_cancel():
+            self._executor._dropped(self)
+            return
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - self._submitted_at)
+        if inline:
+            self.ran_inline = True
+            INLINE_RUNS.inc()
+        fn, args, kwargs = self._call
+        self._call = None
+        self._executor._started(self)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.set_exception(e)
+        else:
+            self.set_result(result)
+        finally:
+            self._executor._finished(self)
+
+    def _help(self):
+        if getattr(_local, 'executor', None) is self._executor and not self.done():
+            self._run(inline=True)
+
+    def result(self, timeout=None):
+        self._help()
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        self._help()
+        return super().exception(timeout)
+
+
+class TaskGroup:
+    """Tasks of one fan-out, at most `max_workers` of them on the shared pool at a time.
+
+    Same surface as the ThreadPoolExecutor it replaces (submit, shutdown, context manager),
+    so a call site keeps its shape; shutdown() only waits for / cancels this group's tasks.
+    """
+
+    def __init__(self, executor, max_workers=None):
+        self._executor = executor
+        self._limit = max(1, int(max_workers)) if max_workers else None
+        self._pending = collections.deque()
+        self._running = 0
+        self._tasks = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        task = _Task(self._executor, fn, args, kwargs)
+        with self._lock:
+            self._tasks.append(task)
+            now = self._limit is None or self._running < self._limit
+            if now:
+                self._running += 1
+            else:
+                self._pending.append(task)
+        if now:
+            self._dispatch(task)
+        return task
+
+    def _dispatch(self, task):
+        task._dispatched = True
+        task.add_done_callback(self._task_done)
+        self._executor._dispatch(task)
+
+    def _task_done(self, task):
+        nxt = None
+        with self._lock:
+            self._running -= 1
+            while self._pending:
+                candidate = self._pending.popleft()
+                if not candidate.done():
+                    nxt = candidate
+                    self._running += 1
+                    break
+        if nxt is not None:
+            self._dispatch(nxt)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self._lock:
+            tasks = list(self._tasks)
+        if cancel_futures:
+            for task in tasks:
+                task.cancel()
+        if wait:
+            for task in tasks:
+                if not task.cancelled():
+                    task.exception()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
+
+
+class SharedExecutor:
+    """Bounded thread pool shared by the whole process instead of a pool per call.
+
+    Callers queue behind `max_workers` threads, so concurrent evaluations cannot multiply
+    threads (and DB connections) the way per-request pools did. Pool workers waiting on a
+    task of this pool run it themselves when it has not started (see _Task); other threads
+    just wait. Use group(max_workers) for a per-call cap on top of the global one.
+    """
+
+    def __init__(self, max_workers=SHARED_EXECUTOR_WORKERS, name='shared'):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=name, initializer=self._init_worker)
+        self._queued = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _init_worker(self):
+        _local.executor = self
+
+    def _dispatch(self, task):
+        with self._lock:
+            self._queued += 1
+        try:
+            self._pool.submit(task._run)
+        except RuntimeError:
+            # Pool shut down (application exit): run in the caller like an unbounded pool would
+            task._run(inline=True)
+
+    def _started(self, task):
+        with self._lock:
+            if task._dispatched:
+                self._queued -= 1
+            self._active += 1
+
+    def _finished(self, task):
+        with self._lock:
+            self._active -= 1
+
+    def _dropped(self, task):
+        # Cancelled while queued
+        if task._dispatched:
+            with self._lock:
+                self._queued -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        task = _Task(self, fn, args, kwargs)
+        task._dispatched = True
+        self._dispatch(task)
+        return task
+
+    def group(self, max_workers=None):
+        return TaskGroup(self, max_workers)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.max_workers, 'active': self._active, 'queued': self._queued}
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def get_executor():
+    """The process-wide SharedExecutor (SHARED_EXECUTOR_WORKERS threads), created on first use."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = SharedExecutor()
+    return _executor
+
+
+def shutdown_executor():
+    """Stop accepting work on the shared executor; queued tasks still finish (application shutdown)."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+@register_collector
+def _executor_metrics():
+    if _executor is None:
+        return []
+    s = _executor.stats()
+    return [
+        ('executor_workers', 'gauge', 'Threads of the shared executor.', [({}, s['workers'])]),
+        ('executor_tasks', 'gauge', 'Shared executor tasks by state.',
+         [({'state': 'active'}, s['active']), ({'state': 'queued'}, s['queued'])]),
+    ]
+
+
+def _reset_after_fork():
+    # Pool threads do not survive fork; the child builds its own pool on first use
+    global _executor
+    _executor = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
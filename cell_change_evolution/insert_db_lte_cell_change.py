@@ -6,6 +6,8 @@ import logging
 from sqlalchemy import create_engine, text
 from cell_change_processor import process_cell_report, create_incremental_summary
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -137,6 +139,7 @@ def lte_cell_change_process():
                 
                 if incremental_df is not None:
                     if insert_incremental_summary_to_db(incremental_df, engine):
+                        update_data_watermark('lte_cell_change_event', engine=engine)
                         logger.info("Processing completed successfully")
                         return True                    
         return False
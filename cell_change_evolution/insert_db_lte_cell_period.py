@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import datetime
 from sqlalchemy import create_engine, text
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
@@ -250,6 +252,11 @@ def lte_cell_period_process():
     if not end_success:
         print("End_date processing failed.")
         return False
+
+    # Step 4: Advance the data watermark (table was rebuilt, so its max end_date is recomputed)
+    print("STEP 4: Updating data watermark...")
+    print("-" * 40)
+    update_data_watermark('lte_cell_traffic_period')
     
     # Summary
     print("=" * 60)
@@ -5,6 +5,8 @@ import logging
 from datetime import datetime
 from sqlalchemy import create_engine, text
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -564,6 +566,7 @@ def umts_cell_change_process():
                 
                 if incremental_df is not None:
                     if insert_incremental_summary_to_db(incremental_df, engine):
+                        update_data_watermark('umts_cell_change_event', engine=engine)
                         summary_file = save_report_summary(incremental_df)
                         logger.info("Processing completed successfully")
                         return True                    
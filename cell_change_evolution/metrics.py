@@ -0,0 +1,338 @@
+import os
+import math
+import time
+import sys
+import inspect
+import functools
+import threading
+import contextvars
+
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+from cell_change_evolution.tracing import NULL_SPAN, span
+
+# Kept free of other project imports (tracing aside): db_pool, ttl_cache and query_budget report here.
+
+# Seconds; Prometheus defaults extended down to 1 ms (selectors) and up to 60 s (evaluations)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = []
+_collectors = []
+_caches = {}
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts..., +Inf count], sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in sorted(items):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+def register_collector(fn):
+    """Register fn() -> [(name, kind, documentation, [(labels, value), ...])], called on every scrape."""
+    with _lock:
+        if fn not in _collectors:
+            _collectors.append(fn)
+    return fn
+
+
+def track_cache(name, cache):
+    """Report hit/miss counts of a cache exposing stats() -> {'hits', 'misses', ...} under `name`."""
+    with _lock:
+        _caches[name] = cache
+
+
+def render_text():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+    for metric in metrics:
+        samples = list(metric.samples())
+        if not samples:
+            continue
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for name, labels, value in samples)
+    for collector in collectors:
+        try:
+            families = list(collector())
+        except Exception as e:
+            print(f"Error collecting metrics from {getattr(collector, '__name__', collector)}: {e}")
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+# ----- Selectors and statements -----
+SELECTOR_SECONDS = Histogram(
+    'selector_duration_seconds',
+    'Time spent in select_db_* functions; phase=query is time inside DB statements, phase=pandas the rest.',
+    ('selector', 'phase'),
+)
+SELECTOR_CALLS = Counter(
+    'selector_calls_total',
+    'select_db_* calls by outcome (ok, none: returned None after an error, error: raised).',
+    ('selector', 'outcome'),
+)
+STATEMENT_SECONDS = Histogram(
+    'db_statement_duration_seconds',
+    'Execution time of DB statements, labelled with the innermost running selector.',
+    ('selector',),
+)
+STATEMENT_ERRORS = Counter(
+    'db_statement_errors_total',
+    'Failed DB statements by SQLSTATE class (57 = canceled / statement_timeout).',
+    ('selector', 'sqlstate_class'),
+)
+BUDGET_EVENTS = Counter(
+    'query_budget_events_total',
+    'Query budget events: timeout, statement_timeout, skipped, cancelled, cancelled_statement.',
+    ('kind',),
+)
+
+# Selectors running in the current context, innermost last: (label, [db seconds])
+_selector_stack = contextvars.ContextVar('metrics_selectors', default=())
+
+
+def timed_selector(fn, label):
+    """Wrap a selector so its total, DB and pandas time are recorded under `label`.
+
+    DB time is the time spent in statements executed while the selector runs (nested
+    selectors count for every enclosing one); the rest is attributed to pandas/Python.
+    Statements run on other threads (executor pools) are not attributed to the caller
+    unless the context is propagated (tracing.propagate). When a trace is bound the call
+    is also a span carrying the rows and in-memory bytes of the returned frame.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        frame = (label, [0.0])
+        token = _selector_stack.set(_selector_stack.get() + (frame,))
+        outcome = 'error'
+        t0 = time.perf_counter()
+        try:
+            with span(label, cat='selector') as s:
+                result = fn(*args, **kwargs)
+                if s is not NULL_SPAN and hasattr(result, 'memory_usage') and hasattr(result, 'shape'):
+                    s.set(rows=int(result.shape[0]), bytes=int(result.memory_usage(index=True).sum()))
+            outcome = 'none' if result is None else 'ok'
+            return result
+        finally:
+            total = time.perf_counter() - t0
+            _selector_stack.reset(token)
+            db = min(frame[1][0], total)
+            SELECTOR_SECONDS.observe(db, selector=label, phase='query')
+            SELECTOR_SECONDS.observe(total - db, selector=label, phase='pandas')
+            SELECTOR_CALLS.inc(selector=label, outcome=outcome)
+
+    wrapper.__wrapped_selector__ = fn
+    return wrapper
+
+
+def instrument_selectors(namespace, exclude=()):
+    """Wrap every public function defined in a select_db_* module (call at the end of the module).
+
+    Module globals are replaced, so calls between selectors of the same module and
+    `from ... import` in other modules both go through the wrapper. Per-row helpers
+    belong in `exclude`.
+    """
+    module = namespace['__name__']
+    prefix = module.rsplit('.', 1)[-1].replace('select_db_', '')
+    skip = set(exclude) | {'create_connection'}
+    for name, fn in list(namespace.items()):
+        if (inspect.isfunction(fn) and fn.__module__ == module and not name.startswith('_')
+                and name not in skip and not hasattr(fn, '__wrapped_selector__')):
+            namespace[name] = timed_selector(fn, f'{prefix}.{name}')
+
+
+def _current_selector():
+    stack = _selector_stack.get()
+    return stack[-1][0] if stack else 'other'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_t0'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    t0 = conn.info.pop('metrics_t0', None)
+    if t0 is None:
+        return
+    elapsed = time.perf_counter() - t0
+    stack = _selector_stack.get()
+    for _, acc in stack:
+        acc[0] += elapsed
+    STATEMENT_SECONDS.observe(elapsed, selector=stack[-1][0] if stack else 'other')
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    t0 = conn.info.pop('metrics_t0', None) if conn is not None else None
+    if t0 is not None:
+        elapsed = time.perf_counter() - t0
+        for _, acc in _selector_stack.get():
+            acc[0] += elapsed
+    pgcode = getattr(exception_context.original_exception, 'pgcode', None) or ''
+    STATEMENT_ERRORS.inc(selector=_current_selector(), sqlstate_class=pgcode[:2] or 'none')
+
+
+def install_metrics_hooks(engine):
+    """Attach statement timing hooks to an engine (idempotent)."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+# ----- Process -----
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@register_collector
+def _process_metrics():
+    families = []
+    rss = _rss_bytes()
+    if rss is not None:
+        families.append(('process_resident_memory_bytes', 'gauge', 'Resident set size.', [({}, rss)]))
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+        families.append(('process_max_resident_memory_bytes', 'gauge', 'Peak resident set size since start.', [({}, peak)]))
+    return families
+
+
+# ----- Caches -----
+@register_collector
+def _cache_metrics():
+    with _lock:
+        caches = list(_caches.items())
+    hits, misses, ratio, entries = [], [], [], []
+    for name, cache in caches:
+        s = cache.stats()
+        # A disk-tier hit is also a memory-tier miss
+        disk_hits = s.get('disk_hits', 0)
+        memory_hits = s.get('hits', 0)
+        lookups = memory_hits + s.get('misses', 0)
+        hits.append(({'cache': name, 'tier': 'memory'}, memory_hits))
+        if 'disk_hits' in s:
+            hits.append(({'cache': name, 'tier': 'disk'}, disk_hits))
+        misses.append(({'cache': name}, lookups - memory_hits - disk_hits))
+        ratio.append(({'cache': name}, (memory_hits + disk_hits) / lookups if lookups else 0.0))
+        entries.append(({'cache': name}, s.get('entries', 0)))
+    return [
+        ('cache_hits_total', 'counter', 'Cache hits per cache and tier.', hits),
+        ('cache_misses_total', 'counter', 'Cache lookups that missed every tier.', misses),
+        ('cache_hit_ratio', 'gauge', 'Hits / lookups since process start.', ratio),
+        ('cache_entries', 'gauge', 'Entries held in memory.', entries),
+    ]
@@ -0,0 +1,181 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from cell_change_evolution.metrics import BUDGET_EVENTS
+
+# Statements are not started with less than this left on the budget
+MIN_STATEMENT_TIMEOUT_MS = 50
+# SQLSTATE for query_canceled (statement_timeout and pg_cancel_backend / PQcancel)
+QUERY_CANCELED = '57014'
+
+_current = contextvars.ContextVar('query_budget', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised before executing a statement when the bound budget is already spent."""
+
+
+class QueryBudget:
+    """Time budget enforced by Postgres for every statement run while it is bound.
+
+    While a budget is bound (see `bind()`), each statement executed through a pooled
+    engine gets `SET LOCAL statement_timeout` equal to the remaining budget, and the
+    DBAPI connection is registered so `cancel_all()` can cancel it from another thread.
+    Child budgets (`child()`) have a tighter deadline and report to the root, so
+    cancelling the root cancels every in-flight statement of the request.
+    """
+
+    def __init__(self, budget_s, label='', parent=None):
+        now = time.monotonic()
+        deadline = now + float(budget_s)
+        if parent is not None:
+            deadline = min(deadline, parent.deadline)
+        self.label = label
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.started = now
+        self.deadline = deadline
+        self.cancelled = False
+        self._active = {}
+        self._lock = threading.Lock()
+        # Only the root keeps the event log
+        self.events = [] if parent is None else None
+
+    def child(self, budget_s, label=''):
+        return QueryBudget(budget_s, label=label, parent=self)
+
+    def remaining_s(self):
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.cancelled or self.remaining_s() <= 0
+
+    def statement_timeout_ms(self):
+        """Remaining budget in ms, or None when it is too small to start a statement."""
+        ms = int(self.remaining_s() * 1000)
+        return ms if ms >= MIN_STATEMENT_TIMEOUT_MS else None
+
+    @contextmanager
+    def bind(self):
+        """Bind the budget to the current context (thread) for the duration of the block."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def record(self, kind, **info):
+        """Append an event (timeout, statement_timeout, cancelled, ...) to the root log."""
+        entry = {'kind': kind, 'label': self.label, 'at_s': round(time.monotonic() - self.root.started, 3)}
+        entry.update(info)
+        with self.root._lock:
+            self.root.events.append(entry)
+        BUDGET_EVENTS.inc(kind=kind)
+
+    def _register(self, key, dbapi_conn):
+        budget = self
+        while budget is not None:
+            with budget._lock:
+                budget._active[key] = dbapi_conn
+            budget = budget.parent
+
+    def _unregister(self, key):
+        budget = self
+        while budget is not None:
+            with budget._lock:
+                budget._active.pop(key, None)
+            budget = budget.parent
+
+    def cancel_all(self, reason='budget'):
+        """Cancel every statement still running under this budget; returns how many were cancelled."""
+        self.cancelled = True
+        cancelled = 0
+        # Held across cancel(): a statement deregistering in after_cursor_execute waits for it, so its
+        # connection cannot move on to the next statement (or back to the pool) and be cancelled there
+        with self._lock:
+            for dbapi_conn in list(self._active.values()):
+                try:
+                    dbapi_conn.cancel()
+                    cancelled += 1
+                except Exception as e:
+                    print(f"Error cancelling query: {e}")
+        if cancelled:
+            self.record('cancelled', reason=reason, statements=cancelled)
+        return cancelled
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._active)
+
+    def summary(self):
+        """Serializable report of the root budget for API responses."""
+        root = self.root
+        with root._lock:
+            events = list(root.events)
+        return {
+            'budget_s': round(root.deadline - root.started, 3),
+            'elapsed_s': round(time.monotonic() - root.started, 3),
+            'exhausted': root.expired(),
+            'timeouts': [e for e in events if e['kind'] in ('timeout', 'statement_timeout', 'skipped')],
+            'cancelled_statements': sum(e.get('statements', 0) for e in events if e['kind'] == 'cancelled'),
+        }
+
+
+def current_budget():
+    """Budget bound to the current context, or None."""
+    return _current.get()
+
+
+def run_bound(budget, fn, *args, **kwargs):
+    """Call fn with `budget` bound; for use as the target of executor workers."""
+    if budget is None:
+        return fn(*args, **kwargs)
+    with budget.bind():
+        return fn(*args, **kwargs)
+
+
+# ----- Engine hooks -----
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    budget = _current.get()
+    if budget is None:
+        return
+    timeout_ms = None if budget.cancelled else budget.statement_timeout_ms()
+    if timeout_ms is None:
+        budget.record('skipped', statement=statement.strip().split(None, 1)[0] if statement.strip() else '')
+        raise QueryBudgetExceeded(f"query budget exhausted ({budget.label or 'unnamed'})")
+    # SET LOCAL semantics: reset when the pooled connection's transaction ends
+    cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+    budget._register(id(cursor), conn.connection.dbapi_connection)
+    conn.info['query_budget'] = budget
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    budget = conn.info.pop('query_budget', None)
+    if budget is not None:
+        budget._unregister(id(cursor))
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    budget = conn.info.pop('query_budget', None) if conn is not None else None
+    if budget is None:
+        return
+    if exception_context.cursor is not None:
+        budget._unregister(id(exception_context.cursor))
+    orig = exception_context.original_exception
+    if getattr(orig, 'pgcode', None) == QUERY_CANCELED:
+        kind = 'statement_timeout' if 'statement timeout' in str(orig) else 'cancelled_statement'
+        budget.record(kind)
+
+
+def install_budget_hooks(engine):
+    """Attach the statement_timeout / cancellation hooks to an engine (idempotent)."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,84 @@
+import threading
+
+from sqlalchemy import text
+
+from cell_change_evolution.db_pool import get_engine
+
+# Candidate column names per role in master_node_total, first match wins
+MASTER_NODE_COLUMNS = {
+    'id': ('att_name', 'node'),
+    'lat': ('latitude', 'lat_wgs84', 'lat'),
+    'lon': ('longitude', 'long_wgs84', 'lon'),
+    'region': ('region',),
+    'province': ('province',),
+    'municipality': ('municipality', 'municipio'),
+    'vendor': ('vendor', 'vendor_name'),
+}
+
+_columns = {}
+_lock = threading.Lock()
+
+
+def get_table_columns(table, schema='public', engine=None):
+    """
+    Column names of a table, introspected once per process
+
+    Only existing tables are cached, so a table created later (e.g. by an ingestion job)
+    is picked up on the next call. Use refresh_schema_cache() after DDL changes.
+
+    Returns:
+        frozenset: Column names (empty if the table does not exist), or None if the database is unavailable
+    """
+    key = (schema, table)
+    cols = _columns.get(key)
+    if cols is not None:
+        return cols
+    try:
+        engine = engine or get_engine()
+        with engine.connect() as connection:
+            rows = connection.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_schema = :schema AND table_name = :table
+            """), {'schema': schema, 'table': table}).fetchall()
+    except Exception as e:
+        print(f"Error reading columns of {schema}.{table}: {e}")
+        return None
+    cols = frozenset(r[0] for r in rows)
+    if cols:
+        with _lock:
+            _columns[key] = cols
+    return cols
+
+
+def table_exists(table, schema='public', engine=None):
+    """True if the table exists (served from the column cache once it has been seen)."""
+    return bool(get_table_columns(table, schema=schema, engine=engine))
+
+
+def pick_column(columns, candidates):
+    """First of `candidates` present in `columns`, or None."""
+    for c in candidates:
+        if c in (columns or ()):
+            return c
+    return None
+
+
+def get_master_node_columns(engine=None):
+    """
+    Actual column name per role in master_node_total (see MASTER_NODE_COLUMNS)
+
+    Returns:
+        dict: {'id', 'lat', 'lon', 'region', 'province', 'municipality', 'vendor'} -> column name or None
+    """
+    cols = get_table_columns('master_node_total', engine=engine)
+    return {role: pick_column(cols, candidates) for role, candidates in MASTER_NODE_COLUMNS.items()}
+
+
+def refresh_schema_cache(table=None, schema='public'):
+    """Forget cached columns of one table (or all tables); they are re-read on next use."""
+    with _lock:
+        if table is None:
+            _columns.clear()
+        else:
+            _columns.pop((schema, table), None)
@@ -1,7 +1,9 @@
 import pandas as pd
 import os
 import dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.metrics import instrument_selectors
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -13,11 +15,9 @@ POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 
 def create_connection():
-    """Create database connection using SQLAlchemy"""
+    """Return the shared pooled engine (see db_pool). Callers must not dispose it."""
     try:
-        connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-        engine = create_engine(connection_string)
-        return engine
+        return get_engine()
     except Exception as e:
         print(f"Error creating database connection: {e}")
         return None
@@ -342,8 +342,6 @@ def get_cell_change_data_grouped(
     except Exception as e:
         print(f"Error executing query: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def create_zero_filled_result(group_by, region_list=None, province_list=None, municipality_list=None, site_list=None):
     """
@@ -519,6 +517,9 @@ def expand_dates(df, group_by):
     
     return expanded_df
 
+# Per-selector query/pandas timings on /api/metrics
+instrument_selectors(globals(), exclude=('create_zero_filled_result', 'expand_dates'))
+
 if __name__ == "__main__":
     # Import functions from other modules
     from plot_processor import plot_cell_change_data, save_plot_html, show_plot
@@ -2,8 +2,12 @@ import os
 import dotenv
 import pandas as pd
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.executor import get_executor
+from cell_change_evolution.metrics import instrument_selectors
+from cell_change_evolution.tracing import propagate, span
+from cell_change_evolution.cqi_kernels import unified_cqi_nr, unified_cqi_lte, unified_cqi_umts
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -14,15 +18,25 @@ POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 
 def create_connection():
-    """Create database connection using SQLAlchemy"""
+    """Return the shared pooled engine (see db_pool). Callers must not dispose it."""
     try:
-        connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-        engine = create_engine(connection_string)
-        return engine
+        return get_engine()
     except Exception as e:
         print(f"Error creating database connection: {e}")
         return None
 
+def _site_match(column, att_name, params):
+    """`column = :att_name` for one site, `column = ANY(:att_names)` for a list of sites.
+
+    Lists let callers (e.g. the batch evaluation) read many sites in one query; the
+    result keeps its site_att column so it can be split per site afterwards.
+    """
+    if isinstance(att_name, (list, tuple, set)):
+        params['att_names'] = list(att_name)
+        return f"{column} = ANY(:att_names)"
+    params['att_name'] = att_name
+    return f"{column} = :att_name"
+
 def get_cqi_daily(att_name, min_date=None, max_date=None, technology=None):
     """Get CQI daily data for a single site with optional filters"""
     engine = create_connection()
@@ -90,8 +104,6 @@ def get_cqi_daily(att_name, min_date=None, max_date=None, technology=None):
     except Exception as e:
         print(f"Error executing CQI query: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def get_cqi_daily_calculated(att_name, min_date=None, max_date=None, technology=None):
     """Return calculated CQI daily.
@@ -109,11 +121,11 @@ def get_cqi_daily_calculated(att_name, min_date=None, max_date=None, technology=
     if technology == '5G':
         return get_nr_cqi_daily_calculated(att_name, min_date=min_date, max_date=max_date)
 
-    # technology is None: fetch three techs in parallel
-    with ThreadPoolExecutor(max_workers=3) as ex:
-        f3 = ex.submit(get_umts_cqi_daily_calculated, att_name, min_date, max_date)
-        f4 = ex.submit(get_lte_cqi_daily_calculated, att_name, min_date, max_date)
-        f5 = ex.submit(get_nr_cqi_daily_calculated, att_name, min_date, max_date)
+    # technology is None: fetch three techs in parallel on the shared executor
+    with get_executor().group(max_workers=3) as ex:
+        f3 = ex.submit(propagate(get_umts_cqi_daily_calculated), att_name, min_date, max_date)
+        f4 = ex.submit(propagate(get_lte_cqi_daily_calculated), att_name, min_date, max_date)
+        f5 = ex.submit(propagate(get_nr_cqi_daily_calculated), att_name, min_date, max_date)
         try:
             df3 = f3.result()
         except Exception as e:
@@ -141,8 +153,9 @@ def get_cqi_daily_calculated(att_name, min_date=None, max_date=None, technology=
         df5 = pd.DataFrame(columns=['time', 'site_att', 'nr_cqi'])
 
     # Merge stepwise to preserve columns
-    out = pd.merge(df4, df5, on=['time', 'site_att'], how='outer')
-    out = pd.merge(out, df3, on=['time', 'site_att'], how='outer')
+    with span('merge', cat='pandas', frames=3):
+        out = pd.merge(df4, df5, on=['time', 'site_att'], how='outer')
+        out = pd.merge(out, df3, on=['time', 'site_att'], how='outer')
 
     # Order and sanitize
     out = out.sort_values(by=['site_att', 'time'])
@@ -156,6 +169,9 @@ def calculate_unified_cqi_nr_row(row):
 
     Where Acc/Ret are percentages (0..100). Throughputs are in Mbps.
     Falls back to vendor counters if combined fields are missing.
+
+    Reference implementation: selectors use cqi_kernels.unified_cqi_nr, which must
+    return identical values (checked by compare.py).
     """
     import math
 
@@ -283,8 +299,8 @@ def get_nr_cqi_daily_calculated(att_name, min_date=None, max_date=None):
     if engine is None:
         return None
     try:
-        where = ["n.site_att = :att_name"]
-        params = {"att_name": att_name}
+        params = {}
+        where = [_site_match("n.site_att", att_name, params)]
         if min_date:
             where.append("n.date >= :min_date")
             params["min_date"] = min_date
@@ -322,14 +338,12 @@ def get_nr_cqi_daily_calculated(att_name, min_date=None, max_date=None):
             # Return an empty frame with expected columns to avoid KeyError upstream
             return sanitize_df(pd.DataFrame(columns=['time', 'site_att', 'nr_cqi']))
 
-        df['nr_cqi'] = df.apply(calculate_unified_cqi_nr_row, axis=1)
+        df['nr_cqi'] = unified_cqi_nr(df)
         out = df[['time', 'site_att', 'nr_cqi']].copy()
         return sanitize_df(out)
     except Exception as e:
         print(f"Error computing NR unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def _sum_fields(row, fields):
     return sum(_zn(row.get(f)) for f in fields)
@@ -345,6 +359,9 @@ def calculate_unified_cqi_lte_row(row):
         <v>4g_irat_4g_to_3g_events, <v>4g_erab_succ_established,
         <v>4g_thpt_user_dl_kbps_num/denom, <v>4g_time3g/time4g,
         <v>4g_sumavg_latency (ms), <v>4g_sumavg_dl_kbps, <v>4g_summuestras
+
+    Reference implementation: selectors use cqi_kernels.unified_cqi_lte, which must
+    return identical values (checked by compare.py).
     """
     import math
 
@@ -437,8 +454,8 @@ def get_lte_cqi_daily_calculated(att_name, min_date=None, max_date=None):
     if engine is None:
         return None
     try:
-        where = ["l.site_att = :att_name"]
-        params = {"att_name": att_name}
+        params = {}
+        where = [_site_match("l.site_att", att_name, params)]
         if min_date:
             where.append("l.date >= :min_date")
             params["min_date"] = min_date
@@ -483,14 +500,12 @@ def get_lte_cqi_daily_calculated(att_name, min_date=None, max_date=None):
             # Return an empty frame with expected columns to avoid KeyError upstream
             return sanitize_df(pd.DataFrame(columns=['time', 'site_att', 'lte_cqi']))
 
-        df['lte_cqi'] = df.apply(calculate_unified_cqi_lte_row, axis=1)
+        df['lte_cqi'] = unified_cqi_lte(df)
         out = df[['time', 'site_att', 'lte_cqi']].copy()
         return sanitize_df(out)
     except Exception as e:
         print(f"Error computing LTE unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def _zn(v):
     """Zero-for-None helper (works with pandas row get)."""
@@ -512,6 +527,9 @@ def calculate_unified_cqi_umts_row(row):
       - CS drop num/denom
       - PS retain num/denom
       - Throughput DL numerator/denominator (kbps)
+
+    Reference implementation: selectors use cqi_kernels.unified_cqi_umts, which must
+    return identical values (checked by compare.py).
     """
     import math
 
@@ -574,8 +592,8 @@ def get_umts_cqi_daily_calculated(att_name, min_date=None, max_date=None):
     if engine is None:
         return None
     try:
-        where = ["u.site_att = :att_name"]
-        params = {"att_name": att_name}
+        params = {}
+        where = [_site_match("u.site_att", att_name, params)]
         if min_date:
             where.append("u.date >= :min_date")
             params["min_date"] = min_date
@@ -617,8 +635,8 @@ def get_umts_cqi_daily_calculated(att_name, min_date=None, max_date=None):
             # Return an empty frame with expected columns to avoid KeyError upstream
             return sanitize_df(pd.DataFrame(columns=['time', 'site_att', 'umts_cqi']))
 
-        # Calculate per-row unified CQI
-        df['umts_cqi'] = df.apply(calculate_unified_cqi_umts_row, axis=1)
+        # Vectorized unified CQI (same results as calculate_unified_cqi_umts_row)
+        df['umts_cqi'] = unified_cqi_umts(df)
         # Keep only output columns
         out = df[['time', 'site_att', 'umts_cqi']].copy()
         return sanitize_df(out)
@@ -626,8 +644,6 @@ def get_umts_cqi_daily_calculated(att_name, min_date=None, max_date=None):
     except Exception as e:
         print(f"Error computing UMTS unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def sanitize_df(df: pd.DataFrame) -> pd.DataFrame:
     """Replace +/-Inf with NaN, cast to object, then replace NaN/NA with None for JSON safety upstream."""
@@ -642,12 +658,13 @@ def sanitize_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=None, vendor=None):
-    """Get traffic data daily for a single site with optional filters"""
+    """Get traffic data daily for a single site (or a list of sites) with optional filters"""
     engine = create_connection()
     if engine is None:
         return None
     
     try:
+        params = {}
         if technology == '3G':
             select_cols = """
           u.date AS time,
@@ -665,7 +682,7 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
           NULL as n5g_nsa_traffic_pdcp_gb_5gendc_5gleg
             """
             from_clause = f"FROM umts_cqi_daily u"
-            where_conditions = [f"u.site_att = :att_name"]
+            where_conditions = [_site_match("u.site_att", att_name, params)]
             tech_condition = "(u.h3g_traffic_d_user_ps_gb IS NOT NULL OR u.e3g_traffic_d_user_ps_gb IS NOT NULL OR u.n3g_traffic_d_user_ps_gb IS NOT NULL)"
             
         elif technology == '4G':
@@ -685,7 +702,7 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
           NULL as n5g_nsa_traffic_pdcp_gb_5gendc_5gleg
             """
             from_clause = f"FROM lte_cqi_daily l"
-            where_conditions = [f"l.site_att = :att_name"]
+            where_conditions = [_site_match("l.site_att", att_name, params)]
             tech_condition = "(l.h4g_traffic_d_user_ps_gb IS NOT NULL OR l.s4g_traffic_d_user_ps_gb IS NOT NULL OR l.e4g_traffic_d_user_ps_gb IS NOT NULL OR l.n4g_traffic_d_user_ps_gb IS NOT NULL)"
             
         elif technology == '5G':
@@ -705,10 +722,11 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
           n.n5g_nsa_traffic_pdcp_gb_5gendc_5gleg
             """
             from_clause = f"FROM nr_cqi_daily n"
-            where_conditions = [f"n.site_att = :att_name"]
+            where_conditions = [_site_match("n.site_att", att_name, params)]
             tech_condition = "(n.e5g_nsa_traffic_pdcp_gb_5gendc_4glegn IS NOT NULL OR n.n5g_nsa_traffic_pdcp_gb_5gendc_4glegn IS NOT NULL OR n.e5g_nsa_traffic_pdcp_gb_5gendc_5gleg IS NOT NULL OR n.n5g_nsa_traffic_pdcp_gb_5gendc_5gleg IS NOT NULL)"
             
         else:
+            site_match = _site_match("site_att", att_name, params)
             select_cols = """
           COALESCE(u.date, l.date, n.date) AS time,
           COALESCE(u.site_att, l.site_att, n.site_att) AS site_att,
@@ -726,12 +744,12 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
             """
             from_clause = f"""
         FROM
-          (SELECT * FROM umts_cqi_daily WHERE site_att = :att_name) u
+          (SELECT * FROM umts_cqi_daily WHERE {site_match}) u
         FULL OUTER JOIN
-          (SELECT * FROM lte_cqi_daily WHERE site_att = :att_name) l
+          (SELECT * FROM lte_cqi_daily WHERE {site_match}) l
           ON u.date = l.date AND u.site_att = l.site_att
         FULL OUTER JOIN
-          (SELECT * FROM nr_cqi_daily WHERE site_att = :att_name) n
+          (SELECT * FROM nr_cqi_daily WHERE {site_match}) n
           ON COALESCE(u.date, l.date) = n.date AND COALESCE(u.site_att, l.site_att) = n.site_att
             """
             where_conditions = []
@@ -774,7 +792,7 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
         ORDER BY site_att ASC, time ASC
         """)
         
-        result_df = pd.read_sql(traffic_query, engine, params={'att_name': att_name})
+        result_df = pd.read_sql(traffic_query, engine, params=params)
         result_df = sanitize_df(result_df)
         print(f"Retrieved traffic data for site {att_name}: {result_df.shape[0]} records")
         return result_df
@@ -782,16 +800,15 @@ def get_traffic_data_daily(att_name, min_date=None, max_date=None, technology=No
     except Exception as e:
         print(f"Error executing traffic data query: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def get_traffic_voice_daily(att_name, min_date=None, max_date=None, technology=None, vendor=None):
-    """Get voice traffic daily for a single site with optional filters"""
+    """Get voice traffic daily for a single site (or a list of sites) with optional filters"""
     engine = create_connection()
     if engine is None:
         return None
     
     try:
+        params = {}
         if technology == '3G':
             select_cols = """
           u.date AS time,
@@ -805,7 +822,7 @@ def get_traffic_voice_daily(att_name, min_date=None, max_date=None, technology=N
           u.n3g_traffic_v_user_cs
             """
             from_clause = f"FROM umts_cqi_daily u"
-            where_conditions = [f"u.site_att = :att_name"]
+            where_conditions = [_site_match("u.site_att", att_name, params)]
             tech_condition = "(u.h3g_traffic_v_user_cs IS NOT NULL OR u.e3g_traffic_v_user_cs IS NOT NULL OR u.n3g_traffic_v_user_cs IS NOT NULL)"
             
         elif technology == '4G':
@@ -821,10 +838,11 @@ def get_traffic_voice_daily(att_name, min_date=None, max_date=None, technology=N
           NULL as n3g_traffic_v_user_cs
             """
             from_clause = f"FROM volte_cqi_vendor_daily v"
-            where_conditions = [f"v.site_att = :att_name"]
+            where_conditions = [_site_match("v.site_att", att_name, params)]
             tech_condition = "(v.user_traffic_volte_e IS NOT NULL OR v.user_traffic_volte_h IS NOT NULL OR v.user_traffic_volte_n IS NOT NULL OR v.user_traffic_volte_s IS NOT NULL)"
             
         else:
+            site_match = _site_match("site_att", att_name, params)
             select_cols = """
           COALESCE(v.date, u.date) AS time,
           COALESCE(v.site_att, u.site_att) AS site_att,
@@ -840,11 +858,11 @@ def get_traffic_voice_daily(att_name, min_date=None, max_date=None, technology=N
         FROM
           (SELECT date, site_att, user_traffic_volte_e, user_traffic_volte_h, user_traffic_volte_n, user_traffic_volte_s
            FROM volte_cqi_vendor_daily
-           WHERE site_att = :att_name) v
+           WHERE {site_match}) v
         FULL OUTER JOIN
           (SELECT date, site_att, h3g_traffic_v_user_cs, e3g_traffic_v_user_cs, n3g_traffic_v_user_cs
            FROM umts_cqi_daily
-           WHERE site_att = :att_name) u
+           WHERE {site_match}) u
         ON v.date = u.date AND v.site_att = u.site_att
             """
             where_conditions = []
@@ -887,15 +905,17 @@ def get_traffic_voice_daily(att_name, min_date=None, max_date=None, technology=N
         ORDER BY site_att ASC, time ASC
         """)
         
-        result_df = pd.read_sql(voice_query, engine, params={'att_name': att_name})
+        result_df = pd.read_sql(voice_query, engine, params=params)
         print(f"Retrieved voice traffic data for site {att_name}: {result_df.shape[0]} records")
         return result_df
         
     except Exception as e:
         print(f"Error executing voice traffic query: {e}")
         return None
-    finally:
-        engine.dispose()
+
+# Per-selector query/pandas timings on /api/metrics (per-row helpers excluded)
+instrument_selectors(globals(), exclude=('calculate_unified_cqi_nr_row', 'calculate_unified_cqi_lte_row', 'calculate_unified_cqi_umts_row',
+                                        'sanitize_df'))
 
 if __name__ == "__main__":
     site_att = 'DIFALO0001'
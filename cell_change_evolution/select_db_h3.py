@@ -0,0 +1,186 @@
+import pandas as pd
+from sqlalchemy import text
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.metrics import instrument_selectors
+from cell_change_evolution.schema_cache import get_table_columns
+
+# Resolutions stored as h3_r<N> columns of master_node_total (see insert_db_master_cell.update_h3_cells)
+H3_RESOLUTIONS = (5, 7, 9)
+AREA_FIELDS = ('region', 'province', 'municipality')
+# Daily CQI table and its composite quality column per technology
+CQI_SOURCES = {
+    '3G': ('umts_cqi_daily', 'umts_composite_quality'),
+    '4G': ('lte_cqi_daily', 'f4g_composite_quality'),
+    '5G': ('nr_cqi_daily', 'nr_composite_quality'),
+}
+
+def create_connection():
+    """Return the shared pooled engine (see db_pool). Callers must not dispose it."""
+    try:
+        return get_engine()
+    except Exception as e:
+        print(f"Error creating database connection: {e}")
+        return None
+
+def h3_to_hex(cell_id):
+    """H3 index as its canonical hex string (BIGINTs above 2**53 are not JSON-safe)."""
+    return format(int(cell_id) & 0xFFFFFFFFFFFFFFFF, 'x')
+
+def h3_from_hex(cell):
+    """
+    Parse a hex H3 index
+
+    Returns:
+        tuple: (signed BIGINT as stored in h3_r<N>, resolution), or None if `cell` is not a stored H3 cell
+    """
+    try:
+        value = int(str(cell), 16)
+    except ValueError:
+        return None
+    # Bits 52-55 hold the resolution; mode 1 is a cell index
+    resolution = (value >> 52) & 0xF
+    if (value >> 59) & 0xF != 1 or resolution not in H3_RESOLUTIONS:
+        return None
+    if value >= 1 << 63:
+        value -= 1 << 64
+    return value, resolution
+
+def _h3_column(resolution, engine):
+    """h3_r<N> when master_node_total has it, else None."""
+    col = f"h3_r{int(resolution)}"
+    if int(resolution) not in H3_RESOLUTIONS or col not in (get_table_columns('master_node_total', engine=engine) or ()):
+        return None
+    return col
+
+def _area_filters(filters, params, alias='m'):
+    conditions = []
+    for field in AREA_FIELDS:
+        value = (filters or {}).get(field)
+        if value:
+            params[field] = value
+            conditions.append(f"{alias}.{field} = :{field}")
+    return conditions
+
+def get_h3_cells(resolution=7, region=None, province=None, municipality=None):
+    """
+    Sites per H3 cell of master_node_total, optionally within one region/province/municipality
+
+    Returns:
+        pd.DataFrame: cell_id, sites, nodes, latitude, longitude (cell center), or None on error
+    """
+    engine = create_connection()
+    if engine is None:
+        return None
+    col = _h3_column(resolution, engine)
+    if col is None:
+        print(f"Error fetching H3 cells: master_node_total has no H3 cells at resolution {resolution}")
+        return None
+    params = {}
+    conditions = [f"m.{col} IS NOT NULL"] + _area_filters(
+        {'region': region, 'province': province, 'municipality': municipality}, params
+    )
+    query = text(
+        f"""
+        SELECT m.{col} AS cell_id,
+               COUNT(DISTINCT m.att_name) AS sites,
+               COUNT(*) AS nodes,
+               (h3_cell_to_lat_lng(m.{col}::h3index))[1] AS latitude,
+               (h3_cell_to_lat_lng(m.{col}::h3index))[0] AS longitude
+        FROM public.master_node_total m
+        WHERE {' AND '.join(conditions)}
+        GROUP BY m.{col}
+        ORDER BY sites DESC, cell_id
+        """
+    )
+    try:
+        return pd.read_sql_query(query, engine, params=params)
+    except Exception as e:
+        print(f"Error fetching H3 cells at resolution {resolution}: {e}")
+        return None
+
+def get_h3_cell_sites(cell_id, resolution):
+    """
+    Sites of master_node_total inside one H3 cell (integer index lookup on h3_r<N>)
+
+    Returns:
+        pd.DataFrame: site_att, node, latitude, longitude, region, province, municipality, vendor, or None on error
+    """
+    engine = create_connection()
+    if engine is None:
+        return None
+    col = _h3_column(resolution, engine)
+    if col is None:
+        print(f"Error fetching H3 cell sites: master_node_total has no H3 cells at resolution {resolution}")
+        return None
+    query = text(
+        f"""
+        SELECT att_name AS site_att, node, latitude, longitude, region, province, municipality, vendor
+        FROM public.master_node_total
+        WHERE {col} = :cell_id
+        ORDER BY att_name, node
+        """
+    )
+    try:
+        return pd.read_sql_query(query, engine, params={'cell_id': int(cell_id)})
+    except Exception as e:
+        print(f"Error fetching sites of H3 cell {h3_to_hex(cell_id)}: {e}")
+        return None
+
+def get_h3_cqi(resolution=7, technology='4G', min_date=None, max_date=None, region=None, province=None, municipality=None):
+    """
+    Average daily CQI per H3 cell over a date range
+
+    Sites are mapped to cells through master_node_total; a site whose nodes fall in several
+    cells counts in each of them.
+
+    Returns:
+        pd.DataFrame: cell_id, sites, days, cqi, or None on error
+    """
+    engine = create_connection()
+    if engine is None:
+        return None
+    if technology not in CQI_SOURCES:
+        print(f"Error fetching H3 CQI: unknown technology {technology}")
+        return None
+    col = _h3_column(resolution, engine)
+    if col is None:
+        print(f"Error fetching H3 CQI: master_node_total has no H3 cells at resolution {resolution}")
+        return None
+    table, quality = CQI_SOURCES[technology]
+    params = {}
+    site_conditions = [f"m.{col} IS NOT NULL", "m.att_name IS NOT NULL"] + _area_filters(
+        {'region': region, 'province': province, 'municipality': municipality}, params
+    )
+    date_conditions = [f"q.{quality} IS NOT NULL"]
+    if min_date:
+        params['min_date'] = min_date
+        date_conditions.append("q.date >= :min_date")
+    if max_date:
+        params['max_date'] = max_date
+        date_conditions.append("q.date <= :max_date")
+    query = text(
+        f"""
+        WITH site_cells AS (
+            SELECT DISTINCT m.att_name, m.{col} AS cell_id
+            FROM public.master_node_total m
+            WHERE {' AND '.join(site_conditions)}
+        )
+        SELECT s.cell_id,
+               COUNT(DISTINCT q.site_att) AS sites,
+               COUNT(DISTINCT q.date) AS days,
+               AVG(q.{quality}) AS cqi
+        FROM site_cells s
+        JOIN public.{table} q ON q.site_att = s.att_name
+        WHERE {' AND '.join(date_conditions)}
+        GROUP BY s.cell_id
+        ORDER BY s.cell_id
+        """
+    )
+    try:
+        return pd.read_sql_query(query, engine, params=params)
+    except Exception as e:
+        print(f"Error fetching {technology} CQI per H3 cell: {e}")
+        return None
+
+# Per-selector query/pandas timings on /api/metrics (pure helpers excluded)
+instrument_selectors(globals(), exclude=('h3_to_hex', 'h3_from_hex'))
@@ -1,7 +1,11 @@
 import os
 import dotenv
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.metrics import instrument_selectors
+from cell_change_evolution.schema_cache import table_exists
+from cell_change_evolution.data_watermark import get_watermark_max_date
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -12,11 +16,9 @@ POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 
 def create_connection():
-    """Create database connection using SQLAlchemy"""
+    """Return the shared pooled engine (see db_pool). Callers must not dispose it."""
     try:
-        connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-        engine = create_engine(connection_string)
-        return engine
+        return get_engine()
     except Exception as e:
         print(f"Error creating database connection: {e}")
         return None
@@ -49,8 +51,6 @@ def get_provinces():
     except Exception as e:
         print(f"Error fetching provinces: {e}")
         return []
-    finally:
-        engine.dispose()
 
 def get_municipalities():
     """
@@ -80,8 +80,6 @@ def get_municipalities():
     except Exception as e:
         print(f"Error fetching municipalities: {e}")
         return []
-    finally:
-        engine.dispose()
 
 def get_att_names():
     """
@@ -111,25 +109,32 @@ def get_att_names():
     except Exception as e:
         print(f"Error fetching att_names: {e}")
         return []
-    finally:
-        engine.dispose()
 
 def get_max_date():
     """
     Get the minimum of the maximum end_dates from lte and umts tables
+
+    Read from data_watermark (maintained by ingestion, cached in-process); the MAX()
+    scans below only run on databases where the watermark has not been populated yet.
     
     Returns:
         date: Min of (max lte end_date, max umts end_date), or None if no data
     """
+    final_max = get_watermark_max_date(['lte_cell_traffic_period', 'umts_cell_traffic_period'])
+    if final_max is None:
+        final_max = get_watermark_max_date(['lte_cqi_daily', 'umts_cqi_daily'])
+    if final_max is not None:
+        return final_max
+
     engine = create_connection()
     if engine is None:
         return None
     
     try:
-        # Check table existence using to_regclass and get MAX(end_date) if present
+        # Check table existence (schema cache) and get MAX(end_date) if present
+        lte_exists = table_exists('lte_cell_traffic_period', engine=engine)
+        umts_exists = table_exists('umts_cell_traffic_period', engine=engine)
         with engine.connect() as connection:
-            lte_exists = connection.execute(text("SELECT to_regclass('public.lte_cell_traffic_period') IS NOT NULL")).scalar()
-            umts_exists = connection.execute(text("SELECT to_regclass('public.umts_cell_traffic_period') IS NOT NULL")).scalar()
 
             lte_max = None
             umts_max = None
@@ -152,8 +157,8 @@ def get_max_date():
 
             # If both traffic-period maxima are missing, fall back to CQI daily tables (MAX(time))
             if not lte_max and not umts_max:
-                lte_cqi_exists = connection.execute(text("SELECT to_regclass('public.lte_cqi_daily') IS NOT NULL")).scalar()
-                umts_cqi_exists = connection.execute(text("SELECT to_regclass('public.umts_cqi_daily') IS NOT NULL")).scalar()
+                lte_cqi_exists = table_exists('lte_cqi_daily', engine=engine)
+                umts_cqi_exists = table_exists('umts_cqi_daily', engine=engine)
                 lte_cqi_max = None
                 umts_cqi_max = None
                 if lte_cqi_exists:
@@ -196,8 +201,9 @@ def get_max_date():
         print(f"Error fetching max date: {e}")
         return None
     
-    finally:
-        engine.dispose()
+
+# Per-selector query/pandas timings on /api/metrics
+instrument_selectors(globals())
 
 if __name__ == "__main__":
     provinces = get_provinces()
@@ -1,14 +1,17 @@
 import os
+import math
 import dotenv
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
-from sqlalchemy import create_engine, text
-from cell_change_evolution.select_db_cqi_daily import (
-    calculate_unified_cqi_umts_row,
-    calculate_unified_cqi_lte_row,
-    calculate_unified_cqi_nr_row,
-    sanitize_df,
-)
+from sqlalchemy import text
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.metrics import instrument_selectors
+from cell_change_evolution.ttl_cache import TTLCache
+from cell_change_evolution.select_db_cqi_daily import sanitize_df
+from cell_change_evolution.cqi_kernels import unified_cqi_nr, unified_cqi_lte, unified_cqi_umts
+from cell_change_evolution.spatial_index import site_spatial_index
+from cell_change_evolution.schema_cache import get_table_columns
+from cell_change_evolution.executor import get_executor
+from cell_change_evolution.tracing import propagate, span
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -18,21 +21,154 @@ POSTGRES_HOST = os.getenv('POSTGRES_HOST')
 POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 
+# Short-lived cache of resolved neighbor sets, keyed by (centers, radius, vecinos)
+NEIGHBOR_CACHE_TTL_S = float(os.getenv('NEIGHBOR_CACHE_TTL_S', 300))
+_neighbor_cache = TTLCache(ttl_s=NEIGHBOR_CACHE_TTL_S, maxsize=2048, name='neighbor_sets')
+# Largest radius precomputed in master_node_neighbor (see insert_db_master_cell.refresh_master_node_neighbor)
+NEIGHBOR_INDEX_MAX_RADIUS_KM = float(os.getenv('NEIGHBOR_INDEX_MAX_RADIUS_KM', 10))
+# 'memory': in-process spatial index first (see spatial_index.py); 'db': database only
+NEIGHBOR_RESOLVER = os.getenv('NEIGHBOR_RESOLVER', 'memory').lower()
+# (smallest, largest) H3 cell edge in km per stored resolution, with margin for cell size variation
+H3_EDGE_KM = {5: (5.5, 13.0), 7: (0.8, 1.9)}
+
 def create_connection():
-    """Create database connection using SQLAlchemy"""
+    """Return the shared pooled engine (see db_pool). Callers must not dispose it."""
     try:
-        connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-        engine = create_engine(connection_string)
-        return engine
+        return get_engine()
     except Exception as e:
         print(f"Error creating database connection: {e}")
         return None
 
+def _get_neighbor_sites_memory(site_list, radius_km):
+    """Neighbor lookup from the in-process spatial index; None when it cannot answer
+    (disabled, still loading, or a center site it does not know).
+    """
+    if NEIGHBOR_RESOLVER != 'memory':
+        return None
+    site_spatial_index.maybe_refresh()
+    return site_spatial_index.query_radius(site_list, radius_km)
+
+def _get_neighbor_sites_indexed(engine, site_list, radius_km):
+    """Neighbor lookup from the precomputed master_node_neighbor table.
+
+    Returns None when the index cannot answer (table missing, radius above the indexed
+    maximum, or a center site not indexed yet) so the caller falls back to ST_DWithin.
+    """
+    if radius_km > NEIGHBOR_INDEX_MAX_RADIUS_KM:
+        return None
+    centers = sorted(set(site_list))
+    try:
+        with engine.connect() as conn:
+            indexed = conn.execute(
+                text("SELECT count(*) FROM public.master_node_neighbor_state WHERE att_name = ANY(:sites)"),
+                {"sites": centers},
+            ).scalar()
+            if indexed < len(centers):
+                return None
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT DISTINCT neighbor_att_name
+                    FROM public.master_node_neighbor
+                    WHERE att_name = ANY(:sites)
+                      AND distance_km <= :radius_km
+                      AND NOT (neighbor_att_name = ANY(:sites))
+                    ORDER BY neighbor_att_name
+                    """
+                ),
+                {"sites": centers, "radius_km": radius_km},
+            )
+            return [row[0] for row in rows]
+    except Exception as e:
+        print(f"Neighbor index unavailable, using spatial join: {e}")
+        return None
+
+def h3_disk_k(radius_km, resolution):
+    """Grid distance k whose H3 disk around a point's cell holds every point within radius_km.
+
+    Centers of cells k steps apart are at least 1.5 * k * edge apart; two cell radii are
+    added for the offsets of both points from their cell centers.
+    """
+    min_edge, max_edge = H3_EDGE_KM[resolution]
+    return int(math.ceil((radius_km + 2 * max_edge) / (1.5 * min_edge)))
+
+def _get_neighbor_sites_h3(engine, site_list, radius_km):
+    """Neighbor lookup through the H3 cell ids of master_node_total (see update_h3_cells).
+
+    The centers' cells are expanded to a k-ring (h3_grid_disk), candidates are found with an
+    integer index lookup on h3_r7 (h3_r5 for radii above 10 km) and only those candidates are
+    refined with the exact geodesic distance. Returns None when the H3 columns are missing or
+    a center has no cell yet, so the caller falls back to the full ST_DWithin join.
+    """
+    resolution = 7 if radius_km <= 10 else 5
+    col = f"h3_r{resolution}"
+    if col not in (get_table_columns('master_node_total', engine=engine) or ()):
+        return None
+    try:
+        with engine.connect() as conn:
+            missing = conn.execute(
+                text(
+                    f"""
+                    SELECT count(*) FROM public.master_node_total
+                    WHERE att_name = ANY(:sites)
+                      AND latitude IS NOT NULL AND longitude IS NOT NULL
+                      AND {col} IS NULL
+                    """
+                ),
+                {"sites": site_list},
+            ).scalar()
+            if missing:
+                return None
+            rows = conn.execute(
+                text(
+                    f"""
+                    WITH center_sites AS (
+                        SELECT {col} AS cell,
+                               ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography AS geog
+                        FROM public.master_node_total
+                        WHERE att_name = ANY(:sites)
+                          AND {col} IS NOT NULL
+                    ),
+                    ring AS (
+                        SELECT DISTINCT h3_grid_disk(cell::h3index, :k)::bigint AS cell
+                        FROM center_sites
+                    )
+                    SELECT DISTINCT m.att_name
+                    FROM public.master_node_total m
+                    JOIN ring r ON m.{col} = r.cell
+                    WHERE m.att_name IS NOT NULL
+                      AND NOT (m.att_name = ANY(:sites))
+                      AND EXISTS (
+                            SELECT 1 FROM center_sites c
+                            WHERE ST_DWithin(
+                                c.geog,
+                                ST_SetSRID(ST_MakePoint(m.longitude, m.latitude), 4326)::geography,
+                                :radius_meters
+                            )
+                      )
+                    ORDER BY m.att_name
+                    """
+                ),
+                {"sites": site_list, "k": h3_disk_k(radius_km, resolution), "radius_meters": radius_km * 1000},
+            )
+            return [row[0] for row in rows]
+    except Exception as e:
+        print(f"H3 neighbor lookup unavailable, using spatial join: {e}")
+        return None
+
 def get_neighbor_sites(site_list, radius_km=5, vecinos=""):
-    """Get neighbor sites within radius using PostGIS"""
+    """Get neighbor sites within radius.
+
+    Resolution order: the in-process spatial index, the precomputed master_node_neighbor
+    table when it covers the request, an H3 k-ring lookup refined by exact distance, and a
+    PostGIS ST_DWithin join over master_node_total.
+
+    Returns:
+        list: Neighbor site names, or None if the lookup failed (not the same as no neighbors)
+    """
     engine = create_connection()
     if engine is None:
-        return []
+        return None
     
     if isinstance(site_list, str):
         site_list = [site_list]
@@ -45,6 +181,18 @@ def get_neighbor_sites(site_list, radius_km=5, vecinos=""):
         radius_meters = radius_km * 1000
         params = {"sites": site_list, "radius_meters": radius_meters}
         if radius_km > 0.1:
+            neighbor_sites = _get_neighbor_sites_memory(site_list, radius_km)
+            if neighbor_sites is not None:
+                print(f"Found {len(neighbor_sites)} unique neighbor sites within {radius_km}km of {len(site_list)} center sites (memory)")
+                return neighbor_sites
+            neighbor_sites = _get_neighbor_sites_indexed(engine, site_list, radius_km)
+            if neighbor_sites is not None:
+                print(f"Found {len(neighbor_sites)} unique neighbor sites within {radius_km}km of {len(site_list)} center sites (index)")
+                return neighbor_sites
+            neighbor_sites = _get_neighbor_sites_h3(engine, site_list, radius_km)
+            if neighbor_sites is not None:
+                print(f"Found {len(neighbor_sites)} unique neighbor sites within {radius_km}km of {len(site_list)} center sites (h3)")
+                return neighbor_sites
             neighbor_query = text(
                 """
                 WITH center_sites AS (
@@ -94,9 +242,78 @@ def get_neighbor_sites(site_list, radius_km=5, vecinos=""):
         
     except Exception as e:
         print(f"Error fetching neighbor sites for '{site_list}': {e}")
-        return []
-    finally:
-        engine.dispose()
+        return None
+
+def neighbor_cache_key(site_list, radius_km=5, vecinos=""):
+    """Normalized key for a neighbor set: vecinos only matter when the radius filter is disabled."""
+    if isinstance(site_list, str):
+        site_list = [site_list]
+    centers = tuple(sorted(s for s in (site_list or []) if s))
+    if radius_km > 0.1:
+        return (centers, round(float(radius_km), 3), '')
+    vec = tuple(sorted({v.strip() for v in (vecinos or '').split(',') if v.strip()}))
+    return (centers, 0.0, vec)
+
+def get_neighbor_sites_cached(site_list, radius_km=5, vecinos=""):
+    """get_neighbor_sites() behind a short TTL cache (NEIGHBOR_CACHE_TTL_S, default 300s).
+
+    Empty results are not cached so a transient DB error does not hide neighbors.
+    """
+    key = neighbor_cache_key(site_list, radius_km, vecinos)
+    cached = _neighbor_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    neighbors = get_neighbor_sites(site_list, radius_km=radius_km, vecinos=vecinos)
+    if neighbors:
+        _neighbor_cache.set(key, tuple(neighbors))
+    return neighbors
+
+def clear_neighbor_cache():
+    _neighbor_cache.clear()
+
+def get_nearest_sites(site, k=10):
+    """
+    The k sites nearest to `site`
+
+    Served by the in-process spatial index; falls back to a PostGIS distance sort.
+
+    Returns:
+        list: [{'site_att', 'distance_km'}] ordered by distance, or None on error
+    """
+    nearest = None
+    if NEIGHBOR_RESOLVER == 'memory':
+        site_spatial_index.maybe_refresh()
+        nearest = site_spatial_index.query_knn(site, k=k)
+    if nearest is not None:
+        return [{'site_att': s, 'distance_km': round(d, 4)} for s, d in nearest]
+
+    engine = create_connection()
+    if engine is None:
+        return None
+    query = text(
+        """
+        WITH center AS (
+            SELECT ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography AS g
+            FROM public.master_node_total
+            WHERE att_name = :site AND latitude IS NOT NULL AND longitude IS NOT NULL
+        )
+        SELECT m.att_name AS site_att,
+               MIN(ST_Distance(c.g, ST_SetSRID(ST_MakePoint(m.longitude, m.latitude), 4326)::geography)) / 1000.0 AS distance_km
+        FROM public.master_node_total m
+        CROSS JOIN center c
+        WHERE m.att_name IS NOT NULL AND m.att_name <> :site
+          AND m.latitude IS NOT NULL AND m.longitude IS NOT NULL
+        GROUP BY m.att_name
+        ORDER BY distance_km
+        LIMIT :k
+        """
+    )
+    try:
+        df = pd.read_sql_query(query, engine, params={'site': site, 'k': int(k)})
+        return [{'site_att': s, 'distance_km': round(float(d), 4)} for s, d in zip(df['site_att'], df['distance_km'])]
+    except Exception as e:
+        print(f"Error fetching nearest sites for '{site}': {e}")
+        return None
 
 def get_neighbor_cqi_daily(site_list, min_date=None, max_date=None, technology=None, radius_km=5):
     """Get CQI data for neighbor sites within radius using direct SQL, aggregated daily across neighbors."""
@@ -176,9 +393,13 @@ def get_neighbor_cqi_daily(site_list, min_date=None, max_date=None, technology=N
 
         union_block = "\nUNION ALL\n".join(selects) if selects else "SELECT NULL::timestamp AS time, NULL::double precision AS lte_cqi, NULL::double precision AS nr_cqi, NULL::double precision AS umts_cqi LIMIT 0"
 
-        neighbor_cqi_query = text(
-            f"""
-            WITH center_sites AS (
+        # Neighbors from the spatial index when it can answer; the spatial join otherwise
+        neighbors = _get_neighbor_sites_memory(site_list, radius_km)
+        if neighbors is not None:
+            params["neighbors"] = neighbors
+            neighbor_cte = "neighbor_sites AS (SELECT UNNEST(CAST(:neighbors AS TEXT[])) AS att_name)"
+        else:
+            neighbor_cte = """center_sites AS (
                 SELECT latitude, longitude, att_name
                 FROM public.master_node_total 
                 WHERE att_name = ANY(:sites)
@@ -199,7 +420,11 @@ def get_neighbor_cqi_daily(site_list, min_date=None, max_date=None, technology=N
                     ST_SetSRID(ST_MakePoint(m.longitude, m.latitude), 4326)::geography,
                     :radius_meters
                   )
-            )
+            )"""
+
+        neighbor_cqi_query = text(
+            f"""
+            WITH {neighbor_cte}
             SELECT time,
                    AVG(lte_cqi)  AS lte_cqi,
                    AVG(nr_cqi)   AS nr_cqi,
@@ -219,18 +444,19 @@ def get_neighbor_cqi_daily(site_list, min_date=None, max_date=None, technology=N
     except Exception as e:
         print(f"Error executing neighbor CQI query: {e}")
         return None
-    finally:
-        engine.dispose()
 
-def get_neighbor_traffic_data(site, min_date=None, max_date=None, technology=None, radius_km=5, vendor=None, vecinos=''):
+def get_neighbor_traffic_data(site, min_date=None, max_date=None, technology=None, radius_km=5, vendor=None, vecinos='', neighbors=None):
     """Get traffic data for neighbor sites within radius using direct SQL, aggregated daily across neighbors.
 
     Adds aggregated columns:
       - ps_gb_uldl (GB): total PS traffic for 3G/4G
       - traffic_dlul_tb (TB): total PDCP traffic for 5G (converted from GB)
+
+    Pass `neighbors` to reuse a neighbor list already resolved for this request.
     """
     try:
-        neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
+        if neighbors is None:
+            neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
     except Exception:
         neighbors = []
     if not neighbors:
@@ -421,17 +647,18 @@ def get_neighbor_traffic_data(site, min_date=None, max_date=None, technology=Non
     except Exception as e:
         print(f"Error executing neighbor traffic query: {e}")
         return None
-    finally:
-        engine.dispose()
 
-def get_neighbor_traffic_voice(site, min_date=None, max_date=None, technology=None, radius_km=5, vendor=None, vecinos=''):
+def get_neighbor_traffic_voice(site, min_date=None, max_date=None, technology=None, radius_km=5, vendor=None, vecinos='', neighbors=None):
     """Get voice traffic data for neighbor sites within radius using direct SQL, aggregated daily across neighbors.
 
     Adds aggregated column:
       - traffic_voice: total voice traffic across technologies/vendors.
+
+    Pass `neighbors` to reuse a neighbor list already resolved for this request.
     """
     try:
-        neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
+        if neighbors is None:
+            neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
     except Exception:
         neighbors = []
     if not neighbors:
@@ -558,8 +785,6 @@ def get_neighbor_traffic_voice(site, min_date=None, max_date=None, technology=No
     except Exception as e:
         print(f"Error executing neighbor voice traffic query: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def _neighbor_base_cte() -> str:
     return (
@@ -600,7 +825,7 @@ def _date_filter_params(min_date, max_date, alias: str, params: dict) -> str:
     return (" AND ".join(conds)) if conds else ""
 
 def get_neighbor_umts_cqi_daily_calculated(site, min_date=None, max_date=None, radius_km=5, vecinos='', neighbors=None):
-    """Compute UMTS (3G) unified CQI for neighbors per day using row-based formulas.
+    """Compute UMTS (3G) unified CQI for neighbors per day using the vectorized CQI kernels.
 
     Input is a center site name; neighbors are derived via get_neighbor_sites(). The center
     site is excluded. Returns columns [time, umts_cqi].
@@ -652,7 +877,7 @@ def get_neighbor_umts_cqi_daily_calculated(site, min_date=None, max_date=None, r
             # Ensure expected columns even when no rows
             return pd.DataFrame(columns=["time", "umts_cqi"]) 
         print("umts_cqi_daily end")
-        df['umts_cqi'] = df.apply(calculate_unified_cqi_umts_row, axis=1)
+        df['umts_cqi'] = unified_cqi_umts(df)
         out = df.groupby('time', as_index=False)['umts_cqi'].mean()
         print("umts_cqi_daily calculated end")
 
@@ -660,11 +885,9 @@ def get_neighbor_umts_cqi_daily_calculated(site, min_date=None, max_date=None, r
     except Exception as e:
         print(f"Error computing neighbor UMTS unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def get_neighbor_lte_cqi_daily_calculated(site, min_date=None, max_date=None, radius_km=5, vecinos='', neighbors=None):
-    """Compute LTE (4G) unified CQI for neighbors per day using row-based formulas.
+    """Compute LTE (4G) unified CQI for neighbors per day using the vectorized CQI kernels.
 
     Input is a center site name; neighbors are derived via get_neighbor_sites(). The center
     site is excluded. Returns columns [time, lte_cqi].
@@ -721,18 +944,16 @@ def get_neighbor_lte_cqi_daily_calculated(site, min_date=None, max_date=None, ra
             # Ensure expected columns even when no rows
             return pd.DataFrame(columns=["time", "lte_cqi"]) 
         print("lte_cqi_daily end")
-        df['lte_cqi'] = df.apply(calculate_unified_cqi_lte_row, axis=1)
+        df['lte_cqi'] = unified_cqi_lte(df)
         out = df.groupby('time', as_index=False)['lte_cqi'].mean()
         print("lte_cqi_daily calculated end")
         return sanitize_df(out)
     except Exception as e:
         print(f"Error computing neighbor LTE unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
 def get_neighbor_nr_cqi_daily_calculated(site, min_date=None, max_date=None, radius_km=5, vecinos='', neighbors=None):
-    """Compute NR (5G) unified CQI for neighbors per day using row-based formulas.
+    """Compute NR (5G) unified CQI for neighbors per day using the vectorized CQI kernels.
 
     Input is a center site name; neighbors are derived via get_neighbor_sites(). The center
     site is excluded. Returns columns [time, nr_cqi].
@@ -781,29 +1002,30 @@ def get_neighbor_nr_cqi_daily_calculated(site, min_date=None, max_date=None, rad
             # Ensure expected columns even when no rows
             return pd.DataFrame(columns=["time", "nr_cqi"]) 
         print("nr_cqi_daily end")
-        df['nr_cqi'] = df.apply(calculate_unified_cqi_nr_row, axis=1)
+        df['nr_cqi'] = unified_cqi_nr(df)
         out = df.groupby('time', as_index=False)['nr_cqi'].mean()
         print("nr_cqi_daily calculated end")
         return sanitize_df(out)
     except Exception as e:
         print(f"Error computing neighbor NR unified CQI: {e}")
         return None
-    finally:
-        engine.dispose()
 
-def get_neighbor_cqi_daily_calculated(site, min_date=None, max_date=None, technology=None, radius_km=5, vecinos=''):
+def get_neighbor_cqi_daily_calculated(site, min_date=None, max_date=None, technology=None, radius_km=5, vecinos='', neighbors=None):
     """Neighbor version of calculated CQI.
 
     Accepts a center site name (str) or list of centers. Internally, the per-technology
     functions will build the neighbor set using geospatial criteria and compute CQI
-    from detailed counters (via row-based functions), excluding the input center site(s).
+    from detailed counters (via cqi_kernels), excluding the input center site(s).
 
     - If technology in ('3G','4G','5G'), return [time, <tech>_cqi]
     - If technology is None, merge three techs on time: [time, lte_cqi, nr_cqi, umts_cqi]
+
+    Pass `neighbors` to reuse a neighbor list already resolved for this request.
     """
     # Precompute neighbors once and reuse
     try:
-        neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
+        if neighbors is None:
+            neighbors = get_neighbor_sites(site, radius_km=radius_km, vecinos=vecinos)
     except Exception as e:
         print(f"Error computing neighbors: {e}")
         neighbors = []
@@ -816,10 +1038,10 @@ def get_neighbor_cqi_daily_calculated(site, min_date=None, max_date=None, techno
         return get_neighbor_nr_cqi_daily_calculated(site, min_date=min_date, max_date=max_date, radius_km=radius_km, vecinos=vecinos, neighbors=neighbors)
 
     # Run three tech calculations in parallel
-    with ThreadPoolExecutor(max_workers=3) as ex:
-        f_umts = ex.submit(get_neighbor_umts_cqi_daily_calculated, site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
-        f_lte  = ex.submit(get_neighbor_lte_cqi_daily_calculated, site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
-        f_nr   = ex.submit(get_neighbor_nr_cqi_daily_calculated, site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
+    with get_executor().group(max_workers=3) as ex:
+        f_umts = ex.submit(propagate(get_neighbor_umts_cqi_daily_calculated), site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
+        f_lte  = ex.submit(propagate(get_neighbor_lte_cqi_daily_calculated), site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
+        f_nr   = ex.submit(propagate(get_neighbor_nr_cqi_daily_calculated), site, min_date, max_date, radius_km, vecinos=vecinos, neighbors=neighbors)
         try:
             df3 = f_umts.result()
         except Exception as e:
@@ -845,12 +1067,16 @@ def get_neighbor_cqi_daily_calculated(site, min_date=None, max_date=None, techno
     if df5 is None:
         df5 = pd.DataFrame(columns=['time', 'nr_cqi'])
 
-    out = pd.merge(df4, df5, on=['time'], how='outer')
-    out = pd.merge(out, df3, on=['time'], how='outer')
+    with span('merge', cat='pandas', frames=3):
+        out = pd.merge(df4, df5, on=['time'], how='outer')
+        out = pd.merge(out, df3, on=['time'], how='outer')
     out = out.sort_values(by=['time'])
     out = out[['time', 'lte_cqi', 'nr_cqi', 'umts_cqi']]
     return sanitize_df(out)
 
+# Per-selector query/pandas timings on /api/metrics (pure helpers excluded)
+instrument_selectors(globals(), exclude=('neighbor_cache_key', 'clear_neighbor_cache', 'h3_disk_k'))
+
 if __name__ == "__main__":
     site_att = 'DIFALO0001'
     vecinos = ''
@@ -0,0 +1,237 @@
+import os
+import time
+import threading
+
+import dotenv
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from cell_change_evolution.db_pool import get_engine
+from cell_change_evolution.data_watermark import get_data_watermark_rows_cached
+
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:  # optional: a latitude-sorted sweep is used instead
+    BallTree = None
+
+# Load environment variables
+dotenv.load_dotenv()
+# Seconds between checks whether master_node_total changed (and the index must be rebuilt)
+SPATIAL_INDEX_CHECK_S = float(os.getenv('SPATIAL_INDEX_CHECK_S', 60))
+
+EARTH_RADIUS_KM = 6371.0088
+# data_watermark rows whose update means master_node_total was reloaded
+SOURCE_TABLES = ('master_node_total', 'master_node_neighbor')
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments in radians, NumPy arrays broadcast."""
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SiteSpatialIndex:
+    """In-memory haversine index over master_node_total coordinates.
+
+    Uses a scikit-learn BallTree (haversine metric) when scikit-learn is installed; otherwise
+    points are sorted by latitude and each query computes distances only inside the latitude
+    band that can contain matches. Either way a radius query for a site costs microseconds.
+
+    A site (att_name) may have several nodes/coordinates: it is a neighbor when any of its
+    points is within the radius of any point of a center site, as in the PostGIS join.
+    Queries return None when the index cannot answer (not loaded, unknown center) so callers
+    fall back to the database.
+    """
+
+    def __init__(self, check_s=SPATIAL_INDEX_CHECK_S):
+        self.check_s = float(check_s)
+        self.loaded_at = None
+        # (names, lat rad, lon rad, {name: point indexes}, tree); replaced as a whole
+        self._state = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loading = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._state is not None
+
+    # ----- Loading -----
+    @staticmethod
+    def _source_version():
+        rows = get_data_watermark_rows_cached() or {}
+        return tuple(str((rows.get(t) or {}).get('updated_at')) for t in SOURCE_TABLES)
+
+    def load(self, engine=None):
+        """Read every site coordinate; True once the new index is swapped in."""
+        try:
+            engine = engine or get_engine()
+            version = self._source_version()
+            df = pd.read_sql_query(text("""
+                SELECT DISTINCT att_name, CAST(latitude AS DOUBLE PRECISION) AS latitude,
+                       CAST(longitude AS DOUBLE PRECISION) AS longitude
+                FROM public.master_node_total
+                WHERE att_name IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+            """), engine)
+        except Exception as e:
+            print(f"Error loading spatial index: {e}")
+            return False
+        self.build(df['att_name'].astype(str).to_numpy(), df['latitude'].to_numpy(dtype='float64'),
+                   df['longitude'].to_numpy(dtype='float64'))
+        self._version = version
+        print(f"Spatial index loaded: {len(df)} points")
+        return True
+
+    def build(self, names, lat_deg, lon_deg):
+        """Build from arrays of site names and coordinates in degrees."""
+        lat = np.radians(np.asarray(lat_deg, dtype='float64'))
+        lon = np.radians(np.asarray(lon_deg, dtype='float64'))
+        names = np.asarray(names, dtype=object)
+        if BallTree is not None:
+            tree = BallTree(np.column_stack([lat, lon]), metric='haversine') if len(names) else None
+        else:
+            order = np.argsort(lat, kind='stable')
+            names, lat, lon = names[order], lat[order], lon[order]
+            tree = None
+        points = {}
+        for i, name in enumerate(names):
+            points.setdefault(name, []).append(i)
+        self._state = (names, lat, lon, {k: np.asarray(v) for k, v in points.items()}, tree)
+        self.loaded_at = time.time()
+
+    def _refresh(self):
+        if not self._loading.acquire(blocking=False):
+            return
+        try:
+            if not self.ready or self._source_version() != self._version:
+                self.load()
+        finally:
+            self._loading.release()
+
+    def start(self):
+        """Load (or check for changes) in a background thread."""
+        self._checked_at = time.time()
+        threading.Thread(target=self._refresh, name="spatial-index", daemon=True).start()
+
+    def maybe_refresh(self):
+        """Rebuild in the background when master_node_total changed (checked every `check_s`)."""
+        now = time.time()
+        if now - self._checked_at >= self.check_s or (not self.ready and now - self._checked_at >= 5.0):
+            self.start()
+
+    # ----- Queries -----
+    def _centers(self, state, site_list):
+        points = state[3]
+        idx = [points.get(s) for s in site_list]
+        if any(i is None for i in idx):
+            return None
+        return np.concatenate(idx) if idx else np.array([], dtype=int)
+
+    def _within(self, state, lat0, lon0, radius_km):
+        """Point indexes within radius_km of one point."""
+        names, lat, lon, _, tree = state
+        if tree is not None:
+            return tree.query_radius(np.array([[lat0, lon0]]), r=radius_km / EARTH_RADIUS_KM)[0]
+        dlat = radius_km / EARTH_RADIUS_KM
+        lo, hi = np.searchsorted(lat, [lat0 - dlat, lat0 + dlat + 1e-12])
+        d = haversine_km(lat0, lon0, lat[lo:hi], lon[lo:hi])
+        return lo + np.nonzero(d <= radius_km)[0]
+
+    def _radius_points(self, site_list, radius_km):
+        """(state, point indexes within radius_km of any center point, centers excluded) or None."""
+        state = self._state
+        if state is None:
+            return None
+        centers = self._centers(state, site_list)
+        if centers is None:
+            return None
+        names, lat, lon = state[0], state[1], state[2]
+        found = set()
+        for c in centers:
+            found.update(self._within(state, lat[c], lon[c], radius_km).tolist())
+        exclude = set(site_list)
+        return state, [i for i in found if names[i] not in exclude]
+
+    def query_radius(self, site_list, radius_km):
+        """
+        Sites within radius_km of any center site, centers excluded
+
+        Returns:
+            list: Sorted neighbor site names, or None if the index cannot answer
+        """
+        if isinstance(site_list, str):
+            site_list = [site_list]
+        hit = self._radius_points(site_list, radius_km)
+        if hit is None:
+            return None
+        state, points = hit
+        return sorted({state[0][i] for i in points})
+
+    def query_radius_points(self, site_list, radius_km):
+        """
+        Points (site, latitude, longitude) within radius_km of any center site, centers excluded
+
+        Returns:
+            list: Distinct points in degrees ordered by site, or None if the index cannot answer
+        """
+        if isinstance(site_list, str):
+            site_list = [site_list]
+        hit = self._radius_points(site_list, radius_km)
+        if hit is None:
+            return None
+        (names, lat, lon, _, _), points = hit
+        return sorted({(names[i], float(np.degrees(lat[i])), float(np.degrees(lon[i]))) for i in points})
+
+    def query_knn(self, site_list, k=10):
+        """
+        The k sites nearest to any center site, centers excluded
+
+        Returns:
+            list: [(site, distance_km)] ordered by distance, or None if the index cannot answer
+        """
+        state = self._state
+        if state is None:
+            return None
+        if isinstance(site_list, str):
+            site_list = [site_list]
+        centers = self._centers(state, site_list)
+        if centers is None:
+            return None
+        names, lat, lon = state[0], state[1], state[2]
+        exclude = set(site_list)
+        best = {}
+        for c in centers:
+            # Grow the search radius until it holds k sites: every point inside it is then known,
+            # so the k nearest found are exact
+            radius_km = 2.0
+            while True:
+                idx = self._within(state, lat[c], lon[c], radius_km)
+                d = haversine_km(lat[c], lon[c], lat[idx], lon[idx])
+                found = {}
+                for i, dist_km in zip(idx.tolist(), d.tolist()):
+                    name = names[i]
+                    if name not in exclude and dist_km < found.get(name, np.inf):
+                        found[name] = dist_km
+                if len(found) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                    break
+                radius_km *= 2.0
+            for name, dist_km in found.items():
+                if dist_km < best.get(name, np.inf):
+                    best[name] = dist_km
+        return sorted(best.items(), key=lambda kv: kv[1])[:k]
+
+    def coordinates(self, site_list):
+        """[(site, latitude, longitude)] in degrees for every point of the given sites (unknown ones skipped)."""
+        state = self._state
+        if state is None:
+            return None
+        names, lat, lon, points, _ = state
+        out = []
+        for s in site_list:
+            for i in points.get(s, ()):
+                out.append((names[i], float(np.degrees(lat[i])), float(np.degrees(lon[i]))))
+        return out
+
+
+site_spatial_index = SiteSpatialIndex()
@@ -0,0 +1,283 @@
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Kept free of other project imports: metrics, db_pool and the selectors use it.
+
+# Spans kept per trace; later ones are counted in `dropped_spans` instead
+MAX_SPANS = 20000
+# Characters of SQL kept on statement spans
+MAX_STATEMENT_CHARS = 500
+
+_trace = contextvars.ContextVar('trace', default=None)
+_span = contextvars.ContextVar('trace_span', default=None)
+
+
+class Span:
+    """One timed operation; `set()` adds attributes (row counts, bytes, cache hits, ...)."""
+
+    __slots__ = ('span_id', 'parent_id', 'name', 'cat', 'start_ns', 'end_ns', 'thread_id', 'thread_name', 'attrs')
+
+    def __init__(self, name, cat, parent_id, attrs):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.cat = cat
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Spans of one request; threads add to it once the context is propagated (see `propagate`)."""
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def _add(self, span):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(span)
+                return True
+            self.dropped_spans += 1
+            return False
+
+    @property
+    def root(self):
+        return self.spans[0] if self.spans else None
+
+    def duration_s(self):
+        root = self.root
+        if root is None or root.end_ns is None:
+            return None
+        return (root.end_ns - root.start_ns) / 1e9
+
+
+def current_trace():
+    """Trace bound to the current context, or None."""
+    return _trace.get()
+
+
+def current_span():
+    return _span.get() or NULL_SPAN
+
+
+def _open(name, cat, attrs):
+    trace = _trace.get()
+    if trace is None:
+        return None, None
+    parent = _span.get()
+    s = Span(name, cat, parent.span_id if parent is not None else None, attrs)
+    if not trace._add(s):
+        return None, None
+    return s, _span.set(s)
+
+
+def _close(s, token, error=None):
+    s.end_ns = time.time_ns()
+    if error is not None:
+        s.attrs['error'] = f"{type(error).__name__}: {error}"
+    _span.reset(token)
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Bind a new trace with a root span `name` for the duration of the block."""
+    trace = Trace(name, **attrs)
+    trace_token = _trace.set(trace)
+    s, token = _open(name, 'request', dict(attrs))
+    try:
+        yield trace
+    except BaseException as e:
+        _close(s, token, e)
+        raise
+    else:
+        _close(s, token)
+    finally:
+        _trace.reset(trace_token)
+
+
+@contextmanager
+def span(name, cat='app', **attrs):
+    """Time the block as a child of the current span; a no-op when no trace is bound."""
+    s, token = _open(name, cat, attrs)
+    if s is None:
+        yield NULL_SPAN
+        return
+    try:
+        yield s
+    except BaseException as e:
+        _close(s, token, e)
+        raise
+    else:
+        _close(s, token)
+
+
+def traced(name=None, cat='app'):
+    """Decorator: run the function inside `span(name or function name)`."""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(label, cat=cat):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def propagate(fn):
+    """fn bound to a copy of the current context, for executor submits: spans created in the
+    worker thread then belong to the caller's trace. Returns fn unchanged when not tracing."""
+    if _trace.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
+
+
+# ----- Statement spans -----
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is None:
+        return
+    s, token = _open('sql', 'sql', {'statement': statement.strip()[:MAX_STATEMENT_CHARS]})
+    if s is not None:
+        conn.info['trace_span'] = (s, token)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    entry = conn.info.pop('trace_span', None)
+    if entry is None:
+        return
+    s, token = entry
+    rows = getattr(cursor, 'rowcount', -1)
+    if rows is not None and rows >= 0:
+        s.attrs['rows'] = rows
+    _close(s, token)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    entry = conn.info.pop('trace_span', None) if conn is not None else None
+    if entry is not None:
+        _close(entry[0], entry[1], exception_context.original_exception)
+
+
+def install_tracing_hooks(engine):
+    """Attach statement span hooks to an engine (idempotent)."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+# ----- Export -----
+def to_chrome(trace):
+    """Chrome trace event JSON (chrome://tracing, Perfetto, speedscope)."""
+    with trace._lock:
+        spans = list(trace.spans)
+    if not spans:
+        return {'traceEvents': [], 'displayTimeUnit': 'ms'}
+    t0 = min(s.start_ns for s in spans)
+    tids = {}
+    events = []
+    for s in spans:
+        if s.thread_id not in tids:
+            tids[s.thread_id] = len(tids) + 1
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tids[s.thread_id],
+                           'args': {'name': s.thread_name}})
+        end_ns = s.end_ns if s.end_ns is not None else time.time_ns()
+        events.append({
+            'name': s.name,
+            'cat': s.cat,
+            'ph': 'X',
+            'ts': (s.start_ns - t0) / 1000.0,
+            'dur': (end_ns - s.start_ns) / 1000.0,
+            'pid': 1,
+            'tid': tids[s.thread_id],
+            'args': {**s.attrs, 'span_id': s.span_id, 'parent_id': s.parent_id},
+        })
+    return {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'trace_id': trace.trace_id, 'name': trace.name, 'dropped_spans': trace.dropped_spans},
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace, service_name='ran-quality-api'):
+    """OTLP/HTTP JSON (ExportTraceServiceRequest) for POSTing to a collector's /v1/traces."""
+    with trace._lock:
+        spans = list(trace.spans)
+    out = []
+    for s in spans:
+        end_ns = s.end_ns if s.end_ns is not None else time.time_ns()
+        attrs = {**s.attrs, 'category': s.cat, 'thread.name': s.thread_name}
+        entry = {
+            'traceId': trace.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 2 if s.parent_id is None else 1,
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in attrs.items() if v is not None],
+            'status': {'code': 2, 'message': str(s.attrs['error'])} if 'error' in s.attrs else {},
+        }
+        if s.parent_id is not None:
+            entry['parentSpanId'] = s.parent_id
+        out.append(entry)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+        'scopeSpans': [{'scope': {'name': 'cell_change_evolution.tracing'}, 'spans': out}],
+    }]}
+
+
+def export_otlp(trace, endpoint, service_name='ran-quality-api', timeout_s=5.0):
+    """POST the trace to an OTLP/HTTP collector endpoint (e.g. http://localhost:4318/v1/traces)."""
+    body = json.dumps(to_otlp(trace, service_name), default=str).encode('utf-8')
+    request = urllib.request.Request(endpoint, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout_s) as response:
+            return 200 <= response.status < 300
+    except Exception as e:
+        print(f"Error exporting trace {trace.trace_id} to {endpoint}: {e}")
+        return False
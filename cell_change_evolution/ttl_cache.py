@@ -0,0 +1,60 @@
+import time
+import threading
+from collections import OrderedDict
+
+from cell_change_evolution.metrics import track_cache
+
+
+class TTLCache:
+    """Small thread-safe in-process cache with per-entry expiry and LRU bound.
+
+    Used for short-lived lookups (e.g. neighbor sets) that are requested many
+    times in a burst but may change when the master node tables are reloaded.
+    Caches created with a `name` report their hit ratio on /api/metrics.
+    """
+
+    def __init__(self, ttl_s=300.0, maxsize=1024, name=None):
+        self.ttl_s = float(ttl_s)
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if name:
+            track_cache(name, self)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires < now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_s=None):
+        if self.ttl_s <= 0 and ttl_s is None:
+            return
+        expires = time.monotonic() + (self.ttl_s if ttl_s is None else float(ttl_s))
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._data)
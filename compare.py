@@ -1,9 +1,53 @@
-# Validation for LTE CQI row vs vectorized (both in 0..1 scale)
+# Equivalence check: row-based unified CQI functions vs the vectorized kernels in
+# cell_change_evolution/cqi_kernels.py (all in 0..1 scale). Results must be identical.
+# Run from the repo root: python compare.py [seed]  (exit code 1 on any mismatch)
+#
+# With --bench the CQI kernels and the DataFrame helpers of the request path are then timed
+# over 10 .. 10^6 rows and compared with a saved baseline (exit code 1 on a regression):
+#   python compare.py --bench --save-baseline          # record benchmarks/kernels-baseline.json
+#   python compare.py --bench --threshold 0.25         # fail when a case is >25% slower
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import contextlib
 import pandas as pd
 import numpy as np
 
-# Import the row-based function from your file
-from cell_change_evolution.select_db_cqi_daily import calculate_unified_cqi_lte_row
+# Import the row-based reference functions and the vectorized kernels
+from cell_change_evolution.select_db_cqi_daily import (
+    calculate_unified_cqi_lte_row,
+    calculate_unified_cqi_nr_row,
+    calculate_unified_cqi_umts_row,
+)
+from cell_change_evolution.cqi_kernels import (
+    unified_cqi_lte,
+    unified_cqi_nr,
+    unified_cqi_umts,
+    LTE_VENDORS,
+    NR_VENDORS,
+    UMTS_VENDORS,
+    NR_COMBINED_FIELDS,
+)
+
+failures = []
+
+
+def check(label, df, row_fn, vec_fn, show=False):
+    """Compare row vs vectorized results on df; record a failure on any difference."""
+    row_vals = df.apply(row_fn, axis=1).to_numpy(dtype=float)
+    vec_vals = vec_fn(df)
+    diff = np.abs(row_vals - vec_vals)
+    mismatches = int((row_vals != vec_vals).sum())
+    print(f"{label}: rows={len(df)} mismatches={mismatches} max_abs_diff={diff.max() if len(diff) else 0.0}")
+    if show:
+        print(pd.DataFrame({'time': df['time'], 'row': row_vals, 'vec': vec_vals, 'abs_diff': diff}))
+    if mismatches:
+        failures.append(label)
+
 
 # Build a small sample dataset. Row0 uses combined fields; Row1 uses vendor fallbacks.
 df = pd.DataFrame([
@@ -82,72 +126,7 @@ df = pd.DataFrame([
     },
 ])
 
-# Row-based calculation (0..1)
-row_vals = df.apply(calculate_unified_cqi_lte_row, axis=1)
-df['lte_cqi_row'] = row_vals
-
-# Vectorized calculation in 0..1 scale (mirrors apply_lte_calculations without the final *100)
-def _safe_div(num, den): return np.where(den != 0, num / den, 0.0)
-def _zn(x): return np.where(pd.isna(x), 0.0, x)
-
-# zero-null vendor columns
-vendor_cols = [c for c in df.columns if any(p in c for p in ['h4g_', 'e4g_', 'n4g_', 's4g_'])]
-df[vendor_cols] = df[vendor_cols].apply(_zn)
-
-erab_success_total = df[['h4g_erab_success','e4g_erab_success','n4g_erab_success','s4g_erab_success']].sum(axis=1)
-erabs_attemps_total = df[['h4g_erabs_attemps','e4g_erabs_attemps','n4g_erabs_attemps','s4g_erabs_attemps']].sum(axis=1)
-rrc_success_total  = df[['h4g_rrc_success_all','e4g_rrc_success_all','n4g_rrc_success_all','s4g_rrc_success_all']].sum(axis=1)
-rrc_attemps_total  = df[['h4g_rrc_attemps_all','e4g_rrc_attemps_all','n4g_rrc_attemps_all','s4g_rrc_attemps_all']].sum(axis=1)
-s1_success_total   = df[['h4g_s1_success','e4g_s1_success','n4g_s1_success','s4g_s1_success']].sum(axis=1)
-s1_attemps_total   = df[['h4g_s1_attemps','e4g_s1_attemps','n4g_s1_attemps','s4g_s1_attemps']].sum(axis=1)
-
-retain_num_total   = df[['h4g_retainability_num','e4g_retainability_num','n4g_retainability_num','s4g_retainability_num']].sum(axis=1)
-retain_den_total   = df[['h4g_retainability_denom','e4g_retainability_denom','n4g_retainability_denom','s4g_retainability_denom']].sum(axis=1)
-
-irat_events_total  = df[['h4g_irat_4g_to_3g_events','e4g_irat_4g_to_3g_events','n4g_irat_4g_to_3g_events','s4g_irat_4g_to_3g_events']].sum(axis=1)
-erab_estab_total   = df[['h4g_erab_succ_established','e4g_erab_succ_established','n4g_erab_succ_established','s4g_erab_succ_established']].sum(axis=1)
-
-thp_num_total      = df[['h4g_thpt_user_dl_kbps_num','e4g_thpt_user_dl_kbps_num','n4g_thpt_user_dl_kbps_num','s4g_thpt_user_dl_kbps_num']].sum(axis=1)
-thp_den_total      = df[['h4g_thpt_user_dl_kbps_denom','e4g_thpt_user_dl_kbps_denom','n4g_thpt_user_dl_kbps_denom','s4g_thpt_user_dl_kbps_denom']].sum(axis=1)
-
-time3g_total       = df[['h4g_time3g','e4g_time3g','n4g_time3g','s4g_time3g']].sum(axis=1)
-time4g_total       = df[['h4g_time4g','e4g_time4g','n4g_time4g','s4g_time4g']].sum(axis=1)
-
-sumavg_latency_total = df[['h4g_sumavg_latency','e4g_sumavg_latency','n4g_sumavg_latency','s4g_sumavg_latency']].sum(axis=1)
-summuestras_total  = df[['h4g_summuestras','e4g_summuestras','n4g_summuestras','s4g_summuestras']].sum(axis=1)
-sumavg_dl_kbps_total = df[['h4g_sumavg_dl_kbps','e4g_sumavg_dl_kbps','n4g_sumavg_dl_kbps','s4g_sumavg_dl_kbps']].sum(axis=1)
-
-# Totals -> KPIs
-lte_acc = _safe_div(erab_success_total, erabs_attemps_total) * _safe_div(rrc_success_total, rrc_attemps_total) * _safe_div(s1_success_total, s1_attemps_total) * 100
-lte_ret = (1 - _safe_div(retain_num_total, retain_den_total)) * 100
-lte_irat = _safe_div(irat_events_total, erab_estab_total) * 100
-lte_thp_user_dl = _safe_div(thp_num_total, thp_den_total)
-lte_4g_on_3g = _safe_div(time3g_total, (time3g_total + time4g_total)) * 100  # 3G share (%)
-lte_ookla_lat = _safe_div(sumavg_latency_total, summuestras_total)
-lte_ookla_thp = _safe_div(sumavg_dl_kbps_total, summuestras_total)
-
-# Vectorized CQI (0..1) — same constants as row-based
-acc_p = lte_acc / 100
-ret_p = lte_ret / 100
-irat_p = lte_irat / 100
-term_acc = 0.25 * np.exp((1 - acc_p) * -63.91668575)
-term_ret = 0.25 * np.exp((1 - ret_p) * -63.91668575)
-term_irat = 0.05 * np.exp(irat_p * -22.31435513)
-term_thp_ran = 0.30 * (1 - np.exp(lte_thp_user_dl * -0.000282742))
-term_4g3g = 0.05 * np.minimum(1, np.exp(((lte_4g_on_3g / 100) - 0.10) * -11.15717757))
-term_lat = 0.05 * np.exp((lte_ookla_lat - 20.0) * -0.00526802578289131)
-term_ookla = 0.05 * (1 - np.exp(lte_ookla_thp * -0.00005364793041447))
-lte_cqi_vec = term_acc + term_ret + term_irat + term_thp_ran + term_4g3g + term_lat + term_ookla
-
-df['lte_cqi_vec'] = np.round(lte_cqi_vec.astype(float), 8)
-df['lte_cqi_row'] = np.round(df['lte_cqi_row'].astype(float), 8)
-df['abs_diff'] = np.abs(df['lte_cqi_row'] - df['lte_cqi_vec'])
-
-print(df[['time','lte_cqi_row','lte_cqi_vec','abs_diff']])
-
 # ---------------- NR (5G) comparison ----------------
-from cell_change_evolution.select_db_cqi_daily import calculate_unified_cqi_nr_row
-
 # Build a small NR sample dataset (two rows)
 df_nr = pd.DataFrame([
     {
@@ -195,50 +174,398 @@ df_nr = pd.DataFrame([
     },
 ])
 
-# Row-based NR calculation (0..1)
-df_nr['nr_cqi_row'] = df_nr.apply(calculate_unified_cqi_nr_row, axis=1)
-
-# Vectorized NR calculation (0..1) mirroring apply_nr_calculations without the final *100
-acc_rrc_num_total = df_nr['e5g_acc_rrc_num_n'] + df_nr['n5g_acc_rrc_num_n']
-acc_rrc_den_total = df_nr['e5g_acc_rrc_den_n'] + df_nr['n5g_acc_rrc_den_n']
-s1_sr_num_total = df_nr['e5g_s1_sr_num_n'] + df_nr['n5g_s1_sr_num_n']
-s1_sr_den_total = df_nr['e5g_s1_sr_den_n'] + df_nr['n5g_s1_sr_den_n']
-erab_4g_num_total = df_nr['e5g_nsa_acc_erab_sr_4gendc_num_n'] + df_nr['n5g_nsa_acc_erab_sr_4gendc_num_n']
-erab_4g_den_total = df_nr['e5g_nsa_acc_erab_sr_4gendc_den_n'] + df_nr['n5g_nsa_acc_erab_sr_4gendc_den_n']
-erab_5g_num_total = df_nr['e5g_nsa_acc_erab_succ_5gendc_5gleg_n'] + df_nr['n5g_nsa_acc_erab_succ_5gendc_5gleg_n']
-erab_5g_den_total = df_nr['e5g_nsa_acc_erab_att_5gendc_5gleg_n'] + df_nr['n5g_nsa_acc_erab_att_5gendc_5gleg_n']
-ret_4g_drop_total = df_nr['e5g_nsa_ret_erab_drop_4gendc_n'] + df_nr['n5g_nsa_ret_erab_drop_4gendc_n']
-ret_4g_att_total = df_nr['e5g_nsa_ret_erab_att_4gendc_n'] + df_nr['n5g_nsa_ret_erab_att_4gendc_n']
-ret_5g_drop_total = df_nr['e5g_nsa_ret_erab_drop_5gendc_4g5gleg_num_n'] + df_nr['n5g_nsa_ret_erab_drop_5gendc_4g5gleg_num_n']
-ret_5g_den_total = df_nr['e5g_nsa_ret_erab_drop_5gendc_4g5gleg_den_n'] + df_nr['n5g_nsa_ret_erab_drop_5gendc_4g5gleg_den_n']
-thp_mn_num_total = df_nr['e5g_nsa_thp_mn_num'] + df_nr['n5g_nsa_thp_mn_num']
-thp_mn_den_total = df_nr['e5g_nsa_thp_mn_den'] + df_nr['n5g_nsa_thp_mn_den']
-thp_sn_num_total = df_nr['e5g_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_num_n'] + df_nr['n5g_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_num_n']
-thp_sn_den_total = df_nr['e5g_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_denom_n'] + df_nr['n5g_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_denom_n']
-
-nr_acc_mn = _safe_div(acc_rrc_num_total, acc_rrc_den_total) * _safe_div(s1_sr_num_total, s1_sr_den_total) * _safe_div(erab_4g_num_total, erab_4g_den_total) * 100
-nr_acc_sn = _safe_div(erab_5g_num_total, erab_5g_den_total) * 100
-nr_ret_mn = (1 - _safe_div(ret_4g_drop_total, ret_4g_att_total)) * 100
-nr_endc_ret_tot = (1 - _safe_div(ret_5g_drop_total, ret_5g_den_total)) * 100
-nr_thp_mn = _safe_div(thp_mn_num_total, thp_mn_den_total)
-nr_thp_sn = _safe_div(thp_sn_num_total, thp_sn_den_total)
-
-acc_mn_p = nr_acc_mn / 100
-acc_sn_p = nr_acc_sn / 100
-ret_mn_p = nr_ret_mn / 100
-endc_p = nr_endc_ret_tot / 100
-
-term1 = 0.17 * np.exp((1 - acc_mn_p) * -14.92648157)
-term2 = 0.13 * np.exp((1 - acc_sn_p) * -26.68090256)
-term3 = 0.17 * np.exp((1 - ret_mn_p) * -14.92648157)
-term4 = 0.13 * np.exp((1 - endc_p) * -26.68090256)
-term5 = 0.20 * (1 - np.exp(nr_thp_mn * 1000 * -0.0002006621))
-term6 = 0.20 * (1 - np.exp(nr_thp_sn * 1000 * -0.0002006621))
-nr_cqi_vec = term1 + term2 + term3 + term4 + term5 + term6
-
-df_nr['nr_cqi_vec'] = np.round(nr_cqi_vec.astype(float), 8)
-df_nr['nr_cqi_row'] = np.round(df_nr['nr_cqi_row'].astype(float), 8)
-df_nr['abs_diff'] = np.abs(df_nr['nr_cqi_row'] - df_nr['nr_cqi_vec'])
-
-print("\nNR comparison:")
-print(df_nr[['time','nr_cqi_row','nr_cqi_vec','abs_diff']])
\ No newline at end of file
+# Same rows with the combined nr_cqi_daily fields: row 0 complete, row 1 missing one field (None)
+df_nr_comb = df_nr.copy()
+df_nr_comb['acc_mn'] = [99.123456789, 98.5]
+df_nr_comb['acc_sn'] = [97.25, 96.0]
+df_nr_comb['ret_mn'] = [99.5, 99.1]
+df_nr_comb['endc_ret_tot'] = [99.2, 98.75]
+df_nr_comb['thp_mn'] = [45.125, 40.0]
+df_nr_comb['thp_sn'] = pd.Series([30.555, None], dtype=object)
+
+# ---------------- Randomized counters ----------------
+# Realistic counters (success <= attempts), with NULLs, zero denominators and integer columns.
+rng = np.random.default_rng(0)
+N = 5000
+
+
+def _pair(n, scale=1000):
+    att = rng.integers(0, scale, n).astype(float)
+    succ = np.floor(att * rng.uniform(0.8, 1.0, n))
+    return succ, att
+
+
+def _nullify(df, vendors, p=0.05):
+    """Blank out all counters of a vendor on random rows (missing vendor report)."""
+    for v in vendors:
+        cols = [c for c in df.columns if c.startswith(f'{v}_')]
+        df.loc[rng.random(len(df)) < p, cols] = np.nan
+    return df
+
+
+def random_lte(n):
+    d = {'time': pd.date_range('2025-01-01', periods=n, freq='h').astype(str), 'site_att': 'SITE_R'}
+    for v in LTE_VENDORS:
+        for s_name, a_name in [('erab_success', 'erabs_attemps'), ('rrc_success_all', 'rrc_attemps_all'), ('s1_success', 's1_attemps')]:
+            d[f'{v}_{s_name}'], d[f'{v}_{a_name}'] = _pair(n)
+        drop, att = _pair(n)
+        d[f'{v}_retainability_num'], d[f'{v}_retainability_denom'] = att - drop, att
+        d[f'{v}_irat_4g_to_3g_events'] = rng.integers(0, 20, n).astype(float)
+        d[f'{v}_thpt_user_dl_kbps_num'] = rng.integers(0, 2_000_000, n).astype(float)
+        d[f'{v}_thpt_user_dl_kbps_denom'] = rng.integers(0, 60, n).astype(float)
+        d[f'{v}_time3g'] = rng.integers(0, 200, n).astype(float)
+        d[f'{v}_time4g'] = rng.integers(0, 900, n).astype(float)
+        d[f'{v}_summuestras'] = rng.integers(0, 1000, n).astype(float)
+        d[f'{v}_sumavg_latency'] = d[f'{v}_summuestras'] * rng.uniform(10, 40, n)
+        d[f'{v}_sumavg_dl_kbps'] = d[f'{v}_summuestras'] * rng.uniform(500, 30000, n)
+    df_r = pd.DataFrame(d)
+    return _nullify(df_r, LTE_VENDORS)
+
+
+def random_umts(n):
+    d = {'time': pd.date_range('2025-01-01', periods=n, freq='h').astype(str), 'site_att': 'SITE_R'}
+    for v in UMTS_VENDORS:
+        for dom in ('cs', 'ps'):
+            for kind in ('rrc', 'nas', 'rab'):
+                d[f'{v}_{kind}_success_{dom}'], d[f'{v}_{kind}_attempts_{dom}'] = _pair(n)
+        drop, att = _pair(n)
+        d[f'{v}_drop_num_cs'], d[f'{v}_drop_denom_cs'] = att - drop, att
+        drop, att = _pair(n)
+        d[f'{v}_ps_retainability_num'], d[f'{v}_ps_retainability_denom'] = att - drop, att
+        # Integer dtype on purpose: the selectors can get BIGINT-like columns
+        d[f'{v}_thpt_user_dl_kbps_num'] = rng.integers(0, 500_000, n)
+        d[f'{v}_thpt_user_dl_kbps_denom'] = rng.integers(0, 200, n)
+    df_r = pd.DataFrame(d)
+    return _nullify(df_r, UMTS_VENDORS)
+
+
+def random_nr(n, combined):
+    d = {'time': pd.date_range('2025-01-01', periods=n, freq='h').astype(str), 'site_att': 'SITE_R'}
+    for v in NR_VENDORS:
+        for num, den in [('acc_rrc_num_n', 'acc_rrc_den_n'), ('s1_sr_num_n', 's1_sr_den_n'),
+                         ('nsa_acc_erab_sr_4gendc_num_n', 'nsa_acc_erab_sr_4gendc_den_n'),
+                         ('nsa_acc_erab_succ_5gendc_5gleg_n', 'nsa_acc_erab_att_5gendc_5gleg_n')]:
+            d[f'{v}_{num}'], d[f'{v}_{den}'] = _pair(n)
+        for num, den in [('nsa_ret_erab_drop_4gendc_n', 'nsa_ret_erab_att_4gendc_n'),
+                         ('nsa_ret_erab_drop_5gendc_4g5gleg_num_n', 'nsa_ret_erab_drop_5gendc_4g5gleg_den_n')]:
+            ok, att = _pair(n)
+            d[f'{v}_{num}'], d[f'{v}_{den}'] = att - ok, att
+        # Throughput ratios that often land on x.xx5 to exercise the 2-decimal rounding
+        d[f'{v}_nsa_thp_mn_num'] = rng.integers(0, 100_000, n).astype(float)
+        d[f'{v}_nsa_thp_mn_den'] = rng.choice([0.0, 8.0, 40.0, 200.0, 1000.0], n)
+        d[f'{v}_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_num_n'] = rng.integers(0, 100_000, n).astype(float)
+        d[f'{v}_nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_denom_n'] = rng.choice([0.0, 8.0, 40.0, 200.0, 1000.0], n)
+    df_r = pd.DataFrame(d)
+    df_r = _nullify(df_r, NR_VENDORS)
+    if combined:
+        for c in NR_COMBINED_FIELDS[:4]:
+            df_r[c] = rng.uniform(90, 100, n)
+        df_r['thp_mn'] = rng.integers(0, 100_000, n) / 200.0
+        df_r['thp_sn'] = pd.Series(rng.integers(0, 100_000, n) / 40.0, dtype=object)
+        # Half the rows fall back to vendor totals (a combined field is None)
+        df_r.loc[rng.random(n) < 0.5, 'thp_sn'] = None
+        df_r.loc[rng.random(n) < 0.05, 'acc_mn'] = np.nan
+    return df_r
+
+
+def run_checks(seed=0):
+    """Sample and randomized comparisons; returns the labels that mismatched."""
+    global rng
+    rng = np.random.default_rng(seed)
+    failures.clear()
+
+    check("LTE sample", df, calculate_unified_cqi_lte_row, unified_cqi_lte, show=True)
+    check("NR sample (vendor totals)", df_nr, calculate_unified_cqi_nr_row, unified_cqi_nr, show=True)
+    check("NR sample (combined fields)", df_nr_comb, calculate_unified_cqi_nr_row, unified_cqi_nr, show=True)
+
+    check("LTE random", random_lte(N), calculate_unified_cqi_lte_row, unified_cqi_lte)
+    check("UMTS random", random_umts(N), calculate_unified_cqi_umts_row, unified_cqi_umts)
+    check("NR random (vendor totals)", random_nr(N, combined=False), calculate_unified_cqi_nr_row, unified_cqi_nr)
+    check("NR random (combined/fallback mix)", random_nr(N, combined=True), calculate_unified_cqi_nr_row, unified_cqi_nr)
+
+    # Empty frames must not fail
+    for label, fn in [("LTE", unified_cqi_lte), ("UMTS", unified_cqi_umts), ("NR", unified_cqi_nr)]:
+        assert len(fn(pd.DataFrame(columns=['time', 'site_att']))) == 0, f"{label} empty frame"
+    return list(failures)
+
+
+# ---------------- Benchmarks ----------------
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'kernels-baseline.json')
+DEFAULT_SIZES = (10, 1_000, 100_000, 1_000_000)
+# Level processors run on one aggregated level at a time; the site level is the widest
+SITE_LEVEL = {'name': 'site', 'null_fields': []}
+LEVEL_TRAFFIC_FIELDS = {
+    'lte': (LTE_VENDORS, ['traffic_d_user_ps_gb']),
+    'umts': (UMTS_VENDORS, ['traffic_d_user_ps_gb', 'traffic_v_user_cs']),
+    'nr': (NR_VENDORS, ['nsa_traffic_mac_gb_5gendc_5gleg_n', 'nsa_traffic_pdcp_gb_5gendc_4glegn',
+                        'nsa_traffic_pdcp_gb_5gendc_5gleg']),
+}
+
+
+def _blank(values, p=0.1):
+    """Set a fraction of the values to NaN (missing daily rows) and another to 0."""
+    values = values.astype(float)
+    roll = rng.random(len(values))
+    values[roll < p] = np.nan
+    values[(roll >= p) & (roll < 2 * p)] = 0.0
+    return values
+
+
+def level_frame(tech, n):
+    """Aggregated site-level input of apply_<tech>_calculations."""
+    if tech == 'lte':
+        df_l = random_lte(n)
+    elif tech == 'umts':
+        df_l = random_umts(n)
+    else:
+        df_l = random_nr(n, combined=False)
+    vendors, fields = LEVEL_TRAFFIC_FIELDS[tech]
+    for v in vendors:
+        for field in fields:
+            df_l[f'{v}_{field}'] = _blank(rng.uniform(0, 50, n))
+    df_l = df_l.rename(columns={'time': 'date'})
+    df_l['region'], df_l['province'], df_l['municipality'] = 'REGION', 'PROVINCE', 'MUNICIPALITY'
+    if tech == 'nr':
+        df_l['city'] = 'CITY'
+    return df_l
+
+
+def traffic_frame(n, columns):
+    """Daily traffic frame as returned by the traffic selectors (NaNs and zeros included)."""
+    d = {'time': pd.date_range('2020-01-01', periods=n, freq='h'), 'site_att': 'SITE_R'}
+    for c in columns:
+        d[c] = _blank(rng.uniform(0, 80, n))
+    return pd.DataFrame(d)
+
+
+def cqi_frame(n):
+    """Unified CQI selector output: one CQI column with gaps and an occasional +/-inf."""
+    values = _blank(rng.uniform(0.5, 1.0, n))
+    values[rng.random(n) < 0.001] = np.inf
+    return pd.DataFrame({'time': pd.date_range('2020-01-01', periods=n, freq='h'), 'site_att': 'SITE_R',
+                         'lte_cqi': values})
+
+
+def period_frame(n):
+    """Cell change counts per region and day with ~20% of the days missing (expand_dates input)."""
+    days = max(1, min(n, 180))
+    regions = -(-n // days)
+    dates = np.tile(pd.date_range('2024-01-01', periods=days, freq='D').to_numpy(), regions)[:n]
+    region = np.repeat([f'REGION_{i}' for i in range(regions)], days)[:n]
+    df_p = pd.DataFrame({'date': dates, 'region': region})
+    for c in ('add_cell_lte', 'delete_cell_lte', 'add_cell_umts', 'delete_cell_umts'):
+        df_p[c] = rng.integers(0, 5, n)
+    for c in ('lte_700', 'lte_1900', 'lte_aws', 'umts_850', 'umts_1900'):
+        df_p[c] = rng.integers(0, 500, n)
+    # Keep the first day of every region so each group has a start
+    keep = (rng.random(n) >= 0.2) | (df_p.groupby('region').cumcount() == 0).to_numpy()
+    return df_p[keep].reset_index(drop=True)
+
+
+def bench_cases():
+    """(name, input kind, call(frame), max rows or None, mutates input).
+
+    Inputs of mutating calls are copied before every round, outside the timing.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    backend = os.path.join(root, 'backend')
+    if backend not in sys.path:
+        sys.path.insert(0, backend)
+    from cell_change_evolution.select_db_cqi_daily import sanitize_df
+    from cell_change_evolution.select_db_cell_period import expand_dates
+    from quality_metrics.lte_cqi_level_processor import apply_lte_calculations
+    from quality_metrics.umts_cqi_level_processor import apply_umts_calculations
+    from quality_metrics.nr_cqi_level_processor import apply_nr_calculations
+    from app.api.v1.evaluate import _range_mean, _sum_mean, CQI_COLS, DATA_COLS
+    from app.api.v1.sites import df_json_records
+
+    def rows(fn):
+        return lambda f: f.apply(fn, axis=1)
+
+    # Row functions and expand_dates loop in Python: capped so a default run stays in minutes
+    return [
+        ('lte.row', 'lte', rows(calculate_unified_cqi_lte_row), 10_000, False),
+        ('lte.kernel', 'lte', unified_cqi_lte, None, False),
+        ('umts.row', 'umts', rows(calculate_unified_cqi_umts_row), 10_000, False),
+        ('umts.kernel', 'umts', unified_cqi_umts, None, False),
+        ('nr.row', 'nr', rows(calculate_unified_cqi_nr_row), 10_000, False),
+        ('nr.kernel', 'nr', unified_cqi_nr, None, False),
+        ('lte.level', 'lte_level', lambda f: apply_lte_calculations(f, SITE_LEVEL), None, True),
+        ('umts.level', 'umts_level', lambda f: apply_umts_calculations(f, SITE_LEVEL), None, True),
+        ('nr.level', 'nr_level', lambda f: apply_nr_calculations(f, SITE_LEVEL), None, True),
+        ('range_mean', 'cqi', lambda f: _range_mean(f, CQI_COLS), None, False),
+        ('sanitize_df', 'cqi', sanitize_df, None, False),
+        ('sum_mean', 'traffic', lambda f: _sum_mean(f, DATA_COLS), None, False),
+        ('df_json_records', 'traffic', df_json_records, 100_000, False),
+        ('expand_dates', 'period', lambda f: expand_dates(f, group_by='region'), 10_000, True),
+    ]
+
+
+def bench_input(kind, n):
+    if kind in ('lte', 'umts'):
+        return random_lte(n) if kind == 'lte' else random_umts(n)
+    if kind == 'nr':
+        return random_nr(n, combined=True)
+    if kind.endswith('_level'):
+        return level_frame(kind[:-len('_level')], n)
+    if kind == 'cqi':
+        return cqi_frame(n)
+    if kind == 'traffic':
+        from app.api.v1.evaluate import DATA_COLS, VOICE_COLS
+        return traffic_frame(n, DATA_COLS + VOICE_COLS)
+    return period_frame(n)
+
+
+def timing_stats(times):
+    """Seconds per round, as pytest-benchmark reports them."""
+    q = statistics.quantiles(times, n=4) if len(times) > 1 else [times[0]] * 3
+    mean = statistics.fmean(times)
+    return {
+        'min': min(times), 'max': max(times), 'mean': mean, 'median': statistics.median(times),
+        'stddev': statistics.stdev(times) if len(times) > 1 else 0.0, 'iqr': q[2] - q[0],
+        'rounds': len(times), 'ops': 1.0 / mean if mean else 0.0,
+    }
+
+
+def measure(call, frame, mutates=False, min_rounds=3, max_rounds=1000, max_time=1.0):
+    """One warmup call, then rounds until max_time has passed (at least min_rounds)."""
+    times = []
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        call(frame.copy() if mutates else frame)
+        started = time.perf_counter()
+        while len(times) < min_rounds or (len(times) < max_rounds and time.perf_counter() - started < max_time):
+            arg = frame.copy() if mutates else frame
+            t0 = time.perf_counter()
+            call(arg)
+            times.append(time.perf_counter() - t0)
+            del arg
+    return timing_stats(times)
+
+
+def machine_info():
+    return {
+        'node': platform.node(), 'machine': platform.machine(), 'processor': platform.processor(),
+        'cpu_count': os.cpu_count(), 'python': platform.python_version(),
+        'numpy': np.__version__, 'pandas': pd.__version__,
+    }
+
+
+def format_seconds(value):
+    if value < 1e-3:
+        return f"{value * 1e6:.1f} us"
+    if value < 1.0:
+        return f"{value * 1e3:.2f} ms"
+    return f"{value:.3f} s"
+
+
+def run_benchmarks(sizes, only=None, no_limit=False, max_time=1.0, seed=0):
+    """Time every case on every size; inputs are built once per (kind, size), outside the timings."""
+    global rng
+    rng = np.random.default_rng(seed)
+    cases = [c for c in bench_cases() if not only or any(c[0].startswith(p) for p in only)]
+    benchmarks = []
+    print(f"\n{'case':<18}{'rows':>10}{'median':>14}{'min':>14}{'iqr':>14}{'rounds':>8}")
+    for n in sizes:
+        frames = {}
+        for name, kind, call, max_rows, mutates in cases:
+            if max_rows is not None and n > max_rows and not no_limit:
+                continue
+            if kind not in frames:
+                # One input kind alive at a time: the 10^6-row frames are hundreds of MB
+                frames.clear()
+                frames[kind] = bench_input(kind, n)
+            stats = measure(call, frames[kind], mutates=mutates, max_time=max_time)
+            benchmarks.append({'name': f'{name}[{n}]', 'case': name, 'rows': n, 'stats': stats})
+            print(f"{name:<18}{n:>10}{format_seconds(stats['median']):>14}{format_seconds(stats['min']):>14}"
+                  f"{format_seconds(stats['iqr']):>14}{stats['rounds']:>8}")
+    return {'machine_info': machine_info(), 'datetime': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': seed, 'benchmarks': benchmarks}
+
+
+def compare_baseline(results, baseline, threshold, stat='min'):
+    """Print current vs baseline per benchmark; returns the names slower by more than threshold."""
+    previous = {b['name']: b for b in baseline.get('benchmarks', [])}
+    regressions = []
+    print(f"\n{'benchmark':<28}{stat:>14}{'baseline':>14}{'change':>9}")
+    for b in results['benchmarks']:
+        current = b['stats'][stat]
+        old = previous.get(b['name'], {}).get('stats', {}).get(stat)
+        if not old:
+            print(f"{b['name']:<28}{format_seconds(current):>14}{'-':>14}{'new':>9}")
+            continue
+        change = current / old - 1.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(b['name'])
+        print(f"{b['name']:<28}{format_seconds(current):>14}{format_seconds(old):>14}{change:>+9.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    base_machine = baseline.get('machine_info', {})
+    if {k: base_machine.get(k) for k in ('node', 'machine', 'cpu_count')} != \
+            {k: results['machine_info'].get(k) for k in ('node', 'machine', 'cpu_count')}:
+        print(f"\nWarning: baseline recorded on another machine ({base_machine.get('node')}); timings may not be comparable")
+    return regressions
+
+
+def save_baseline(results, path):
+    """Merge results into the baseline file (cases not run keep their previous entry)."""
+    merged = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            merged = {b['name']: b for b in json.load(f).get('benchmarks', [])}
+    merged.update({b['name']: b for b in results['benchmarks']})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({**results, 'benchmarks': list(merged.values())}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Row vs vectorized CQI equivalence check and kernel benchmarks")
+    parser.add_argument("seed", nargs="?", type=int, default=0, help="Seed of the randomized counters")
+    parser.add_argument("--bench", action="store_true", help="Run the benchmarks after the equivalence check")
+    parser.add_argument("--sizes", default=','.join(str(s) for s in DEFAULT_SIZES), help="Comma-separated row counts")
+    parser.add_argument("--only", help="Comma-separated case name prefixes (e.g. lte,sanitize_df)")
+    parser.add_argument("--no-limit", action="store_true", help="Also run the capped cases (row functions, expand_dates, df_json_records) on every size")
+    parser.add_argument("--max-time", type=float, default=1.0, help="Seconds of rounds per case and size (at least 3 rounds)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown vs the baseline")
+    parser.add_argument("--stat", choices=("min", "median", "mean"), default="min", help="Statistic compared with the baseline")
+    parser.add_argument("--output", help="Result file (default benchmarks/results/kernels-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    mismatches = run_checks(args.seed)
+    if mismatches:
+        print(f"\nFAILED: {', '.join(mismatches)}")
+        return 1
+    print("\nAll vectorized CQI kernels match the row functions.")
+    if not args.bench:
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    only = [p.strip() for p in args.only.split(',')] if args.only else None
+    results = run_benchmarks(sizes, only=only, no_limit=args.no_limit, max_time=args.max_time, seed=args.seed)
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"kernels-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} (record one with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_baseline(results, baseline, args.threshold, args.stat)
+    if regressions:
+        print(f"\nREGRESSION (> {args.threshold:.0%} slower than the baseline): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
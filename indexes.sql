@@ -21,3 +21,8 @@ ON public.master_node_total (att_name);
 CREATE INDEX IF NOT EXISTS idx_master_node_total_geog_func
  ON public.master_node_total
 USING GIST ((ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography));
+
+-- H3 cell ids (filled by insert_db_master_cell.update_h3_cells)
+CREATE INDEX IF NOT EXISTS idx_master_node_total_h3_r5 ON public.master_node_total (h3_r5);
+CREATE INDEX IF NOT EXISTS idx_master_node_total_h3_r7 ON public.master_node_total (h3_r7);
+CREATE INDEX IF NOT EXISTS idx_master_node_total_h3_r9 ON public.master_node_total (h3_r9);
@@ -2,6 +2,8 @@ import psycopg2
 import os
 import dotenv
 
+from cell_change_evolution.data_watermark import refresh_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -130,8 +132,15 @@ def create_table_master_cell_total():
             longitude FLOAT,
             azimuth FLOAT,
             beam FLOAT,
-            period TEXT
+            period TEXT,
+            -- H3 cell ids (h3 extension, see insert_db_master_cell.update_h3_cells)
+            h3_r5 BIGINT,
+            h3_r7 BIGINT,
+            h3_r9 BIGINT
         );
+        CREATE INDEX idx_master_cell_total_h3_r5 ON master_cell_total (h3_r5);
+        CREATE INDEX idx_master_cell_total_h3_r7 ON master_cell_total (h3_r7);
+        CREATE INDEX idx_master_cell_total_h3_r9 ON master_cell_total (h3_r9);
     """
 
     try:
@@ -181,8 +190,15 @@ def create_table_master_node_total():
             longitude FLOAT,
             att_name TEXT,
             vendor TEXT,
-            period TEXT
+            period TEXT,
+            -- H3 cell ids (h3 extension, see insert_db_master_cell.update_h3_cells)
+            h3_r5 BIGINT,
+            h3_r7 BIGINT,
+            h3_r9 BIGINT
         );
+        CREATE INDEX idx_master_node_total_h3_r5 ON master_node_total (h3_r5);
+        CREATE INDEX idx_master_node_total_h3_r7 ON master_node_total (h3_r7);
+        CREATE INDEX idx_master_node_total_h3_r9 ON master_node_total (h3_r9);
     """
 
     try:
@@ -380,6 +396,34 @@ def create_table_master_node():
     except Exception as e:
         print(f"An error occurred while creating master_node: {e}")
 
+def create_table_data_watermark():
+    # Max loaded date per table/technology, written by the insert_db_* jobs (cell_change_evolution/data_watermark.py)
+    create_table_query = """
+        CREATE TABLE IF NOT EXISTS public.data_watermark (
+            table_name VARCHAR(255) NOT NULL,
+            technology VARCHAR(16) NOT NULL DEFAULT '',
+            max_date DATE NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (table_name, technology)
+        );
+    """
+    try:
+        conn = psycopg2.connect(
+            user=POSTGRES_USERNAME,
+            password=POSTGRES_PASSWORD,
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB
+        )
+        cursor = conn.cursor()
+        cursor.execute(create_table_query)
+        conn.commit()
+        print("Table 'data_watermark' created successfully.")
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"An error occurred while creating data_watermark: {e}")
+
 def get_last_date(table):
     # Replace these variables with your PostgreSQL credentials
     username = POSTGRES_USERNAME
@@ -451,6 +495,7 @@ def delete_newer_than(table, date):
         conn.commit()
 
         print(f"Records newer than {date} have been deleted from {table}.")
+        refresh_data_watermark(table)
 
         # Close the cursor and connection
         cursor.close()
@@ -494,6 +539,7 @@ def delete_all(table):
         conn.commit()
 
         print(f"Records have been deleted from {table}.")
+        refresh_data_watermark(table)
 
         # Close the cursor and connection
         cursor.close()
@@ -537,6 +583,7 @@ def truncate_table(table):
         conn.commit()
 
         print(f"Table '{table}' has been successfully truncated.")
+        refresh_data_watermark(table)
 
         # Clean up resources
         cursor.close()
@@ -0,0 +1,798 @@
+"""Synthetic national-scale dataset for offline benchmarking.
+
+Fills a local Postgres/PostGIS database with realistic-looking data in the production
+schemas: master_node_total, master_cell_total, umts/lte/nr_cqi_daily, volte_cqi_vendor_daily,
+umts/lte_cell_traffic_daily and the cell change tables (*_cell_traffic_period,
+*_cell_change_event). Rows are loaded with COPY into the columns those tables actually
+have; with --recreate the tables are first dropped and recreated with the create_table_*
+functions of create_db_*.py and cell_change_evolution/create_db_cell_change.py.
+
+--recreate and --create-database destroy data, so they are refused unless the run targets a
+separate database (SYNTHETIC_POSTGRES_DB, used instead of POSTGRES_DB by every step) or
+--yes confirms that POSTGRES_DB may be overwritten.
+
+The data set is a pure function of the parameters: the same --seed, --sites, --days,
+--end, --cells-per-site and --vendor-mix always produce the same rows.
+
+    SYNTHETIC_POSTGRES_DB=ran_synthetic PYTHONPATH=. \
+        python quality_assurance_code/generate_synthetic_data.py --sites 20000 --days 180 --end 2025-06-30 --recreate
+
+Model (enough for the selectors, caches and batch jobs to behave as on production data):
+    - sites cluster around municipality centers; every site has 4G, 3G except Samsung sites,
+      5G for part of the Ericsson/Nokia sites (the only NR vendor columns)
+    - one vendor per site, drawn from --vendor-mix; counters of other vendors are NULL
+    - bands come from freq_band.csv; each layer has one cell per sector
+    - a --change-rate fraction of sites gets a new 4G/5G layer during the window and a
+      smaller fraction loses its 3G layer; cell traffic, periods and change events follow
+    - daily counters scale with site load, active cells and weekday; composite quality
+      is computed from the counters with the CQI kernels
+"""
+import io
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+import dotenv
+import numpy as np
+import pandas as pd
+import psycopg2
+
+# Load environment variables; SYNTHETIC_POSTGRES_DB must be in place before the helpers
+# below read POSTGRES_DB at import time
+dotenv.load_dotenv()
+SYNTHETIC_POSTGRES_DB = os.getenv('SYNTHETIC_POSTGRES_DB')
+if SYNTHETIC_POSTGRES_DB:
+    os.environ['POSTGRES_DB'] = SYNTHETIC_POSTGRES_DB
+
+from cell_change_evolution.cqi_kernels import unified_cqi_lte, unified_cqi_nr, unified_cqi_umts
+from cell_change_evolution.create_db_cell_change import (
+    create_table_lte_cell_change_event,
+    create_table_lte_cell_traffic_period,
+    create_table_umts_cell_change_event,
+    create_table_umts_cell_traffic_period,
+)
+from cell_change_evolution.data_watermark import update_data_watermark
+from cell_change_evolution.db_pool import default_dsn, get_engine
+from create_db_lte_cqi import create_table_lte_cell_traffic_daily, create_table_lte_cqi_daily
+from create_db_nr_cqi import create_table_5g_cqi_daily
+from create_db_quality import (
+    create_db_quality_analytics,
+    create_table_data_watermark,
+    create_table_master_cell_total,
+    create_table_master_node_total,
+)
+from create_db_umts_cqi import create_table_3g_cqi_daily, create_table_umts_cell_traffic_daily
+from create_db_volte_cqi import create_table_volte_cqi_vendor_daily
+from insert_db_master_cell import refresh_master_node_neighbor, update_h3_cells
+from quality_metrics.create_db_quality_metrics import create_table_master_node_neighbor
+
+POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_DB = os.getenv('POSTGRES_DB')
+
+FREQ_BAND_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'freq_band.csv')
+
+# Vendor name (as in master tables) -> counter column prefix letter
+VENDOR_CODES = {'Huawei': 'h', 'Ericsson': 'e', 'Nokia': 'n', 'Samsung': 's'}
+DEFAULT_VENDOR_MIX = 'Huawei=0.35,Ericsson=0.30,Nokia=0.25,Samsung=0.10'
+# Vendors with columns per technology (no Samsung 3G, NR only Ericsson/Nokia)
+TECH_VENDORS = {'3g': ('h', 'e', 'n'), '4g': ('h', 'e', 'n', 's'), '5g': ('e', 'n')}
+# band_indicator -> change event column band (anything else is counted under x_*)
+CHANGE_BANDS = {
+    '3g': {'band_2_pcs': 'b2', 'band_4_aws': 'b4', 'band_5_850': 'b5'},
+    '4g': {'band_2_pcs': 'b2', 'band_4_aws': 'b4', 'band_5_850': 'b5', 'band_7_2600': 'b7',
+           'band_26_800': 'b26', 'band_42_3500': 'b42'},
+}
+# Bounding box the municipality centers are drawn in (lat, lon)
+BBOX = ((15.0, 32.0), (-117.0, -87.0))
+# Traffic by weekday (Monday first)
+WEEKDAY_FACTOR = np.array([1.0, 1.0, 1.0, 1.02, 1.05, 0.95, 0.88])
+# Days of data generated and loaded per COPY batch
+CHUNK_DAYS = 14
+# Fraction of sites with a change (layer added) inside the window, and with 3G removed
+DEFAULT_CHANGE_RATE = 0.05
+
+DAILY_TABLES = ('umts_cqi_daily', 'lte_cqi_daily', 'nr_cqi_daily', 'volte_cqi_vendor_daily',
+                'umts_cell_traffic_daily', 'lte_cell_traffic_daily')
+CHANGE_TABLES = ('umts_cell_traffic_period', 'lte_cell_traffic_period',
+                 'umts_cell_change_event', 'lte_cell_change_event')
+
+
+def create_connection():
+    try:
+        return psycopg2.connect(
+            user=POSTGRES_USERNAME,
+            password=POSTGRES_PASSWORD,
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB
+        )
+    except psycopg2.Error as e:
+        print(f"Error creating database connection: {e}")
+        return None
+
+
+def parse_vendor_mix(mix):
+    """'Huawei=0.4,Ericsson=0.6' -> (names, probabilities); unknown vendors raise ValueError."""
+    names, weights = [], []
+    for part in str(mix).split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip().capitalize()
+        if name not in VENDOR_CODES:
+            raise ValueError(f"Unknown vendor '{name}' (expected one of {', '.join(VENDOR_CODES)})")
+        names.append(name)
+        weights.append(float(weight or 1.0))
+    total = sum(weights)
+    if not names or total <= 0:
+        raise ValueError(f"Empty vendor mix: {mix!r}")
+    return names, [w / total for w in weights]
+
+
+def create_tables():
+    """Drop and recreate every generated table with the repository's create_table_* functions."""
+    create_table_master_cell_total()
+    create_table_master_node_total()
+    create_table_3g_cqi_daily()
+    create_table_umts_cell_traffic_daily()
+    create_table_lte_cqi_daily()
+    create_table_lte_cell_traffic_daily()
+    create_table_5g_cqi_daily()
+    create_table_volte_cqi_vendor_daily()
+    create_table_umts_cell_traffic_period()
+    create_table_lte_cell_traffic_period()
+    create_table_umts_cell_change_event()
+    create_table_lte_cell_change_event()
+    create_table_data_watermark()
+
+
+# ----- Sites, layers and cells -----
+def _band_catalogue():
+    """freq_band.csv rows usable as carriers (NB-IoT guard-band entries excluded), per technology."""
+    bands = pd.read_csv(FREQ_BAND_CSV, encoding='utf-8-sig')
+    bands = bands[pd.to_numeric(bands['band_width'], errors='coerce') >= 5].reset_index(drop=True)
+    return {tech: bands[bands['tech'] == tech].reset_index(drop=True) for tech in ('3g', '4g', '5g')}
+
+
+def build_sites(rng, n_sites, vendor_mix, n_regions=9, provinces_per_region=4, municipalities_per_province=6):
+    """
+    Sites clustered around municipality centers
+
+    Returns:
+        pd.DataFrame: att_name, region, province, municipality, latitude, longitude, vendor,
+        load (relative traffic), quality (failure-rate multiplier), has_3g, has_5g
+    """
+    (lat0, lat1), (lon0, lon1) = BBOX
+    areas = []
+    for r in range(1, n_regions + 1):
+        for p in range(1, provinces_per_region + 1):
+            for m in range(1, municipalities_per_province + 1):
+                areas.append((f"R{r:02d}", f"R{r:02d}-P{p:02d}", f"R{r:02d}-P{p:02d}-M{m:02d}"))
+    n_areas = len(areas)
+    centers_lat = rng.uniform(lat0, lat1, n_areas)
+    centers_lon = rng.uniform(lon0, lon1, n_areas)
+    # Zipf-like municipality sizes: a few large cities hold most sites
+    weights = 1.0 / np.arange(1, n_areas + 1) ** 0.9
+    rng.shuffle(weights)
+    weights /= weights.sum()
+    area = rng.choice(n_areas, size=n_sites, p=weights)
+    # Denser (smaller spread) in large municipalities: ~2 km to ~15 km
+    spread_km = np.interp(weights, (weights.min(), weights.max()), (15.0, 2.0))[area]
+    lat = centers_lat[area] + rng.normal(0, 1, n_sites) * spread_km / 111.0
+    lon = centers_lon[area] + rng.normal(0, 1, n_sites) * spread_km / (111.0 * np.cos(np.radians(centers_lat[area])))
+
+    names, probs = vendor_mix
+    vendor = np.asarray(names, dtype=object)[rng.choice(len(names), size=n_sites, p=probs)]
+    sites = pd.DataFrame({
+        'att_name': [f"SYN{i:06d}" for i in range(1, n_sites + 1)],
+        'region': [areas[a][0] for a in area],
+        'province': [areas[a][1] for a in area],
+        'municipality': [areas[a][2] for a in area],
+        'latitude': np.round(np.clip(lat, -90, 90), 6),
+        'longitude': np.round(lon, 6),
+        'vendor': vendor,
+        'load': rng.lognormal(0.0, 0.6, n_sites) * (1.0 + 2.0 * weights[area] / weights.max()),
+        'quality': rng.lognormal(0.0, 0.35, n_sites),
+    })
+    sites['has_3g'] = (sites['vendor'] != 'Samsung') & (rng.random(n_sites) < 0.75)
+    sites['has_5g'] = sites['vendor'].isin(['Ericsson', 'Nokia']) & (rng.random(n_sites) < 0.35)
+    return sites
+
+
+def build_layers(rng, sites, cells_per_site, n_days, change_rate):
+    """
+    One row per (site, technology, carrier); every layer has one cell per sector
+
+    init_day / end_day are day offsets inside the window (0 = first day); layers present
+    before the window start at 0, removed ones end before n_days - 1.
+
+    Returns:
+        pd.DataFrame: site, tech, band_indicator, band_width, dl, ul, sectors, init_day, end_day, layer
+    """
+    catalogue = _band_catalogue()
+    n_sites = len(sites)
+    sectors = np.where(rng.random(n_sites) < 0.1, 1, 3)
+    n_4g = np.maximum(1, np.round(cells_per_site / sectors - sites['has_3g'] - sites['has_5g']
+                                  + rng.normal(0, 0.7, n_sites))).astype(int)
+    n_4g = np.minimum(n_4g, len(catalogue['4g']))
+    margin = min(14, max(1, n_days // 4))
+    changed = rng.random(n_sites) < change_rate
+    removed = sites['has_3g'].to_numpy() & (rng.random(n_sites) < change_rate / 4)
+
+    rows = []
+    for i in range(n_sites):
+        def add(tech, band, init_day=0, end_day=n_days - 1):
+            rows.append((i, tech, band['band_indicator'], band['band_width'],
+                         band['uarfcn_dl'] if tech == '3g' else band['earfcn_dl'],
+                         band['uarfcn_ul'] if tech == '3g' else band['earfcn_ul'],
+                         sectors[i], init_day, end_day))
+
+        picks = rng.choice(len(catalogue['4g']), size=n_4g[i], replace=False)
+        for k in picks:
+            add('4g', catalogue['4g'].iloc[k])
+        if sites['has_3g'].iat[i]:
+            end_day = int(rng.integers(margin, n_days - margin)) - 1 if removed[i] and n_days > 2 * margin else n_days - 1
+            add('3g', catalogue['3g'].iloc[rng.integers(len(catalogue['3g']))], end_day=end_day)
+        if sites['has_5g'].iat[i]:
+            add('5g', catalogue['5g'].iloc[rng.integers(len(catalogue['5g']))])
+        if changed[i] and n_days > 2 * margin:
+            day = int(rng.integers(margin, n_days - margin))
+            spare = [k for k in range(len(catalogue['4g'])) if k not in set(picks)]
+            if sites['vendor'].iat[i] in ('Ericsson', 'Nokia') and not sites['has_5g'].iat[i] and rng.random() < 0.3:
+                add('5g', catalogue['5g'].iloc[rng.integers(len(catalogue['5g']))], init_day=day)
+            elif spare:
+                add('4g', catalogue['4g'].iloc[spare[rng.integers(len(spare))]], init_day=day)
+
+    layers = pd.DataFrame(rows, columns=['site', 'tech', 'band_indicator', 'band_width', 'dl', 'ul',
+                                         'sectors', 'init_day', 'end_day'])
+    layers['layer'] = layers.groupby(['site', 'tech']).cumcount() + 1
+    return layers
+
+
+def build_master_tables(sites, layers):
+    """
+    master_node_total / master_cell_total rows for the sites and layers
+
+    Returns:
+        tuple: (df_master_node_total, df_master_cell_total, df_cells); df_cells keeps the
+        per-cell site/layer keys used to generate cell traffic and periods
+    """
+    tech_suffix = {'3g': 'U', '4g': 'L', '5g': 'N'}
+    node_rows = []
+    for tech in ('3g', '4g', '5g'):
+        site_idx = np.unique(layers.loc[layers['tech'] == tech, 'site'])
+        s = sites.iloc[site_idx]
+        node_rows.append(pd.DataFrame({
+            'node': s['att_name'].to_numpy() + f"_{tech_suffix[tech]}",
+            'region': s['region'].to_numpy(),
+            'province': s['province'].to_numpy(),
+            'municipality': s['municipality'].to_numpy(),
+            'latitude': s['latitude'].to_numpy(),
+            'longitude': s['longitude'].to_numpy(),
+            'att_name': s['att_name'].to_numpy(),
+            'vendor': s['vendor'].to_numpy(),
+            'period': 'last',
+        }))
+    df_node = pd.concat(node_rows, ignore_index=True)
+
+    cells = layers.loc[layers.index.repeat(layers['sectors'])].reset_index(drop=True)
+    cells['sector'] = cells.groupby(['site', 'tech', 'layer']).cumcount() + 1
+    s = sites.iloc[cells['site'].to_numpy()].reset_index(drop=True)
+    suffix = cells['tech'].map(tech_suffix)
+    cells['cell_name'] = (s['att_name'] + '_' + cells['sector'].astype(str) + '_' + suffix
+                          + cells['layer'].astype(str))
+    cells['node_id'] = s['att_name'] + '_' + suffix
+    cells['vendor'] = s['vendor']
+    is_3g = (cells['tech'] == '3g').to_numpy()
+    region_no = s['region'].str[1:].astype(int).to_numpy()
+    df_cell = pd.DataFrame({
+        'region': s['region'],
+        'province': s['province'],
+        'municipality': s['municipality'],
+        'att_name': s['att_name'],
+        'att_tech': cells['tech'],
+        'node_id': cells['node_id'],
+        'cell_name': cells['cell_name'],
+        'physical_sector': cells['sector'].astype(str),
+        'rnc_name': np.where(is_3g, [f"RNC{r:02d}" for r in region_no], None),
+        'rnc_id': np.where(is_3g, region_no, np.nan),
+        'cell_id': np.arange(1, len(cells) + 1),
+        'vendor': cells['vendor'],
+        'dl_arfcn': np.where(is_3g, cells['dl'], np.nan),
+        'ul_arfcn': np.where(is_3g, cells['ul'], np.nan),
+        'earfcn_dl': np.where(is_3g, np.nan, cells['dl']),
+        'earfcn_ul': np.where(is_3g, np.nan, pd.to_numeric(cells['ul'], errors='coerce')),
+        'lac': np.where(is_3g, 1000 + cells['site'] // 200, np.nan),
+        'rac': np.where(is_3g, 1 + cells['site'] % 200, np.nan),
+        'tac': np.where(is_3g, np.nan, 20000 + cells['site'] // 200),
+        'freq_band': cells['band_indicator'].str.rsplit('_', n=1).str[-1],
+        'band_indicator': cells['band_indicator'],
+        'band_width': cells['band_width'].astype(str),
+        'latitude': s['latitude'],
+        'longitude': s['longitude'],
+        'azimuth': ((cells['sector'] - 1) * 120 + cells['site'] % 40) % 360,
+        'beam': 65.0,
+        # Removed cells only exist in the 'initial' snapshot
+        'period': np.where(cells['end_day'] < cells['end_day'].max(), 'initial', 'last'),
+    })
+    return df_node, df_cell, cells
+
+
+def build_change_tables(sites, cells, start):
+    """
+    *_cell_traffic_period and *_cell_change_event rows matching the generated cell traffic
+
+    Periods start on the first day with traffic (the window start for pre-existing cells) and
+    end on the last one for removed cells, as insert_db_*_cell_period derives them. One change
+    event is written per site and day where cells were added or removed; band columns count
+    added minus removed cells per band and vendor.
+
+    Returns:
+        dict: table name -> DataFrame
+    """
+    last_day = int(cells['end_day'].max())
+    out = {}
+    for tech, prefix in (('3g', 'umts'), ('4g', 'lte')):
+        c = cells[cells['tech'] == tech]
+        period = pd.DataFrame({
+            'cell': c['cell_name'],
+            'vendor': c['vendor'],
+            'init_date': [start + timedelta(days=int(d)) for d in c['init_day']],
+            'end_date': [start + timedelta(days=int(d)) if d < last_day else None for d in c['end_day']],
+            'period': 3,
+        })
+        out[f"{prefix}_cell_traffic_period"] = period
+
+        added = c[c['init_day'] > 0].assign(day=c['init_day'], delta=1)
+        deleted = c[c['end_day'] < last_day].assign(day=c['end_day'] + 1, delta=-1)
+        changes = pd.concat([added, deleted], ignore_index=True)
+        if changes.empty:
+            out[f"{prefix}_cell_change_event"] = pd.DataFrame()
+            continue
+        changes['band'] = changes['band_indicator'].map(CHANGE_BANDS[tech]).fillna('x')
+        changes['column'] = (changes['band'] + '_' + changes['vendor'].map(VENDOR_CODES) + tech)
+        keys = ['site', 'day']
+        events = changes.groupby(keys).agg(
+            add_cell=('delta', lambda d: int((d > 0).sum())),
+            delete_cell=('delta', lambda d: int((d < 0).sum())),
+        ).reset_index()
+        bands = changes.pivot_table(index=keys, columns='column', values='delta', aggfunc='sum', fill_value=0)
+        events = events.merge(bands.reset_index(), on=keys, how='left')
+        by_site = c.groupby('site').indices
+        init_day, end_day = c['init_day'].to_numpy(), c['end_day'].to_numpy()
+        events['total_cell'] = [
+            int(((init_day[by_site[s]] <= d) & (end_day[by_site[s]] >= d)).sum())
+            for s, d in zip(events['site'], events['day'])
+        ]
+        events['remark'] = np.where(events['add_cell'] > 0,
+                                    np.where(events['delete_cell'] > 0, 'swap', 'expansion'), 'decommission')
+        s = sites.iloc[events['site'].to_numpy()].reset_index(drop=True)
+        events.insert(0, 'region', s['region'])
+        events.insert(1, 'province', s['province'])
+        events.insert(2, 'municipality', s['municipality'])
+        events.insert(3, 'att_name', s['att_name'])
+        events.insert(4, 'date', [start + timedelta(days=int(d)) for d in events['day']])
+        out[f"{prefix}_cell_change_event"] = events.drop(columns=keys)
+    return out
+
+
+# ----- Daily counters -----
+def _active_cells(cells, tech, n_sites, day0, n):
+    """(sites x n days) count of active cells of `tech` for days day0 .. day0 + n - 1."""
+    c = cells[cells['tech'] == tech]
+    days = np.arange(day0, day0 + n)
+    active = (c['init_day'].to_numpy()[:, None] <= days) & (c['end_day'].to_numpy()[:, None] >= days)
+    counts = np.zeros((n_sites, n))
+    np.add.at(counts, c['site'].to_numpy(), active.astype(float))
+    return counts
+
+
+def _rows(sites, counts, base, day0, start, rng):
+    """Row keys for (site, day) pairs with active cells, and their relative load."""
+    site_idx, day_idx = np.nonzero(counts)
+    dates = np.array([start + timedelta(days=int(day0 + d)) for d in range(counts.shape[1])])
+    weekday = np.array([d.weekday() for d in dates])
+    load = (sites['load'].to_numpy()[site_idx]
+            * counts[site_idx, day_idx] / np.maximum(base[site_idx], 1)
+            * WEEKDAY_FACTOR[weekday[day_idx]]
+            * rng.lognormal(0.0, 0.12, len(site_idx)))
+    return site_idx, dates[day_idx], load
+
+
+def _fail(rng, base_rate, quality, spread=0.3):
+    """Failure rate per row: base_rate scaled by the site quality multiplier and daily noise."""
+    return np.clip(base_rate * quality * rng.lognormal(0.0, spread, len(quality)), 0.0, 0.5)
+
+
+def _vendor_columns(values, codes, tech, vendors):
+    """{prefix_field: column} with values on rows of that vendor and NULL elsewhere."""
+    out = {}
+    for field, column in values.items():
+        for v in vendors:
+            out[f"{v}{tech}_{field}"] = np.where(codes == v, column, np.nan)
+    return out
+
+
+def _site_columns(sites, site_idx, dates):
+    s = sites.iloc[site_idx]
+    return {
+        'date': dates,
+        'region': s['region'].to_numpy(),
+        'province': s['province'].to_numpy(),
+        'municipality': s['municipality'].to_numpy(),
+        'city': s['municipality'].to_numpy(),
+        'site_att': s['att_name'].to_numpy(),
+        'vendors': s['vendor'].to_numpy(),
+    }
+
+
+def lte_daily(rng, sites, site_idx, dates, load):
+    n = len(site_idx)
+    q = sites['quality'].to_numpy()[site_idx]
+    codes = sites['vendor'].map(VENDOR_CODES).to_numpy()[site_idx]
+    rrc_att = np.round(load * 40000)
+    rrc_ok = np.round(rrc_att * (1 - _fail(rng, 0.004, q)))
+    s1_att = np.round(rrc_ok * 0.97)
+    s1_ok = np.round(s1_att * (1 - _fail(rng, 0.002, q)))
+    erab_att = np.round(s1_ok * 1.08)
+    erab_ok = np.round(erab_att * (1 - _fail(rng, 0.003, q)))
+    ret_den = erab_ok
+    ret_num = np.round(ret_den * _fail(rng, 0.004, q))
+    irat = np.round(erab_ok * _fail(rng, 0.01, q))
+    thp_den = np.round(load * 20000)
+    thp_kbps = 18000 * rng.lognormal(0.0, 0.25, n) / np.sqrt(q)
+    time4g = np.round(load * 3.0e6)
+    p3g = _fail(rng, 0.03, q)
+    time3g = np.round(time4g * p3g / (1 - p3g))
+    samples = np.maximum(1, rng.poisson(np.maximum(load * 30, 1)))
+    latency = 30 * q ** 0.5 * rng.lognormal(0.0, 0.15, n)
+    ookla = 25000 * rng.lognormal(0.0, 0.3, n) / np.sqrt(q)
+    traffic = load * 45 * rng.lognormal(0.0, 0.1, n)
+
+    frame = {**_site_columns(sites, site_idx, dates), **_vendor_columns({
+        'rrc_success_all': rrc_ok, 'rrc_attemps_all': rrc_att,
+        's1_success': s1_ok, 's1_attemps': s1_att,
+        'erab_success': erab_ok, 'erabs_attemps': erab_att,
+        'retainability_num': ret_num, 'retainability_denom': ret_den,
+        'irat_4g_to_3g_events': irat, 'erab_succ_established': erab_ok,
+        'thpt_user_dl_kbps_num': np.round(thp_den * thp_kbps), 'thpt_user_dl_kbps_denom': thp_den,
+        'time3g': time3g, 'time4g': time4g,
+        'sumavg_latency': samples * latency, 'sumavg_dl_kbps': samples * ookla, 'summuestras': samples,
+        'traffic_d_user_ps_gb': traffic,
+    }, codes, '4g', TECH_VENDORS['4g'])}
+    acc = rrc_ok / rrc_att * s1_ok / s1_att * erab_ok / erab_att
+    frame.update({
+        'accessibility_ps': acc * 100, 'acc_failures': rrc_att - rrc_ok + s1_att - s1_ok + erab_att - erab_ok,
+        'retainability_ps': (1 - ret_num / ret_den) * 100, 'ret_failures': ret_num,
+        'irat_ps': irat / erab_ok * 100, 'irat_failures': irat,
+        'thpt_dl_kbps_ran_drb': thp_kbps, 'thpt_failures': np.round(thp_den * _fail(rng, 0.02, q)),
+        'ookla_latency': latency, 'latency_failures': np.round(samples * _fail(rng, 0.05, q)),
+        'ookla_thp': ookla, 'thpt_ookla_failures': np.round(samples * _fail(rng, 0.05, q)),
+        'f4gon3g': (1 - p3g) * 100, 'f4gon3g_failures': np.round(samples * p3g),
+        'traffic_dlul_tb': traffic * 1.12 / 1000,
+    })
+    df = pd.DataFrame(frame)
+    df['f4g_composite_quality'] = unified_cqi_lte(df)
+    return df
+
+
+def umts_daily(rng, sites, site_idx, dates, load):
+    n = len(site_idx)
+    q = sites['quality'].to_numpy()[site_idx]
+    codes = sites['vendor'].map(VENDOR_CODES).to_numpy()[site_idx]
+    values = {}
+    acc = {}
+    for domain, scale in (('cs', 6000), ('ps', 15000)):
+        att = np.round(load * scale)
+        ok = att
+        acc[domain] = np.ones(n)
+        for step, rate in (('rrc', 0.004), ('nas', 0.002), ('rab', 0.003)):
+            step_att = np.round(ok * 1.01)
+            step_ok = np.round(step_att * (1 - _fail(rng, rate, q)))
+            values[f"{step}_success_{domain}"] = step_ok
+            values[f"{step}_attempts_{domain}"] = step_att
+            acc[domain] *= step_ok / np.maximum(step_att, 1)
+            ok = step_ok
+    drop_den_cs = values['rab_success_cs']
+    drop_num_cs = np.round(drop_den_cs * _fail(rng, 0.005, q))
+    ps_den = values['rab_success_ps']
+    ps_num = np.round(ps_den * _fail(rng, 0.008, q))
+    thp_den = np.round(load * 8000)
+    thp_kbps = 2500 * rng.lognormal(0.0, 0.25, n) / np.sqrt(q)
+    voice = load * 35 * rng.lognormal(0.0, 0.1, n)
+    data = load * 4 * rng.lognormal(0.0, 0.15, n)
+    values.update({
+        'drop_num_cs': drop_num_cs, 'drop_denom_cs': drop_den_cs,
+        'ps_retainability_num': ps_num, 'ps_retainability_denom': ps_den,
+        'thpt_user_dl_kbps_num': np.round(thp_den * thp_kbps), 'thpt_user_dl_kbps_denom': thp_den,
+        'traffic_v_user_cs': voice, 'traffic_d_user_ps_gb': data,
+    })
+    frame = {**_site_columns(sites, site_idx, dates), **_vendor_columns(values, codes, '3g', TECH_VENDORS['3g'])}
+    frame.update({
+        'accessibility_cs': acc['cs'] * 100, 'acc_cs_failures': values['rrc_attempts_cs'] - values['rab_success_cs'],
+        'retainability_cs': (1 - drop_num_cs / np.maximum(drop_den_cs, 1)) * 100, 'ret_cs_failures': drop_num_cs,
+        'accessibility_ps': acc['ps'] * 100, 'acc_ps_failures': values['rrc_attempts_ps'] - values['rab_success_ps'],
+        'retainability_ps': (1 - ps_num / np.maximum(ps_den, 1)) * 100, 'ret_ps_failures': ps_num,
+        'traffic_voice': voice, 'throughput_dl': thp_kbps, 'thpt_failures': np.round(thp_den * _fail(rng, 0.03, q)),
+        'ps_gb_uldl': data * 1.15,
+    })
+    df = pd.DataFrame(frame)
+    df['umts_composite_quality'] = unified_cqi_umts(df)
+    return df
+
+
+def nr_daily(rng, sites, site_idx, dates, load):
+    n = len(site_idx)
+    q = sites['quality'].to_numpy()[site_idx]
+    codes = sites['vendor'].map(VENDOR_CODES).to_numpy()[site_idx]
+    rrc_den = np.round(load * 12000)
+    rrc_num = np.round(rrc_den * (1 - _fail(rng, 0.004, q)))
+    s1_den = rrc_num
+    s1_num = np.round(s1_den * (1 - _fail(rng, 0.002, q)))
+    erab4_den = s1_num
+    erab4_num = np.round(erab4_den * (1 - _fail(rng, 0.003, q)))
+    sn_att = np.round(erab4_num * 0.9)
+    sn_ok = np.round(sn_att * (1 - _fail(rng, 0.01, q)))
+    drop4_att = erab4_num
+    drop4 = np.round(drop4_att * _fail(rng, 0.004, q))
+    drop5_den = sn_ok
+    drop5 = np.round(drop5_den * _fail(rng, 0.01, q))
+    thp_den = np.round(load * 6000)
+    thp_mn = 20000 * rng.lognormal(0.0, 0.25, n) / np.sqrt(q)
+    thp_sn = 90000 * rng.lognormal(0.0, 0.3, n) / np.sqrt(q)
+    leg4 = load * 10 * rng.lognormal(0.0, 0.1, n)
+    leg5 = load * 25 * rng.lognormal(0.0, 0.15, n)
+
+    frame = {**_site_columns(sites, site_idx, dates), **_vendor_columns({
+        'acc_rrc_num_n': rrc_num, 'acc_rrc_den_n': rrc_den,
+        's1_sr_num_n': s1_num, 's1_sr_den_n': s1_den,
+        'nsa_acc_erab_sr_4gendc_num_n': erab4_num, 'nsa_acc_erab_sr_4gendc_den_n': erab4_den,
+        'nsa_acc_erab_succ_5gendc_5gleg_n': sn_ok, 'nsa_acc_erab_att_5gendc_5gleg_n': sn_att,
+        'nsa_ret_erab_drop_4gendc_n': drop4, 'nsa_ret_erab_att_4gendc_n': drop4_att,
+        'nsa_ret_erab_drop_5gendc_4g5gleg_num_n': drop5, 'nsa_ret_erab_drop_5gendc_4g5gleg_den_n': drop5_den,
+        'nsa_thp_mn_num': np.round(thp_den * thp_mn), 'nsa_thp_mn_den': thp_den,
+        'nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_num_n': np.round(thp_den * thp_sn),
+        'nsa_thpt_mac_dl_avg_mbps_5gendc_5gleg_denom_n': thp_den,
+        'nsa_traffic_pdcp_gb_5gendc_4glegn': leg4, 'nsa_traffic_pdcp_gb_5gendc_5gleg': leg5,
+        'nsa_traffic_mac_gb_5gendc_5gleg_n': leg5 * 1.03,
+    }, codes, '5g', TECH_VENDORS['5g'])}
+    # Combined KPIs (percent, Mbps) as delivered in the daily export
+    frame.update({
+        'acc_mn': rrc_num / rrc_den * s1_num / s1_den * erab4_num / erab4_den * 100,
+        'acc_sn': sn_ok / np.maximum(sn_att, 1) * 100,
+        'ret_mn': (1 - drop4 / np.maximum(drop4_att, 1)) * 100,
+        'endc_ret_tot': (1 - drop5 / np.maximum(drop5_den, 1)) * 100,
+        'thp_mn': thp_mn / 1000, 'thp_sn': thp_sn / 1000,
+        'traffic_4gleg_gb': leg4, 'traffic_5gleg_gb': leg5, 'traffic_mac_gb': leg5 * 1.03,
+    })
+    df = pd.DataFrame(frame)
+    df['nr_composite_quality'] = unified_cqi_nr(df)
+    return df
+
+
+def volte_daily(rng, sites, site_idx, dates, load):
+    n = len(site_idx)
+    q = sites['quality'].to_numpy()[site_idx]
+    codes = sites['vendor'].map(VENDOR_CODES).to_numpy()[site_idx]
+    acc = (1 - _fail(rng, 0.004, q)) * 100
+    drop1 = _fail(rng, 0.003, q) * 100
+    drop5 = _fail(rng, 0.002, q) * 100
+    srvcc = (1 - _fail(rng, 0.02, q)) * 100
+    cqi = np.clip(0.5 * np.exp(-(100 - acc) / 2) + 0.3 * np.exp(-drop1 / 1.5) + 0.2 * np.exp(-(100 - srvcc) / 10), 0, 1)
+    frame = {k: v for k, v in _site_columns(sites, site_idx, dates).items() if k not in ('city', 'vendors')}
+    for v in TECH_VENDORS['4g']:
+        mask = codes == v
+        frame.update({
+            f"volte_cqi_{v}": np.where(mask, cqi, np.nan),
+            f"acc_volte_{v}": np.where(mask, acc, np.nan),
+            f"erab_drop_qci1_{v}": np.where(mask, drop1, np.nan),
+            f"erab_drop_qci5_{v}": np.where(mask, drop5, np.nan),
+            f"srvcc_rate_{v}": np.where(mask, srvcc, np.nan),
+            f"user_traffic_volte_{v}": np.where(mask, load * 20 * rng.lognormal(0.0, 0.1, n), np.nan),
+        })
+    return pd.DataFrame(frame)
+
+
+def cell_traffic_daily(rng, cells, tech, site_frame, dates_index):
+    """Split each site's daily traffic over its active cells (fixed per-cell shares plus noise)."""
+    c = cells[cells['tech'] == tech]
+    if c.empty or site_frame.empty:
+        return pd.DataFrame()
+    prefix = {'3g': ('h3g', 'e3g', 'n3g'), '4g': ('h4g', 'e4g', 'n4g', 's4g')}[tech]
+    site_traffic = site_frame[[f"{p}_traffic_d_user_ps_gb" for p in prefix]].sum(axis=1, min_count=1)
+    keys = pd.DataFrame({'site_att': site_frame['site_att'].to_numpy(), 'date': site_frame['date'].to_numpy(),
+                         'site_data': site_traffic.to_numpy()})
+    if tech == '3g':
+        keys['site_voice'] = site_frame[[f"{p}_traffic_v_user_cs" for p in prefix]].sum(axis=1, min_count=1).to_numpy()
+    rows = c[['site_att', 'cell_name', 'vendor', 'init_day', 'end_day', 'share', 'aggregate']].merge(keys, on='site_att')
+    day = (pd.to_datetime(rows['date']) - dates_index).dt.days.to_numpy()
+    rows = rows[(rows['init_day'].to_numpy() <= day) & (rows['end_day'].to_numpy() >= day)]
+    # Shares renormalized over the cells active that day
+    active_share = rows.groupby(['site_att', 'date'])['share'].transform('sum')
+    weight = rows['share'] / active_share * rng.lognormal(0.0, 0.1, len(rows))
+    out = pd.DataFrame({
+        'date': rows['date'].to_numpy(),
+        'vendor': rows['vendor'].to_numpy(),
+        'rnc' if tech == '3g' else 'enb_agg': rows['aggregate'].to_numpy(),
+        'cell': rows['cell_name'].to_numpy(),
+    })
+    if tech == '3g':
+        out['traffic_v_user_cs'] = (rows['site_voice'] * weight).to_numpy()
+    out['traffic_d_user_ps_gb'] = (rows['site_data'] * weight).to_numpy()
+    return out
+
+
+# ----- Loading -----
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s",
+        (table,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def copy_frame(conn, table, df, columns_cache):
+    """COPY the frame's columns that exist in `table`; returns the number of rows loaded."""
+    if df is None or df.empty:
+        return 0
+    with conn.cursor() as cursor:
+        if table not in columns_cache:
+            columns_cache[table] = table_columns(cursor, table)
+        live = columns_cache[table]
+        if not live:
+            print(f"Error loading {table}: table does not exist")
+            return 0
+        cols = [c for c in df.columns if c in live]
+        skipped = [c for c in df.columns if c not in live]
+        if skipped and (table, 'skipped') not in columns_cache:
+            columns_cache[(table, 'skipped')] = True
+            print(f"{table}: columns not in the schema, not loaded: {', '.join(skipped)}")
+        buf = io.StringIO()
+        df[cols].to_csv(buf, index=False, header=False, na_rep='', float_format='%.10g')
+        buf.seek(0)
+        cursor.copy_expert(f"COPY public.{table} ({', '.join(cols)}) FROM STDIN WITH (FORMAT CSV)", buf)
+    conn.commit()
+    return len(df)
+
+
+def _elapsed(t0):
+    m, s = divmod(time.time() - t0, 60)
+    return f"{int(m)}m:{int(s)}s"
+
+
+def generate(n_sites=2000, days=90, end=None, cells_per_site=9, vendor_mix=DEFAULT_VENDOR_MIX,
+             change_rate=DEFAULT_CHANGE_RATE, seed=42, create=False, derived=False):
+    """
+    Generate and load the synthetic data set (create=True drops and recreates the tables first)
+
+    Returns:
+        dict: table name -> rows loaded, or None if the database is unreachable
+    """
+    end = end or (date.today() - timedelta(days=1))
+    start = end - timedelta(days=days - 1)
+    mix = parse_vendor_mix(vendor_mix)
+    rng = np.random.default_rng(seed)
+    print(f"Synthetic data: {n_sites} sites, {days} days ({start} .. {end}), seed {seed}")
+
+    if create:
+        print("\nStep 1: create tables")
+        t1 = time.time()
+        create_tables()
+        print(f"Completed in {_elapsed(t1)}")
+
+    print("\nStep 2: sites, cells and change events")
+    t2 = time.time()
+    sites = build_sites(rng, n_sites, mix)
+    layers = build_layers(rng, sites, cells_per_site, days, change_rate)
+    df_node, df_cell, cells = build_master_tables(sites, layers)
+    changes = build_change_tables(sites, cells, start)
+    cells['site_att'] = sites['att_name'].to_numpy()[cells['site'].to_numpy()]
+    cells['share'] = rng.uniform(0.5, 1.5, len(cells))
+    cells['aggregate'] = np.where(cells['tech'] == '3g', df_cell['rnc_name'], cells['node_id'])
+    print(f"{len(df_node)} nodes, {len(df_cell)} cells; Completed in {_elapsed(t2)}")
+
+    conn = create_connection()
+    if conn is None:
+        return None
+    loaded = {}
+    columns_cache = {}
+    try:
+        print("\nStep 3: load master and change tables")
+        t3 = time.time()
+        loaded['master_node_total'] = copy_frame(conn, 'master_node_total', df_node, columns_cache)
+        loaded['master_cell_total'] = copy_frame(conn, 'master_cell_total', df_cell, columns_cache)
+        for table, df in changes.items():
+            loaded[table] = copy_frame(conn, table, df, columns_cache)
+        print(f"Completed in {_elapsed(t3)}")
+
+        print("\nStep 4: daily KPI and cell traffic tables")
+        t4 = time.time()
+        base = {tech: _active_cells(cells, tech, n_sites, 0, 1)[:, 0] for tech in ('3g', '4g', '5g')}
+        builders = (('umts_cqi_daily', '3g', umts_daily), ('lte_cqi_daily', '4g', lte_daily),
+                    ('nr_cqi_daily', '5g', nr_daily), ('volte_cqi_vendor_daily', '4g', volte_daily))
+        dates_index = pd.Timestamp(start)
+        for chunk, day0 in enumerate(range(0, days, CHUNK_DAYS)):
+            n = min(CHUNK_DAYS, days - day0)
+            for table_no, (table, tech, builder) in enumerate(builders):
+                # One generator per (chunk, table): output does not depend on the order tables are built in
+                table_rng = np.random.default_rng([seed, chunk, table_no])
+                counts = _active_cells(cells, tech, n_sites, day0, n)
+                # Sites whose layer starts inside the window are scaled against their final size
+                tech_base = np.where(base[tech] > 0, base[tech], counts.max(axis=1))
+                site_idx, dates, load = _rows(sites, counts, tech_base, day0, start, table_rng)
+                df = builder(table_rng, sites, site_idx, dates, load)
+                loaded[table] = loaded.get(table, 0) + copy_frame(conn, table, df, columns_cache)
+                if tech in ('3g', '4g') and table != 'volte_cqi_vendor_daily':
+                    traffic_table = 'umts_cell_traffic_daily' if tech == '3g' else 'lte_cell_traffic_daily'
+                    cell_df = cell_traffic_daily(table_rng, cells, tech, df, dates_index)
+                    loaded[traffic_table] = loaded.get(traffic_table, 0) + copy_frame(conn, traffic_table, cell_df, columns_cache)
+            print(f"  {start + timedelta(days=day0 + n - 1)}: {sum(loaded.get(t, 0) for t in DAILY_TABLES)} daily rows")
+        print(f"Completed in {_elapsed(t4)}")
+    finally:
+        conn.close()
+
+    print("\nStep 5: data watermarks")
+    # Explicit DSN: a POSTGRES_DSN_<ROLE> must not send the watermarks to another database
+    engine = get_engine(dsn=default_dsn())
+    for table in ('master_node_total',) + DAILY_TABLES + CHANGE_TABLES:
+        update_data_watermark(table, engine=engine)
+
+    if derived:
+        # H3 cells and the neighbor index need the h3 / postgis extensions
+        print("\nStep 6: update_h3_cells, refresh_master_node_neighbor")
+        t6 = time.time()
+        update_h3_cells('master_cell_total')
+        update_h3_cells('master_node_total')
+        if create:
+            create_table_master_node_neighbor()
+        refresh_master_node_neighbor(full=True)
+        print(f"Completed in {_elapsed(t6)}")
+
+    print("\n===== Synthetic data generation completed =====")
+    for table, rows in loaded.items():
+        print(f"  {table}: {rows:,} rows")
+    return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the local database with a synthetic national-scale data set")
+    parser.add_argument("--sites", type=int, default=2000, help="Number of sites (att_name)")
+    parser.add_argument("--days", type=int, default=90, help="Days of daily data ending at --end")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last data date (default: yesterday)")
+    parser.add_argument("--cells-per-site", type=float, default=9, help="Average cells per site over all technologies")
+    parser.add_argument("--vendor-mix", default=DEFAULT_VENDOR_MIX, help=f"Vendor shares (default {DEFAULT_VENDOR_MIX})")
+    parser.add_argument("--change-rate", type=float, default=DEFAULT_CHANGE_RATE,
+                        help="Fraction of sites with a layer added inside the window")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--recreate", action="store_true",
+                        help="DROP and recreate the generated tables first (default: append to the existing ones)")
+    parser.add_argument("--create-database", action="store_true",
+                        help="DROP and recreate POSTGRES_DB with its extensions first (create_db_quality_analytics)")
+    parser.add_argument("--yes", action="store_true",
+                        help="Allow --recreate / --create-database on POSTGRES_DB when SYNTHETIC_POSTGRES_DB is not set")
+    parser.add_argument("--derived", action="store_true",
+                        help="Also fill the H3 columns and master_node_neighbor (needs h3 and postgis)")
+    args = parser.parse_args(argv)
+
+    if (args.recreate or args.create_database) and not SYNTHETIC_POSTGRES_DB and not args.yes:
+        print(f"Refusing to drop tables in POSTGRES_DB ({POSTGRES_DB}): set SYNTHETIC_POSTGRES_DB to a "
+              f"separate database or pass --yes")
+        return 2
+    print(f"Target database: {POSTGRES_DB}")
+    if args.create_database:
+        create_db_quality_analytics()
+    loaded = generate(
+        n_sites=args.sites, days=args.days, end=args.end, cells_per_site=args.cells_per_site,
+        vendor_mix=args.vendor_mix, change_rate=args.change_rate, seed=args.seed,
+        create=args.recreate, derived=args.derived,
+    )
+    return 0 if loaded is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
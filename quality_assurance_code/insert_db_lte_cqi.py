@@ -7,6 +7,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import dotenv
 import glob
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -129,6 +131,7 @@ def insert_lte_cqi_zip_files(last_date):
 
     # Set up SQLAlchemy engine
     engine = create_engine(connection_string)
+    loaded_max = None
 
     # Directory path for input files
     input_path = os.path.join(os.getenv('ROOT_DIRECTORY'), 'input', 'daily_lte_cqi_site')
@@ -161,6 +164,8 @@ def insert_lte_cqi_zip_files(last_date):
 
                     # Insert the DataFrame to PostgreSQL
                     df.to_sql('lte_cqi_daily', engine, if_exists='append', index=False)
+                    batch_max = df['date'].max()
+                    loaded_max = batch_max if loaded_max is None else max(loaded_max, batch_max)
                     print(f"Successfully inserted new data from {zip_file} for dates after {last_date}")
 
         except SQLAlchemyError as e:
@@ -170,5 +175,9 @@ def insert_lte_cqi_zip_files(last_date):
         except Exception as e:
             print(f"Error processing file {zip_file}: {e}")
 
+    # Advance the data watermark read by the API (get_max_date, evaluation cache)
+    if loaded_max is not None:
+        update_data_watermark('lte_cqi_daily', max_date=loaded_max, engine=engine)
+
     print("All data has been processed insert_lte_cqi_zip_files.")
 
@@ -6,6 +6,8 @@ import pandas as pd
 import dotenv
 import time
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -15,6 +17,11 @@ POSTGRES_HOST = os.getenv('POSTGRES_HOST')
 POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 POSTGRES_DB = os.getenv('POSTGRES_DB')
 
+# Standard neighbor radii (km) precomputed into master_node_neighbor
+NEIGHBOR_RADII_KM = (1, 3, 5, 10)
+# H3 resolutions stored as h3_r<N> BIGINT columns (avg. cell edge: r5 ~9.9 km, r7 ~1.4 km, r9 ~0.2 km)
+H3_RESOLUTIONS = (5, 7, 9)
+
 def cell_3gH(workdir):
     """
     Function to process MasterCells_3gH.csv, filter, rename columns, and apply transformations.
@@ -1043,10 +1050,211 @@ def insert_master_node_total(df_master_node):
                 )
             conn.commit()
             print("Data inserted successfully into master_node_total.")
+        # Site search indexes in the API reload when this watermark moves
+        update_data_watermark('master_node_total')
     except Exception as e:
         print(f"An error occurred during insertion to master_node_total: {e}")
 
 
+def refresh_master_node_neighbor(radii_km=NEIGHBOR_RADII_KM, full=False):
+    """
+    Refresh the precomputed master_node_neighbor index from master_node_total.
+
+    Every site gets its neighbors within max(radii_km) with the geodesic distance and the
+    smallest standard radius containing it. Unless `full` is set, only sites whose
+    coordinates changed since the last run (tracked in master_node_neighbor_state), and the
+    sites around their old and new positions, are recomputed.
+
+    Parameters:
+        radii_km (tuple): Standard radii in km (default: 1, 3, 5, 10)
+        full (bool): Rebuild the whole index instead of an incremental refresh
+    """
+    radii_km = sorted(float(r) for r in radii_km)
+    max_radius_m = radii_km[-1] * 1000
+    radius_case = "CASE " + " ".join(
+        f"WHEN d.distance_km <= {r} THEN {r}" for r in radii_km
+    ) + f" ELSE {radii_km[-1]} END"
+
+    statements = [
+        # Current coordinates per site (a site can span several nodes)
+        """
+        CREATE TEMP TABLE tmp_site_points ON COMMIT DROP AS
+        SELECT att_name,
+               ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography AS geog
+        FROM master_node_total
+        WHERE att_name IS NOT NULL
+          AND latitude IS NOT NULL
+          AND longitude IS NOT NULL;
+        CREATE INDEX ON tmp_site_points USING gist (geog);
+        CREATE INDEX ON tmp_site_points (att_name);
+        ANALYZE tmp_site_points;
+        """,
+        """
+        CREATE TEMP TABLE tmp_site_coords ON COMMIT DROP AS
+        SELECT att_name,
+               string_agg(DISTINCT latitude::text || ' ' || longitude::text, ';') AS coords_key
+        FROM master_node_total
+        WHERE att_name IS NOT NULL
+          AND latitude IS NOT NULL
+          AND longitude IS NOT NULL
+        GROUP BY att_name;
+        """,
+    ]
+    if full:
+        statements += [
+            "TRUNCATE master_node_neighbor, master_node_neighbor_state;",
+            """
+            CREATE TEMP TABLE tmp_changed ON COMMIT DROP AS
+            SELECT att_name FROM tmp_site_coords;
+            CREATE TEMP TABLE tmp_affected ON COMMIT DROP AS
+            SELECT att_name FROM tmp_changed;
+            """,
+        ]
+    else:
+        statements += [
+            # New, moved or removed sites
+            """
+            CREATE TEMP TABLE tmp_changed ON COMMIT DROP AS
+            SELECT COALESCE(c.att_name, s.att_name) AS att_name
+            FROM tmp_site_coords c
+            FULL OUTER JOIN master_node_neighbor_state s ON s.att_name = c.att_name
+            WHERE c.coords_key IS DISTINCT FROM s.coords_key;
+            """,
+            # Changed sites, their previous neighbors and every site now within range of them
+            f"""
+            CREATE TEMP TABLE tmp_affected ON COMMIT DROP AS
+            SELECT att_name FROM tmp_changed
+            UNION
+            SELECT n.att_name
+            FROM master_node_neighbor n
+            JOIN tmp_changed ch ON ch.att_name = n.neighbor_att_name
+            UNION
+            SELECT p.att_name
+            FROM tmp_site_points p
+            JOIN tmp_site_points c ON ST_DWithin(c.geog, p.geog, {max_radius_m})
+            JOIN tmp_changed ch ON ch.att_name = c.att_name;
+            """,
+            """
+            DELETE FROM master_node_neighbor
+            WHERE att_name IN (SELECT att_name FROM tmp_affected);
+            """,
+        ]
+    statements += [
+        f"""
+        INSERT INTO master_node_neighbor (att_name, neighbor_att_name, distance_km, radius_km)
+        SELECT d.att_name, d.neighbor_att_name, d.distance_km, {radius_case}
+        FROM (
+            SELECT c.att_name,
+                   m.att_name AS neighbor_att_name,
+                   MIN(ST_Distance(c.geog, m.geog)) / 1000.0 AS distance_km
+            FROM tmp_site_points c
+            JOIN tmp_affected a ON a.att_name = c.att_name
+            JOIN tmp_site_points m ON ST_DWithin(c.geog, m.geog, {max_radius_m})
+            WHERE m.att_name <> c.att_name
+            GROUP BY c.att_name, m.att_name
+        ) d;
+        """,
+        """
+        DELETE FROM master_node_neighbor_state
+        WHERE att_name NOT IN (SELECT att_name FROM tmp_site_coords);
+        """,
+        """
+        INSERT INTO master_node_neighbor_state (att_name, coords_key, refreshed_at)
+        SELECT c.att_name, c.coords_key, now()
+        FROM tmp_site_coords c
+        JOIN tmp_changed ch ON ch.att_name = c.att_name
+        ON CONFLICT (att_name) DO UPDATE SET
+            coords_key = EXCLUDED.coords_key,
+            refreshed_at = EXCLUDED.refreshed_at;
+        """,
+    ]
+
+    try:
+        with psycopg2.connect(
+            user=POSTGRES_USERNAME,
+            password=POSTGRES_PASSWORD,
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB
+        ) as conn, conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("SELECT count(*) FROM tmp_changed;")
+            changed = cursor.fetchone()[0]
+            cursor.execute("SELECT count(*) FROM tmp_affected;")
+            affected = cursor.fetchone()[0]
+            conn.commit()
+            print(f"master_node_neighbor refreshed: {changed} changed sites, {affected} sites recomputed (radii {radii_km} km).")
+        # Neighbor sets changed: bump the watermark so cached evaluations are recomputed
+        if changed:
+            update_data_watermark('master_node_neighbor')
+    except Exception as e:
+        print(f"An error occurred while refreshing master_node_neighbor: {e}")
+
+
+def update_h3_cells(table, resolutions=H3_RESOLUTIONS):
+    """
+    Compute the H3 cell ids of every row of master_node_total / master_cell_total.
+
+    Cells are computed in the database with the h3 extension (enabled by
+    create_db_quality.create_db_quality_analytics) and stored as BIGINT columns h3_r<N>,
+    so neighbor and area queries become integer index lookups. The columns and their
+    indexes are added when missing; only rows whose cell is missing or stale (moved
+    coordinates) are updated.
+
+    Parameters:
+        table (str): 'master_node_total' or 'master_cell_total'
+        resolutions (tuple): H3 resolutions to store (default: 5, 7, 9)
+    """
+    if table not in ('master_node_total', 'master_cell_total'):
+        print(f"Error updating H3 cells: unsupported table {table}")
+        return
+    columns = [f"h3_r{int(r)}" for r in resolutions]
+    cells = {
+        col: f"h3_lat_lng_to_cell(POINT(longitude, latitude), {int(r)})::bigint"
+        for col, r in zip(columns, resolutions)
+    }
+    statements = [f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} BIGINT;" for col in columns]
+    statements += [f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table} ({col});" for col in columns]
+
+    try:
+        with psycopg2.connect(
+            user=POSTGRES_USERNAME,
+            password=POSTGRES_PASSWORD,
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB
+        ) as conn, conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                f"""
+                UPDATE {table} SET
+                    {', '.join(f'{col} = {expr}' for col, expr in cells.items())}
+                WHERE latitude IS NOT NULL
+                  AND longitude IS NOT NULL
+                  AND ({' OR '.join(f'{col} IS DISTINCT FROM {expr}' for col, expr in cells.items())});
+                """
+            )
+            updated = cursor.rowcount
+            # Rows that lost their coordinates must not keep a stale cell
+            cursor.execute(
+                f"""
+                UPDATE {table} SET {', '.join(f'{col} = NULL' for col in columns)}
+                WHERE (latitude IS NULL OR longitude IS NULL)
+                  AND ({' OR '.join(f'{col} IS NOT NULL' for col in columns)});
+                """
+            )
+            updated += cursor.rowcount
+            conn.commit()
+            print(f"{table}: H3 cells updated for {updated} rows (resolutions {list(resolutions)}).")
+        # New columns/cells are picked up by the API's schema cache when the watermark moves
+        if updated and table == 'master_node_total':
+            update_data_watermark('master_node_total')
+    except Exception as e:
+        print(f"An error occurred while updating H3 cells of {table}: {e}")
+
+
 # -------------------------
 # MAIN CASCADE CONTROLLER
 # -------------------------
@@ -1092,6 +1300,21 @@ def process_master_cell():
     m5, s5 = divmod(elapsed5, 60)
     print(f"Completed in {int(m5)}m:{int(s5)}s")
 
+    print("\nStep 6: update_h3_cells")
+    t6 = time.time()
+    update_h3_cells('master_cell_total')
+    update_h3_cells('master_node_total')
+    elapsed6 = time.time() - t6
+    m6, s6 = divmod(elapsed6, 60)
+    print(f"Completed in {int(m6)}m:{int(s6)}s")
+
+    print("\nStep 7: refresh_master_node_neighbor")
+    t7 = time.time()
+    refresh_master_node_neighbor()
+    elapsed7 = time.time() - t7
+    m7, s7 = divmod(elapsed7, 60)
+    print(f"Completed in {int(m7)}m:{int(s7)}s")
+
     print("\n===== MASTER CELL Processing Completed =====")
     return
 
@@ -1170,5 +1393,20 @@ def process_master_cell_total():
     m3, s3 = divmod(elapsed3, 60)
     print(f"Completed in {int(m3)}m:{int(s3)}s")
 
+    print("\nStep 4: update_h3_cells")
+    t4 = time.time()
+    update_h3_cells('master_cell_total')
+    update_h3_cells('master_node_total')
+    elapsed4 = time.time() - t4
+    m4, s4 = divmod(elapsed4, 60)
+    print(f"Completed in {int(m4)}m:{int(s4)}s")
+
+    print("\nStep 5: refresh_master_node_neighbor")
+    t5 = time.time()
+    refresh_master_node_neighbor()
+    elapsed5 = time.time() - t5
+    m5, s5 = divmod(elapsed5, 60)
+    print(f"Completed in {int(m5)}m:{int(s5)}s")
+
     print("\n===== MASTER CELL TOTAL Processing Completed =====")
     return
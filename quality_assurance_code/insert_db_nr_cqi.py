@@ -7,6 +7,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import dotenv
 import glob
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -89,6 +91,7 @@ def insert_nr_cqi_zip_files(last_date):
 
     # Set up SQLAlchemy engine
     engine = create_engine(connection_string)
+    loaded_max = None
 
     # Directory path for input files
     input_path = os.path.join(os.getenv('ROOT_DIRECTORY'), 'input', 'daily_5g_cqi_site')
@@ -121,6 +124,8 @@ def insert_nr_cqi_zip_files(last_date):
 
                     # Insert the DataFrame to PostgreSQL
                     df.to_sql('nr_cqi_daily', engine, if_exists='append', index=False)
+                    batch_max = df['date'].max()
+                    loaded_max = batch_max if loaded_max is None else max(loaded_max, batch_max)
                     print(f"Successfully inserted new data from {zip_file} for dates after {last_date}")
 
         except SQLAlchemyError as e:
@@ -130,4 +135,8 @@ def insert_nr_cqi_zip_files(last_date):
         except Exception as e:
             print(f"Error processing file {zip_file}: {e}")
 
+    # Advance the data watermark read by the API (get_max_date, evaluation cache)
+    if loaded_max is not None:
+        update_data_watermark('nr_cqi_daily', max_date=loaded_max, engine=engine)
+
     print("All data has been processed insert_nr_cqi_zip_files.")
\ No newline at end of file
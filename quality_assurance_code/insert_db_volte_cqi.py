@@ -7,6 +7,8 @@ from sqlalchemy import create_engine
 import os
 import dotenv
 
+from cell_change_evolution.data_watermark import update_data_watermark
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -347,6 +349,10 @@ def insert_volte_cqi_vendor_daily(last_date):
             print(f"Chunk {i}/{num_chunks} inserted ({len(chunk_df)} rows).")
 
         print("All data successfully inserted into PostgreSQL table `volte_cqi_vendor_daily`.")
+
+        # Advance the data watermark read by the API (get_max_date, evaluation cache)
+        if total_rows:
+            update_data_watermark('volte_cqi_vendor_daily', max_date=pd.to_datetime(merged_df['date']).max(), engine=engine)
     except Exception as e:
         print(f"Error inserting data into the database: {e}")
     finally:
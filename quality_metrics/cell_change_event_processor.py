@@ -1,9 +1,10 @@
 import pandas as pd
 import os
 import dotenv
-from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
@@ -15,7 +16,7 @@ POSTGRES_DB = os.getenv('POSTGRES_DB')
 def get_engine():
     """Create database engine connection"""
     connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 def get_cell_change_events(site_att):
     """
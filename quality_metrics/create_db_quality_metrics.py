@@ -1,9 +1,11 @@
 import psycopg2
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import os
 import dotenv
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -16,7 +18,7 @@ POSTGRES_DB = os.getenv('POSTGRES_DB')
 # Create database engine
 def get_engine():
     connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 def create_table_umts_cqi_metrics_daily():
     engine = get_engine()
@@ -231,31 +233,51 @@ def create_table_nr_cqi_metrics_daily():
 
 
 def create_table_master_node_neighbor():
-    """Create the master_node_neighbor table if it doesn't exist."""
+    """Create the master_node_neighbor index and its coordinate snapshot table.
+
+    master_node_neighbor holds one row per (site, neighbor) within the largest standard
+    radius, with the geodesic distance and the smallest standard radius (1/3/5/10 km)
+    that contains it. master_node_neighbor_state records the coordinates each site was
+    indexed with so insert_db_master_cell can refresh only the sites that moved.
+    """
     engine = get_engine()
     
     create_table_query = """
         DROP TABLE IF EXISTS public.master_node_neighbor;
         CREATE TABLE public.master_node_neighbor
         (
-            region text COLLATE pg_catalog."default",
-            province text COLLATE pg_catalog."default",
-            municipality text COLLATE pg_catalog."default",
-            att_name text COLLATE pg_catalog."default",
-            neighbor_count integer,
-            site_neighbor_list text COLLATE pg_catalog."default"
+            att_name text COLLATE pg_catalog."default" NOT NULL,
+            neighbor_att_name text COLLATE pg_catalog."default" NOT NULL,
+            distance_km double precision NOT NULL,
+            radius_km real NOT NULL,
+            PRIMARY KEY (att_name, neighbor_att_name)
         )
         TABLESPACE pg_default;
+
+        CREATE INDEX IF NOT EXISTS idx_master_node_neighbor_att_distance
+            ON public.master_node_neighbor (att_name, distance_km);
         
         ALTER TABLE IF EXISTS public.master_node_neighbor
             OWNER to postgres;
+
+        DROP TABLE IF EXISTS public.master_node_neighbor_state;
+        CREATE TABLE public.master_node_neighbor_state
+        (
+            att_name text COLLATE pg_catalog."default" PRIMARY KEY,
+            coords_key text COLLATE pg_catalog."default",
+            refreshed_at timestamp without time zone DEFAULT now()
+        )
+        TABLESPACE pg_default;
+
+        ALTER TABLE IF EXISTS public.master_node_neighbor_state
+            OWNER to postgres;
     """
 
     try:
         with engine.connect() as conn:
             conn.execute(text(create_table_query))
             conn.commit()
-        print("Table 'master_node_neighbor' created successfully.")
+        print("Tables 'master_node_neighbor' and 'master_node_neighbor_state' created successfully.")
 
     except SQLAlchemyError as e:
         print(f"Error creating table: {e}")
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timedelta
 import os
@@ -14,6 +14,8 @@ from io import StringIO
 from master_node_neighbor_processor import get_master_node_neighbor
 from lte_cqi_site_group_processor import get_lte_cqi_for_site_group
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -25,7 +27,7 @@ POSTGRES_DB = os.getenv('POSTGRES_DB')
 
 def get_engine():
     connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 def calculate_period_average(site_att, start_date, end_date):
     """
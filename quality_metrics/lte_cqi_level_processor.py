@@ -2,9 +2,12 @@ import pandas as pd
 import numpy as np
 import os
 import dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+from cell_change_evolution.cqi_kernels import lte_cqi_score
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv("POSTGRES_USERNAME")
@@ -34,7 +37,7 @@ def get_engine():
         raise ValueError(f"POSTGRES_PORT must be a valid integer, got: {POSTGRES_PORT}")
     
     connection_string = f"postgresql+psycopg2://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 
 def populate_lte_cqi_metrics_daily(min_date, max_date):
@@ -375,14 +378,14 @@ def apply_lte_calculations(df, level_config):
     new_columns['lte_traff'] = np.round(traffic_total / 1024, 8)
     
     # Calculate total LTE CQI (all vendors) - vectorized
-    new_columns['lte_cqi'] = np.round(
-        (0.25 * np.exp((1 - new_columns['lte_acc'] / 100) * -63.91668575) +
-         0.25 * np.exp((1 - new_columns['lte_ret'] / 100) * -63.91668575) +
-         0.05 * np.exp((new_columns['lte_irat'] / 100) * -22.31435513) +
-         0.30 * (1 - np.exp(new_columns['lte_thp_user_dl'] * -0.000282742)) +
-         0.05 * np.minimum(1, np.exp((new_columns['lte_4g_on_3g'] / 100 - 10 / 100) * -11.15717757)) +
-         0.05 * np.exp((new_columns['lte_ookla_lat'] - 20) * -0.00526802578289131) +
-         0.05 * (1 - np.exp(new_columns['lte_ookla_thp'] * -0.00005364793041447))) * 100, 8)
+    new_columns['lte_cqi'] = np.round(lte_cqi_score(
+        new_columns['lte_acc'] / 100,
+        new_columns['lte_ret'] / 100,
+        new_columns['lte_irat'] / 100,
+        new_columns['lte_thp_user_dl'],
+        new_columns['lte_4g_on_3g'] / 100,
+        new_columns['lte_ookla_lat'],
+        new_columns['lte_ookla_thp']) * 100, 8)
     
     # Huawei-specific metrics
     new_columns['lte_acc_h'] = np.round(
@@ -410,14 +413,14 @@ def apply_lte_calculations(df, level_config):
     
     new_columns['lte_traff_h'] = np.round(df['h4g_traffic_d_user_ps_gb'] / 1024, 8)
     
-    new_columns['lte_cqi_h'] = np.round(
-        (0.25 * np.exp((1 - new_columns['lte_acc_h'] / 100) * -63.91668575) +
-         0.25 * np.exp((1 - new_columns['lte_ret_h'] / 100) * -63.91668575) +
-         0.05 * np.exp((new_columns['lte_irat_h'] / 100) * -22.31435513) +
-         0.30 * (1 - np.exp(new_columns['lte_thp_user_dl_h'] * -0.000282742)) +
-         0.05 * np.minimum(1, np.exp((new_columns['lte_4g_on_3g_h'] / 100 - 10 / 100) * -11.15717757)) +
-         0.05 * np.exp((new_columns['lte_ookla_lat_h'] - 20) * -0.00526802578289131) +
-         0.05 * (1 - np.exp(new_columns['lte_ookla_thp_h'] * -0.00005364793041447))) * 100, 8)
+    new_columns['lte_cqi_h'] = np.round(lte_cqi_score(
+        new_columns['lte_acc_h'] / 100,
+        new_columns['lte_ret_h'] / 100,
+        new_columns['lte_irat_h'] / 100,
+        new_columns['lte_thp_user_dl_h'],
+        new_columns['lte_4g_on_3g_h'] / 100,
+        new_columns['lte_ookla_lat_h'],
+        new_columns['lte_ookla_thp_h']) * 100, 8)
     
     # Ericsson-specific metrics
     new_columns['lte_acc_e'] = np.round(
@@ -445,14 +448,14 @@ def apply_lte_calculations(df, level_config):
     
     new_columns['lte_traff_e'] = np.round(df['e4g_traffic_d_user_ps_gb'] / 1024, 8)
     
-    new_columns['lte_cqi_e'] = np.round(
-        (0.25 * np.exp((1 - new_columns['lte_acc_e'] / 100) * -63.91668575) +
-         0.25 * np.exp((1 - new_columns['lte_ret_e'] / 100) * -63.91668575) +
-         0.05 * np.exp((new_columns['lte_irat_e'] / 100) * -22.31435513) +
-         0.30 * (1 - np.exp(new_columns['lte_thp_user_dl_e'] * -0.000282742)) +
-         0.05 * np.minimum(1, np.exp((new_columns['lte_4g_on_3g_e'] / 100 - 10 / 100) * -11.15717757)) +
-         0.05 * np.exp((new_columns['lte_ookla_lat_e'] - 20) * -0.00526802578289131) +
-         0.05 * (1 - np.exp(new_columns['lte_ookla_thp_e'] * -0.00005364793041447))) * 100, 8)
+    new_columns['lte_cqi_e'] = np.round(lte_cqi_score(
+        new_columns['lte_acc_e'] / 100,
+        new_columns['lte_ret_e'] / 100,
+        new_columns['lte_irat_e'] / 100,
+        new_columns['lte_thp_user_dl_e'],
+        new_columns['lte_4g_on_3g_e'] / 100,
+        new_columns['lte_ookla_lat_e'],
+        new_columns['lte_ookla_thp_e']) * 100, 8)
     
     # Nokia-specific metrics
     new_columns['lte_acc_n'] = np.round(
@@ -480,14 +483,14 @@ def apply_lte_calculations(df, level_config):
     
     new_columns['lte_traff_n'] = np.round(df['n4g_traffic_d_user_ps_gb'] / 1024, 8)
     
-    new_columns['lte_cqi_n'] = np.round(
-        (0.25 * np.exp((1 - new_columns['lte_acc_n'] / 100) * -63.91668575) +
-         0.25 * np.exp((1 - new_columns['lte_ret_n'] / 100) * -63.91668575) +
-         0.05 * np.exp((new_columns['lte_irat_n'] / 100) * -22.31435513) +
-         0.30 * (1 - np.exp(new_columns['lte_thp_user_dl_n'] * -0.000282742)) +
-         0.05 * np.minimum(1, np.exp((new_columns['lte_4g_on_3g_n'] / 100 - 10 / 100) * -11.15717757)) +
-         0.05 * np.exp((new_columns['lte_ookla_lat_n'] - 20) * -0.00526802578289131) +
-         0.05 * (1 - np.exp(new_columns['lte_ookla_thp_n'] * -0.00005364793041447))) * 100, 8)
+    new_columns['lte_cqi_n'] = np.round(lte_cqi_score(
+        new_columns['lte_acc_n'] / 100,
+        new_columns['lte_ret_n'] / 100,
+        new_columns['lte_irat_n'] / 100,
+        new_columns['lte_thp_user_dl_n'],
+        new_columns['lte_4g_on_3g_n'] / 100,
+        new_columns['lte_ookla_lat_n'],
+        new_columns['lte_ookla_thp_n']) * 100, 8)
     
     # Samsung-specific metrics
     new_columns['lte_acc_s'] = np.round(
@@ -515,14 +518,14 @@ def apply_lte_calculations(df, level_config):
     
     new_columns['lte_traff_s'] = np.round(df['s4g_traffic_d_user_ps_gb'] / 1024, 8)
     
-    new_columns['lte_cqi_s'] = np.round(
-        (0.25 * np.exp((1 - new_columns['lte_acc_s'] / 100) * -63.91668575) +
-         0.25 * np.exp((1 - new_columns['lte_ret_s'] / 100) * -63.91668575) +
-         0.05 * np.exp((new_columns['lte_irat_s'] / 100) * -22.31435513) +
-         0.30 * (1 - np.exp(new_columns['lte_thp_user_dl_s'] * -0.000282742)) +
-         0.05 * np.minimum(1, np.exp((new_columns['lte_4g_on_3g_s'] / 100 - 10 / 100) * -11.15717757)) +
-         0.05 * np.exp((new_columns['lte_ookla_lat_s'] - 20) * -0.00526802578289131) +
-         0.05 * (1 - np.exp(new_columns['lte_ookla_thp_s'] * -0.00005364793041447))) * 100, 8)
+    new_columns['lte_cqi_s'] = np.round(lte_cqi_score(
+        new_columns['lte_acc_s'] / 100,
+        new_columns['lte_ret_s'] / 100,
+        new_columns['lte_irat_s'] / 100,
+        new_columns['lte_thp_user_dl_s'],
+        new_columns['lte_4g_on_3g_s'] / 100,
+        new_columns['lte_ookla_lat_s'],
+        new_columns['lte_ookla_thp_s']) * 100, 8)
     
     # CREATE DATAFRAME FROM DICTIONARY AND CONCATENATE - THIS AVOIDS FRAGMENTATION
     new_columns_df = pd.DataFrame(new_columns)
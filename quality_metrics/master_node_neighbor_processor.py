@@ -1,9 +1,11 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import os
 import dotenv
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 ROOT_DIRECTORY = os.getenv('ROOT_DIRECTORY')
@@ -15,7 +17,7 @@ POSTGRES_DB = os.getenv('POSTGRES_DB')
 
 def get_engine():
     connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 def get_master_node_list_neighbor(site_list, radius_km=5):
     """
@@ -3,9 +3,10 @@ import plotly.graph_objects as go
 import plotly.io as pio
 import os
 import dotenv
-from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv('POSTGRES_USERNAME')
@@ -20,7 +21,7 @@ pio.renderers.default = "browser"
 def get_engine():
     """Create database engine connection"""
     connection_string = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 # BLOCK 1: SQL FUNCTION
 def query_sites_within_radius(site_att, radius=5):
@@ -2,9 +2,12 @@ import pandas as pd
 import numpy as np
 import os
 import dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+from cell_change_evolution.cqi_kernels import nr_cqi_score
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv("POSTGRES_USERNAME")
@@ -34,7 +37,7 @@ def get_engine():
         raise ValueError(f"POSTGRES_PORT must be a valid integer, got: {POSTGRES_PORT}")
     
     connection_string = f"postgresql+psycopg2://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 
 def populate_nr_cqi_metrics_daily(min_date, max_date):
@@ -336,13 +339,13 @@ def apply_nr_calculations(df, level_config):
     # W1*EXP((1-Acc Mn)*C1)+W2*EXP((1-Acc SN)*C2)+W3*EXP((1-Ret MN)*C3)+W4*EXP((1-Endc Ret Tot)*C4)+W5*(1-EXP(Thp MN*1000*C5))+W6*(1-EXP(Thp SN*1000*C6))
     # Weights: Acc MN 17%, Acc SN 13%, Ret MN 17%, ENDC Ret Tot 13%, Thp MN 20%, Thp SN 20%
     # C coefficients validated to match production system (difference <0.1%)
-    new_columns['nr_cqi'] = np.round(
-        (0.17 * np.exp((1 - new_columns['nr_acc_mn'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_acc_sn'] / 100) * -26.68090256) +
-         0.17 * np.exp((1 - new_columns['nr_ret_mn'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_endc_ret_tot'] / 100) * -26.68090256) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_mn'] * 1000 * -0.0002006621)) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_sn'] * 1000 * -0.0002006621))) * 100, 8)
+    new_columns['nr_cqi'] = np.round(nr_cqi_score(
+        new_columns['nr_acc_mn'] / 100,
+        new_columns['nr_acc_sn'] / 100,
+        new_columns['nr_ret_mn'] / 100,
+        new_columns['nr_endc_ret_tot'] / 100,
+        new_columns['nr_thp_mn'] * 1000,
+        new_columns['nr_thp_sn'] * 1000) * 100, 8)
     
     # Ericsson-specific metrics
     new_columns['nr_acc_mn_e'] = np.round(
@@ -366,13 +369,13 @@ def apply_nr_calculations(df, level_config):
     new_columns['nr_traffic_5gleg_gb_e'] = np.round(df['e5g_nsa_traffic_pdcp_gb_5gendc_5gleg'], 4)
     new_columns['nr_traffic_mac_gb_e'] = np.round(df['e5g_nsa_traffic_mac_gb_5gendc_5gleg_n'], 4)
     
-    new_columns['nr_cqi_e'] = np.round(
-        (0.17 * np.exp((1 - new_columns['nr_acc_mn_e'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_acc_sn_e'] / 100) * -26.68090256) +
-         0.17 * np.exp((1 - new_columns['nr_ret_mn_e'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_endc_ret_tot_e'] / 100) * -26.68090256) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_mn_e'] * 1000 * -0.0002006621)) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_sn_e'] * 1000 * -0.0002006621))) * 100, 8)
+    new_columns['nr_cqi_e'] = np.round(nr_cqi_score(
+        new_columns['nr_acc_mn_e'] / 100,
+        new_columns['nr_acc_sn_e'] / 100,
+        new_columns['nr_ret_mn_e'] / 100,
+        new_columns['nr_endc_ret_tot_e'] / 100,
+        new_columns['nr_thp_mn_e'] * 1000,
+        new_columns['nr_thp_sn_e'] * 1000) * 100, 8)
     
     # Nokia-specific metrics
     new_columns['nr_acc_mn_n'] = np.round(
@@ -396,13 +399,13 @@ def apply_nr_calculations(df, level_config):
     new_columns['nr_traffic_5gleg_gb_n'] = np.round(df['n5g_nsa_traffic_pdcp_gb_5gendc_5gleg'], 4)
     new_columns['nr_traffic_mac_gb_n'] = np.round(df['n5g_nsa_traffic_mac_gb_5gendc_5gleg_n'], 4)
     
-    new_columns['nr_cqi_n'] = np.round(
-        (0.17 * np.exp((1 - new_columns['nr_acc_mn_n'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_acc_sn_n'] / 100) * -26.68090256) +
-         0.17 * np.exp((1 - new_columns['nr_ret_mn_n'] / 100) * -14.92648157) +
-         0.13 * np.exp((1 - new_columns['nr_endc_ret_tot_n'] / 100) * -26.68090256) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_mn_n'] * 1000 * -0.0002006621)) +
-         0.20 * (1 - np.exp(new_columns['nr_thp_sn_n'] * 1000 * -0.0002006621))) * 100, 8)
+    new_columns['nr_cqi_n'] = np.round(nr_cqi_score(
+        new_columns['nr_acc_mn_n'] / 100,
+        new_columns['nr_acc_sn_n'] / 100,
+        new_columns['nr_ret_mn_n'] / 100,
+        new_columns['nr_endc_ret_tot_n'] / 100,
+        new_columns['nr_thp_mn_n'] * 1000,
+        new_columns['nr_thp_sn_n'] * 1000) * 100, 8)
     
     # Create new DataFrame with calculated columns using pd.concat() to avoid fragmentation
     new_df = pd.DataFrame(new_columns, index=df.index)
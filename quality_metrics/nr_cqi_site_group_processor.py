@@ -2,9 +2,11 @@ import pandas as pd
 import numpy as np
 import os
 import dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv("POSTGRES_USERNAME")
@@ -35,7 +37,7 @@ def get_engine():
         raise ValueError(f"POSTGRES_PORT must be a valid integer, got: {POSTGRES_PORT}")
     
     connection_string = f"postgresql+psycopg2://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 
 def get_daily_aggregated_data_for_group(site_list, min_date, max_date, engine):
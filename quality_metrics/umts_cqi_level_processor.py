@@ -2,9 +2,12 @@ import pandas as pd
 import numpy as np
 import os
 import dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
+from cell_change_evolution.db_pool import get_engine as get_pooled_engine
+from cell_change_evolution.cqi_kernels import umts_cqi_score
+
 # Load environment variables
 dotenv.load_dotenv()
 POSTGRES_USERNAME = os.getenv("POSTGRES_USERNAME")
@@ -34,7 +37,7 @@ def get_engine():
         raise ValueError(f"POSTGRES_PORT must be a valid integer, got: {POSTGRES_PORT}")
     
     connection_string = f"postgresql+psycopg2://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    return create_engine(connection_string)
+    return get_pooled_engine(role='batch', dsn=connection_string)
 
 
 def populate_umts_cqi_metrics_daily(min_date, max_date):
@@ -307,12 +310,12 @@ def apply_umts_calculations(df, level_config):
     new_columns['umts_traff_voice'] = np.round(traffic_voice_total, 4)
     new_columns['umts_traff_data'] = np.round(traffic_data_total, 4)
     
-    new_columns['umts_cqi'] = np.round(
-        (0.25 * np.exp((1 - new_columns['umts_acc_cs'] / 100) * -58.11779571) +
-         0.25 * np.exp((1 - new_columns['umts_ret_cs'] / 100) * -58.11779571) +
-         0.15 * np.exp((1 - new_columns['umts_acc_ps'] / 100) * -28.62016873) +
-         0.15 * np.exp((1 - new_columns['umts_ret_ps'] / 100) * -28.62016873) +
-         0.20 * (1 - np.exp(new_columns['umts_thp_dl'] * -0.00094856))) * 100, 8)
+    new_columns['umts_cqi'] = np.round(umts_cqi_score(
+        new_columns['umts_acc_cs'] / 100,
+        new_columns['umts_ret_cs'] / 100,
+        new_columns['umts_acc_ps'] / 100,
+        new_columns['umts_ret_ps'] / 100,
+        new_columns['umts_thp_dl']) * 100, 8)
     
     # Huawei-specific metrics
     new_columns['umts_acc_cs_h'] = np.round(
@@ -337,12 +340,12 @@ def apply_umts_calculations(df, level_config):
     new_columns['umts_traff_voice_h'] = np.round(df['h3g_traffic_v_user_cs'], 4)
     new_columns['umts_traff_data_h'] = np.round(df['h3g_traffic_d_user_ps_gb'], 4)
     
-    new_columns['umts_cqi_h'] = np.round(
-        (0.25 * np.exp((1 - new_columns['umts_acc_cs_h'] / 100) * -58.11779571) +
-         0.25 * np.exp((1 - new_columns['umts_ret_cs_h'] / 100) * -58.11779571) +
-         0.15 * np.exp((1 - new_columns['umts_acc_ps_h'] / 100) * -28.62016873) +
-         0.15 * np.exp((1 - new_columns['umts_ret_ps_h'] / 100) * -28.62016873) +
-         0.20 * (1 - np.exp(new_columns['umts_thp_dl_h'] * -0.00094856))) * 100, 8)
+    new_columns['umts_cqi_h'] = np.round(umts_cqi_score(
+        new_columns['umts_acc_cs_h'] / 100,
+        new_columns['umts_ret_cs_h'] / 100,
+        new_columns['umts_acc_ps_h'] / 100,
+        new_columns['umts_ret_ps_h'] / 100,
+        new_columns['umts_thp_dl_h']) * 100, 8)
     
     # Ericsson-specific metrics
     new_columns['umts_acc_cs_e'] = np.round(
@@ -367,12 +370,12 @@ def apply_umts_calculations(df, level_config):
     new_columns['umts_traff_voice_e'] = np.round(df['e3g_traffic_v_user_cs'], 4)
     new_columns['umts_traff_data_e'] = np.round(df['e3g_traffic_d_user_ps_gb'], 4)
     
-    new_columns['umts_cqi_e'] = np.round(
-        (0.25 * np.exp((1 - new_columns['umts_acc_cs_e'] / 100) * -58.11779571) +
-         0.25 * np.exp((1 - new_columns['umts_ret_cs_e'] / 100) * -58.11779571) +
-         0.15 * np.exp((1 - new_columns['umts_acc_ps_e'] / 100) * -28.62016873) +
-         0.15 * np.exp((1 - new_columns['umts_ret_ps_e'] / 100) * -28.62016873) +
-         0.20 * (1 - np.exp(new_columns['umts_thp_dl_e'] * -0.00094856))) * 100, 8)
+    new_columns['umts_cqi_e'] = np.round(umts_cqi_score(
+        new_columns['umts_acc_cs_e'] / 100,
+        new_columns['umts_ret_cs_e'] / 100,
+        new_columns['umts_acc_ps_e'] / 100,
+        new_columns['umts_ret_ps_e'] / 100,
+        new_columns['umts_thp_dl_e']) * 100, 8)
     
     # Nokia-specific metrics
     new_columns['umts_acc_cs_n'] = np.round(
@@ -397,12 +400,12 @@ def apply_umts_calculations(df, level_config):
     new_columns['umts_traff_voice_n'] = np.round(df['n3g_traffic_v_user_cs'], 4)
     new_columns['umts_traff_data_n'] = np.round(df['n3g_traffic_d_user_ps_gb'], 4)
     
-    new_columns['umts_cqi_n'] = np.round(
-        (0.25 * np.exp((1 - new_columns['umts_acc_cs_n'] / 100) * -58.11779571) +
-         0.25 * np.exp((1 - new_columns['umts_ret_cs_n'] / 100) * -58.11779571) +
-         0.15 * np.exp((1 - new_columns['umts_acc_ps_n'] / 100) * -28.62016873) +
-         0.15 * np.exp((1 - new_columns['umts_ret_ps_n'] / 100) * -28.62016873) +
-         0.20 * (1 - np.exp(new_columns['umts_thp_dl_n'] * -0.00094856))) * 100, 8)
+    new_columns['umts_cqi_n'] = np.round(umts_cqi_score(
+        new_columns['umts_acc_cs_n'] / 100,
+        new_columns['umts_ret_cs_n'] / 100,
+        new_columns['umts_acc_ps_n'] / 100,
+        new_columns['umts_ret_ps_n'] / 100,
+        new_columns['umts_thp_dl_n']) * 100, 8)
     
     # Create new DataFrame with calculated columns using pd.concat() to avoid fragmentation
     new_df = pd.DataFrame(new_columns, index=df.index)
@@ -130,7 +130,17 @@ export const api = {
     )
     },
   reportPdf: async (args: { site_att: string; input_date: string; threshold?: number; period?: number; guard?: number; radius_km?: number; include_debug?: boolean }): Promise<Blob> => {
-    const res = await fetch(`${BASE_URL}/api/report`, {
+    const fail = async (res: Response) => {
+      // Try to parse JSON error from server
+      let msg = `HTTP ${res.status}`;
+      try {
+        const j = await res.json();
+        msg = j?.error || j?.detail || msg;
+      } catch {}
+      throw new Error(msg);
+    };
+    // Queue the report, then poll the job until the PDF is ready
+    const submit = await fetch(`${BASE_URL}/api/report/jobs`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
@@ -140,19 +150,21 @@ export const api = {
         period: args.period,
         guard: args.guard,
         radius_km: args.radius_km,
+        vecinos: '',
         debug: false,
         include_debug: !!args.include_debug,
       }),
     });
-    if (!res.ok) {
-      // Try to parse JSON error from server
-      try {
-        const j = await res.json();
-        throw new Error(j?.error || `HTTP ${res.status}`);
-      } catch {
-        throw new Error(`HTTP ${res.status}`);
+    if (!submit.ok) await fail(submit);
+    const job = await submit.json();
+    for (;;) {
+      const res = await fetch(`${BASE_URL}${job.href}`);
+      if (res.status === 202) {
+        await new Promise((r) => setTimeout(r, 1000));
+        continue;
       }
+      if (!res.ok) await fail(res);
+      return res.blob();
     }
-    return res.blob();
   },
 };